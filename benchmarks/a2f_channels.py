@@ -0,0 +1,181 @@
+"""Per-utterance A2F latency with a channel per call against pooled channels.
+
+Runs a local TLS gRPC stand-in for the A2F controller. The stand-in reads
+the whole ProcessAudioStream, then answers with 30 fps of blendshape frames.
+The same utterances go through NvidiaFaceGenerator twice:
+- per-call: a fresh channel per utterance, the way _inference_model used to
+  work, which pays a TCP, TLS and HTTP/2 setup every time;
+- pooled: its GrpcChannelPool.
+Loopback has no round-trip time, so the saving shown is the handshake CPU
+alone. Over the internet each new connection also waits for its handshake
+round trips.
+
+Run from the repository root:
+    python -m benchmarks.a2f_channels
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from typing import List
+
+import grpc
+import numpy as np
+
+from components.visual.nvidia_face_generator import NvidiaFaceGenerator
+from constants.constants_enum import AudioFormat
+from entities.entity_audio import AudioData
+from models.audio2face.scripts.audio2face_api_client.a2f.client import auth, service
+from nvidia_ace.animation_data.v1_pb2 import AnimationData, SkelAnimation, SkelAnimationHeader, FloatArrayWithTimeCode
+from nvidia_ace.audio.v1_pb2 import AudioHeader
+from nvidia_ace.controller.v1_pb2 import AnimationDataStream, AnimationDataStreamHeader
+from nvidia_ace.services.a2f_controller.v1_pb2_grpc import A2FControllerServiceServicer, A2FControllerServiceStub, add_A2FControllerServiceServicer_to_server
+
+BLEND_SHAPES = [f"blendShape{i}" for i in range(52)]
+FPS = 30
+
+
+class StandInA2FController(A2FControllerServiceServicer):
+    async def ProcessAudioStream(self, request_iterator, context):
+        samples, sample_rate = 0, 16000
+        async for message in request_iterator:
+            if message.HasField("audio_stream_header"):
+                sample_rate = message.audio_stream_header.audio_header.samples_per_second
+            elif message.HasField("audio_with_emotion"):
+                samples += len(message.audio_with_emotion.audio_buffer) // 2
+            elif message.HasField("end_of_audio"):
+                break
+
+        yield AnimationDataStream(animation_data_stream_header=AnimationDataStreamHeader(
+            audio_header=AudioHeader(samples_per_second=sample_rate, bits_per_sample=16, channel_count=1),
+            skel_animation_header=SkelAnimationHeader(blend_shapes=BLEND_SHAPES),
+        ))
+        frames = [
+            FloatArrayWithTimeCode(time_code=frame / FPS, values=[0.1] * len(BLEND_SHAPES))
+            for frame in range(int(samples / sample_rate * FPS))
+        ]
+        # A2F streams about a second of frames per message
+        for start in range(0, len(frames), FPS):
+            yield AnimationDataStream(animation_data=AnimationData(
+                skel_animation=SkelAnimation(blend_shape_weights=frames[start:start + FPS])
+            ))
+
+
+def make_certificate(directory: str) -> tuple:
+    key_path, cert_path = os.path.join(directory, "key.pem"), os.path.join(directory, "cert.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+         "-addext", "subjectAltName=DNS:localhost", "-keyout", key_path, "-out", cert_path],
+        check=True, capture_output=True,
+    )
+    return key_path, cert_path
+
+
+async def start_server(key_path: str, cert_path: str) -> tuple:
+    server = grpc.aio.server()
+    add_A2FControllerServiceServicer_to_server(StandInA2FController(), server)
+    with open(key_path, "rb") as key_file, open(cert_path, "rb") as cert_file:
+        credentials = grpc.ssl_server_credentials([(key_file.read(), cert_file.read())])
+    port = server.add_secure_port("localhost:0", credentials)
+    await server.start()
+    return server, port
+
+
+def utterance(seconds: float) -> AudioData:
+    return AudioData(
+        data=np.zeros(int(16000 * seconds), dtype=np.int16),
+        format=AudioFormat.WAV,
+        name=f"{time.time_ns()}.wav",
+        timestamp=time.time(),
+        sample_rate=16000,
+        duration=seconds,
+    )
+
+
+async def per_call_channel(generator: NvidiaFaceGenerator, audio_data: AudioData) -> dict:
+    """The pre-pool _inference_model: a new channel and stub for every utterance."""
+    channel = auth.create_channel(ssl_cert=generator.config['ssl_cert'], uri=generator.config['uri'], use_ssl=True)
+    try:
+        stream = A2FControllerServiceStub(channel).ProcessAudioStream()
+        audio_np = np.frombuffer(audio_data.data, dtype=np.int16)
+        await service.write_to_stream_with_data(stream, generator.face_config_path, audio_np, audio_data.sample_rate)
+        return await service.read_stream_data_only(stream)
+    finally:
+        # The old code leaked the channel; closing it in the background keeps
+        # connections from piling up without adding the close to the timing
+        asyncio.ensure_future(channel.close())
+
+
+async def sequential(call, generator, utterances: int, seconds: float) -> List[float]:
+    latencies = []
+    for _ in range(utterances):
+        start_time = time.perf_counter()
+        result = await call(generator, utterance(seconds))
+        latencies.append(time.perf_counter() - start_time)
+        assert len(result["time_codes"]) == int(seconds * FPS)
+    return latencies
+
+
+async def concurrent(call, generator, utterances: int, seconds: float, streams: int) -> float:
+    start_time = time.perf_counter()
+    semaphore = asyncio.Semaphore(streams)
+
+    async def one():
+        async with semaphore:
+            await call(generator, utterance(seconds))
+
+    await asyncio.gather(*(one() for _ in range(utterances)))
+    return utterances / (time.perf_counter() - start_time)
+
+
+def summary(latencies: List[float]) -> str:
+    latencies = sorted(latencies)
+    return (f"p50 {statistics.median(latencies) * 1e3:6.2f} ms  "
+            f"p95 {latencies[int(0.95 * (len(latencies) - 1))] * 1e3:6.2f} ms")
+
+
+async def main(utterances: int, seconds: float, streams: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        key_path, cert_path = make_certificate(directory)
+        server, port = await start_server(key_path, cert_path)
+        generator = NvidiaFaceGenerator({
+            'uri': f"localhost:{port}",
+            'ssl_cert': cert_path,
+            'max_channels': 2,
+            'max_streams_per_channel': max(1, streams // 2),
+        })
+
+        async def pooled(generator, audio_data):
+            return await generator._inference_model(audio_data)
+
+        try:
+            # One untimed call each so imports and the config file read don't land on the first sample
+            await per_call_channel(generator, utterance(seconds))
+            await pooled(generator, utterance(seconds))
+
+            per_call = await sequential(per_call_channel, generator, utterances, seconds)
+            reused = await sequential(pooled, generator, utterances, seconds)
+            print(f"{utterances} sequential {seconds:.1f}s utterances over TLS on loopback")
+            print(f"  per-call channel: {summary(per_call)}")
+            print(f"  pooled channel:   {summary(reused)}")
+            print(f"  saved per utterance: {(statistics.median(per_call) - statistics.median(reused)) * 1e3:.2f} ms (p50)")
+
+            per_call_rate = await concurrent(per_call_channel, generator, utterances, seconds, streams)
+            pooled_rate = await concurrent(pooled, generator, utterances, seconds, streams)
+            print(f"{streams} concurrent streams: per-call {per_call_rate:.1f}/s, pooled {pooled_rate:.1f}/s "
+                  f"({generator._channel_pool.get_metrics()['channels']} pooled channels)")
+        finally:
+            await generator._channel_pool.close()
+            await server.stop(None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--utterances", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=2.0, help="audio length of each utterance")
+    parser.add_argument("--streams", type=int, default=8, help="concurrent streams for the throughput run")
+    args = parser.parse_args()
+    asyncio.run(main(args.utterances, args.seconds, args.streams))
@@ -0,0 +1,120 @@
+"""Decode throughput of A2F blendshape frames: per-frame dicts against float32 arrays.
+
+Each A2F animation message carries about a second of frames, 52 weights each.
+The same serialized messages are decoded three ways:
+- dicts: {"timeCode", "blendShapes": {name: weight}} per frame, as the reader used to;
+- fields: rows of a preallocated array, read through the protobuf fields;
+- wire: service.decode_blend_shape_weights, which copies the packed floats
+  straight from the message bytes.
+It then reports the memory a clip's frames hold once decoded, dicts against
+a BlendShapeFrameBuffer.
+
+Run from the repository root:
+    python -m benchmarks.a2f_decode
+"""
+import argparse
+import time
+import tracemalloc
+from typing import Callable, List
+
+import numpy as np
+
+from models.audio2face.scripts.audio2face_api_client.a2f.client import service
+from nvidia_ace.animation_data.v1_pb2 import AnimationData, SkelAnimation, FloatArrayWithTimeCode
+
+BLEND_SHAPES = [f"blendShape{i}" for i in range(52)]
+FPS = 30
+
+
+def messages(seconds: int) -> List[AnimationData]:
+    """Parsed messages of FPS frames each, as stream.read() hands them over."""
+    rng = np.random.default_rng(0)
+    result = []
+    for second in range(seconds):
+        message = AnimationData(skel_animation=SkelAnimation(blend_shape_weights=[
+            FloatArrayWithTimeCode(time_code=(second * FPS + frame) / FPS, values=rng.random(len(BLEND_SHAPES)).tolist())
+            for frame in range(FPS)
+        ]))
+        result.append(AnimationData.FromString(message.SerializeToString()))
+    return result
+
+
+def decode_dicts(message: AnimationData) -> list:
+    return [
+        {"timeCode": blendshapes.time_code, "blendShapes": dict(zip(BLEND_SHAPES, blendshapes.values))}
+        for blendshapes in message.skel_animation.blend_shape_weights
+    ]
+
+
+def decode_fields(message: AnimationData) -> tuple:
+    frame_count = len(message.skel_animation.blend_shape_weights)
+    return service._decode_blend_shape_fields(
+        message.skel_animation, np.zeros(frame_count), np.zeros((frame_count, len(BLEND_SHAPES)), dtype=np.float32)
+    )
+
+
+def decode_wire(message: AnimationData) -> tuple:
+    return service.decode_blend_shape_weights(message.skel_animation, len(BLEND_SHAPES))
+
+
+def frames_per_second(decode: Callable, clip: List[AnimationData], repeats: int) -> float:
+    for message in clip:
+        decode(message)
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        for message in clip:
+            decode(message)
+    return repeats * len(clip) * FPS / (time.perf_counter() - start_time)
+
+
+def retained_bytes(accumulate: Callable, clip: List[AnimationData]) -> int:
+    tracemalloc.start()
+    try:
+        frames = accumulate(clip)
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del frames
+    return size
+
+
+def accumulate_dicts(clip: List[AnimationData]) -> list:
+    frames = []
+    for message in clip:
+        frames += decode_dicts(message)
+    return frames
+
+
+def accumulate_buffer(clip: List[AnimationData]) -> service.BlendShapeFrameBuffer:
+    frames = service.BlendShapeFrameBuffer(len(BLEND_SHAPES), capacity=len(clip) * FPS)
+    for message in clip:
+        frames.append(*decode_wire(message))
+    return frames
+
+
+def main(seconds: int, repeats: int) -> None:
+    clip = messages(seconds)
+    reference_time_codes, reference_weights = decode_fields(clip[0])
+    time_codes, weights = decode_wire(clip[0])
+    assert np.array_equal(time_codes, reference_time_codes) and np.array_equal(weights, reference_weights)
+
+    print(f"{seconds} messages of {FPS} frames x {len(BLEND_SHAPES)} blendshapes")
+    baseline = None
+    for name, decode in (("dicts", decode_dicts), ("fields", decode_fields), ("wire", decode_wire)):
+        rate = frames_per_second(decode, clip, repeats)
+        baseline = baseline or rate
+        print(f"  {name:<7} {rate:12,.0f} frames/s  ({rate / baseline:4.1f}x, "
+              f"{FPS / rate * 1e6:6.1f} us per second of animation)")
+
+    dict_bytes = retained_bytes(accumulate_dicts, clip)
+    buffer_bytes = retained_bytes(accumulate_buffer, clip)
+    print(f"Decoded clip held in memory: dicts {dict_bytes / seconds / 1024:7.1f} KiB/s of animation, "
+          f"array {buffer_bytes / seconds / 1024:5.1f} KiB/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=10, help="clip length, one message per second")
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+    main(args.seconds, args.repeats)
@@ -0,0 +1,78 @@
+"""Stop-to-silence latency of StageBackbone.stop_conversation under load.
+
+Two sessions talk at once. Session "viewer" is interrupted at a random point of
+its utterance (mid-TTS, mid-A2F stream or mid-motion), while session "other"
+keeps going. Each trial measures how long stop_conversation takes to cancel
+and flush everything for "viewer", then checks that no VisualOutput for it
+arrives afterwards and that "other" still finishes.
+
+Run from the repository root:
+    python -m benchmarks.barge_in
+"""
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.pipeline import build_pipeline, create_generators
+from entities.entity_conversation import StopRequest
+
+TARGET_SECONDS = 0.1
+
+# Slow enough that every stop lands on in-flight work; TTS and motion partly burn CPU
+BARGE_IN_PROFILE = {
+    'tts': {'latency': {'mean': 1.0, 'cpu_fraction': 0.5}},
+    'face': {'latency': {'mean': 0.6}},
+    'motion': {'latency': {'mean': 0.4, 'cpu_fraction': 1.0}},
+}
+
+
+def run_trial(rng: random.Random, utterances: int = 3) -> Dict[str, float]:
+    backbone, tts_stage, visual_join_stage = build_pipeline(*create_generators("synthetic", BARGE_IN_PROFILE))
+    backbone.start()
+    try:
+        for i in range(utterances):
+            tts_stage.add_input_text(f"Let me tell you a long story, part {i}.", session_id="viewer")
+        tts_stage.add_input_text("Meanwhile another viewer gets an answer.", session_id="other")
+
+        time.sleep(rng.uniform(0.05, 2.0))
+        stop_latency = backbone.stop_conversation(StopRequest(conversation_id="viewer", stop_reason="barge_in"), timeout=5.0)
+        stopped_at = time.time()
+
+        backbone.wait_until_idle(timeout=10.0)
+        late_outputs, other_outputs = 0, 0
+        visual_output = visual_join_stage.get_visual_output()
+        while visual_output is not None:
+            if visual_output.session_id == "viewer" and visual_output.motion_data.timestamp > stopped_at:
+                late_outputs += 1
+            if visual_output.session_id == "other":
+                other_outputs += 1
+            visual_output = visual_join_stage.get_visual_output()
+    finally:
+        backbone.shutdown()
+
+    return {"stop_latency": stop_latency, "late_outputs": late_outputs, "other_outputs": other_outputs}
+
+
+def main(trials: int = 20, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    results: List[Dict[str, float]] = [run_trial(rng) for _ in range(trials)]
+
+    latencies = [result["stop_latency"] for result in results if result["stop_latency"] is not None]
+    timeouts = trials - len(latencies)
+    late_outputs = sum(result["late_outputs"] for result in results)
+    other_missing = sum(1 for result in results if result["other_outputs"] == 0)
+
+    print(
+        f"Stop-to-silence over {len(latencies)} trials: "
+        f"p50 {np.percentile(latencies, 50) * 1000:.1f} ms, "
+        f"p95 {np.percentile(latencies, 95) * 1000:.1f} ms, "
+        f"max {max(latencies) * 1000:.1f} ms "
+        f"(target {TARGET_SECONDS * 1000:.0f} ms)"
+    )
+    print(f"Timeouts: {timeouts}, outputs after stop: {late_outputs}, trials where the other session stalled: {other_missing}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Real-time factor of BarkTTSGenerator under the profiles in configs/config_tts.yml.
+
+RTF is synthesis seconds per second of audio; below 1.0 keeps up with playback.
+For each profile this reports startup time (including any warm-up), the RTF
+of the first utterance and the median RTF of the rest.
+
+Needs the Bark weights. Run from the repository root, e.g. to compare the
+GPU-oriented profile forced onto CPU with the CPU profile:
+    python -m benchmarks.bark_rtf --profiles bark bark_cpu --device cpu
+"""
+import argparse
+import statistics
+import time
+from typing import List
+
+from omegaconf import OmegaConf
+
+from components.audio.bark_tts_generator import BarkTTSGenerator
+
+TEXTS = [
+    "Hello, it's nice to meet you.",
+    "I can help you find a table for tonight.",
+    "The weather should clear up by the afternoon.",
+    "Let me check that for you, it will only take a moment.",
+    "Thanks for waiting, here is what I found.",
+]
+
+
+def measure(profile: str, device: str, utterances: int, config_path: str) -> None:
+    config = OmegaConf.to_container(OmegaConf.select(OmegaConf.load(config_path), profile), resolve=True)
+    if device is not None:
+        # The profile's dtype is kept, so `bark` on cpu still runs fp16 as it used to
+        config['device'] = device
+
+    start_time = time.perf_counter()
+    generator = BarkTTSGenerator(config)
+    startup = time.perf_counter() - start_time
+
+    rtfs: List[float] = []
+    for i in range(utterances):
+        text = TEXTS[i % len(TEXTS)]
+        start_time = time.perf_counter()
+        audio_data = generator.generate_speech(generator.prepare_inputs_for_model([text]))
+        rtfs.append((time.perf_counter() - start_time) / audio_data.duration)
+
+    steady = statistics.median(rtfs[1:]) if len(rtfs) > 1 else float('nan')
+    print(f"{profile:<12} dtype={generator.dtype:<9} int8={str(generator.quantize_int8):<5} "
+          f"startup {startup:6.1f}s  first RTF {rtfs[0]:5.2f}  steady RTF {steady:5.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", nargs="+", default=["bark", "bark_cpu"], help="config_tts.yml sections to compare")
+    parser.add_argument("--device", default=None, help="override every profile's device, e.g. cpu")
+    parser.add_argument("--utterances", type=int, default=6)
+    parser.add_argument("--config", default="configs/config_tts.yml")
+    args = parser.parse_args()
+    for profile in args.profiles:
+        measure(profile, args.device, args.utterances, args.config)
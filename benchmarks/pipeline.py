@@ -0,0 +1,278 @@
+"""End-to-end latency and throughput of the TTS -> face + motion -> join pipeline.
+
+Utterances are traced through every stage (monitoring.tracing) and the spans are
+reduced to p50/p95/p99 per stage and end to end. Results are written as JSON so a
+run can be compared against a stored baseline.
+
+Run from the repository root:
+    python -m benchmarks.pipeline --output results.json
+    python -m benchmarks.pipeline --baseline benchmarks/baselines/pipeline_synthetic.json
+    python -m benchmarks.pipeline --profile benchmarks/profiles/production_like.json --rate 0.5
+    python -m benchmarks.pipeline --generators real --utterances 10
+    python -m benchmarks.pipeline --sentences 4 --streaming
+    python -m benchmarks.pipeline --batch-size 4
+    python -m benchmarks.pipeline --profile benchmarks/profiles/production_like.json --sentences 4 --face-streaming
+    python -m benchmarks.pipeline --profile benchmarks/profiles/production_like.json --sentences 4 --streaming --face-utterance-streams
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from components.audio.abstract_tts_generator import AbstractTTSGenerator
+from components.visual.abstract_face_generator import AbstractFaceGenerator
+from components.visual.abstract_motion_generator import AbstractMotionGenerator
+from components.audio.synthetic_tts_generator import SyntheticTTSGenerator
+from components.visual.synthetic_face_generator import SyntheticFaceGenerator
+from components.visual.synthetic_motion_generator import SyntheticMotionGenerator
+from monitoring.tracing import TRACER
+from stages.face_stage import FaceStage
+from stages.motion_stage import MotionStage
+from stages.tts_stage import TTSStage
+from stages.visual_join_stage import VisualJoinStage
+from stages_backbone import StageBackbone
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "pipeline_synthetic.json")
+PERCENTILES = (50, 95, 99)
+
+# Fixed latencies keep the stored baseline stable; see benchmarks/profiles for realistic ones
+DEFAULT_SYNTHETIC_PROFILE = {
+    'tts': {'latency': {'mean': 0.05}},
+    'face': {'latency': {'mean': 0.08}},
+    'motion': {'latency': {'mean': 0.03}},
+}
+
+
+def create_generators(kind: str, profile: Dict[str, Any] = None) -> Tuple[AbstractTTSGenerator, AbstractFaceGenerator, AbstractMotionGenerator]:
+    if kind == "synthetic":
+        profile = profile or DEFAULT_SYNTHETIC_PROFILE
+        return (
+            SyntheticTTSGenerator(profile.get('tts', {})),
+            SyntheticFaceGenerator(profile.get('face', {})),
+            SyntheticMotionGenerator(profile.get('motion', {})),
+        )
+
+    if kind == "real":
+        # Imported here so synthetic runs need neither model weights nor the A2F endpoint
+        from components.audio.bark_tts_generator import BarkTTSGenerator
+        from components.visual.camn_motion_generator import CamnMotionGenerator
+        from components.visual.nvidia_face_generator import NvidiaFaceGenerator
+        return BarkTTSGenerator({}), NvidiaFaceGenerator({}), CamnMotionGenerator({})
+
+    raise ValueError(f"Unknown generator kind: {kind}")
+
+
+def build_pipeline(tts_generator, face_generator, motion_generator, streaming: bool = False,
+                   batch_size: int = 1, face_streaming: bool = False,
+                   face_utterance_streams: bool = False) -> Tuple[StageBackbone, TTSStage, VisualJoinStage]:
+    tts_stage = TTSStage(tts_generator=tts_generator, streaming=streaming, batch_size=batch_size)
+    face_stage = FaceStage(face_generator=face_generator, streaming=face_streaming, utterance_streams=face_utterance_streams)
+    motion_stage = MotionStage(motion_generator=motion_generator, input_dir=None, output_dir=None)
+    visual_join_stage = VisualJoinStage()
+
+    backbone = StageBackbone()
+    for stage in (tts_stage, face_stage, motion_stage, visual_join_stage):
+        backbone.add_stage(stage)
+    backbone.link(tts_stage.get_audio_data, face_stage.add_input_audio_data, motion_stage.add_input_audio_data)
+    backbone.link(face_stage.get_face_expression, visual_join_stage.add_face_expression)
+    backbone.link(motion_stage.get_motion_data, visual_join_stage.add_motion_data)
+    return backbone, tts_stage, visual_join_stage
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    summary = {f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES}
+    summary["mean"] = float(np.mean(values))
+    return summary
+
+
+def utterance_text(index: int, sentences: int = 1) -> str:
+    first = f"Life is full of challenges and opportunities {index}."
+    rest = [f"Every step we take teaches us something new, part {i}." for i in range(1, sentences)]
+    return " ".join([first] + rest)
+
+
+def run(generators: str = "synthetic", utterances: int = 50, warmup: int = 3,
+        rate: Optional[float] = None, timeout: float = 600.0, profile: Dict[str, Any] = None,
+        sentences: int = 1, streaming: bool = False, batch_size: int = 1, face_streaming: bool = False,
+        face_utterance_streams: bool = False) -> Dict[str, Any]:
+    """Push `utterances` texts of `sentences` sentences each through the pipeline, all at once or `rate` per second."""
+    backbone, tts_stage, visual_join_stage = build_pipeline(*create_generators(generators, profile), streaming=streaming,
+                                                            batch_size=batch_size, face_streaming=face_streaming,
+                                                            face_utterance_streams=face_utterance_streams)
+    backbone.start()
+
+    try:
+        # Warm-up utterances load lazy state (CUDA kernels, gRPC channels) and are not reported
+        for i in range(warmup):
+            tts_stage.add_input_text(f"Warm up sentence number {i}.")
+        _collect(visual_join_stage, warmup, timeout)
+        TRACER.clear()
+
+        trace_ids = []
+        start_time = time.perf_counter()
+        for i in range(utterances):
+            if rate:
+                time.sleep(max(0.0, start_time + i / rate - time.perf_counter()))
+            trace_ids.append(tts_stage.add_input_text(utterance_text(i, sentences)))
+        completed = _collect(visual_join_stage, utterances, timeout)
+        wall_time = time.perf_counter() - start_time
+    finally:
+        backbone.shutdown()
+
+    return {
+        "meta": {
+            "generators": generators,
+            "utterances": utterances,
+            "completed": completed,
+            "rate": rate,
+            "profile": profile,
+            "sentences": sentences,
+            "streaming": streaming,
+            "batch_size": batch_size,
+            "face_streaming": face_streaming,
+            "face_utterance_streams": face_utterance_streams,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "end_to_end": _end_to_end(trace_ids, completed, wall_time),
+        "stages": _per_stage(TRACER.get_spans()),
+    }
+
+
+def _collect(visual_join_stage: VisualJoinStage, expected: int, timeout: float) -> int:
+    # An utterance is complete once the visual output of its last clause arrives
+    completed = 0
+    deadline = time.perf_counter() + timeout
+    while completed < expected and time.perf_counter() < deadline:
+        visual_output = visual_join_stage.get_visual_output()
+        if visual_output is None:
+            time.sleep(0.001)
+            continue
+        completed += visual_output.is_final
+    return completed
+
+
+def _end_to_end(trace_ids: List[str], completed: int, wall_time: float) -> Dict[str, Any]:
+    first_outputs = TRACER.get_first_output_latencies()
+    by_output = defaultdict(list)
+    for trace_id in trace_ids:
+        for output, seconds in first_outputs.get(trace_id, {}).items():
+            by_output[output].append(seconds)
+
+    result = {f"time_to_first_{output}_s": percentiles(values) for output, values in sorted(by_output.items())}
+    result["throughput_per_s"] = completed / wall_time if wall_time else 0.0
+    result["wall_time_s"] = wall_time
+    return result
+
+
+def _per_stage(spans: List[dict]) -> Dict[str, Any]:
+    durations = defaultdict(lambda: defaultdict(list))
+    windows = {}
+    for span in spans:
+        stage, start, dur = span["cat"], span["ts"] / 1e6, span["dur"] / 1e6
+        durations[stage][span["name"]].append(dur)
+        if span["name"] == "execute":
+            first, last = windows.get(stage, (start, start + dur))
+            windows[stage] = (min(first, start), max(last, start + dur))
+
+    result = {}
+    for stage, by_name in sorted(durations.items()):
+        first, last = windows.get(stage, (0.0, 0.0))
+        executed = len(by_name.get("execute", []))
+        result[stage] = {
+            "queued_s": percentiles(by_name.get("queued", [])),
+            "execute_s": percentiles(by_name.get("execute", [])),
+            "items": executed,
+            "throughput_per_s": executed / (last - first) if last > first else 0.0,
+        }
+    return result
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta: float) -> List[str]:
+    """Latency percentiles that grew, or throughputs that shrank, by more than `tolerance`.
+
+    Latency changes under `min_delta` seconds are scheduler noise and never count.
+    """
+    regressions = []
+    baseline_values = _flatten(baseline)
+    for path, value in _flatten(results).items():
+        base = baseline_values.get(path)
+        if not base or not isinstance(value, float) or path.startswith("meta") or path.endswith("wall_time_s"):
+            continue
+        change = (value - base) / base
+        if "throughput" in path:
+            regressed = -change > tolerance
+        else:
+            regressed = change > tolerance and value - base > min_delta
+        marker = "  REGRESSION" if regressed else ""
+        print(f"{path:60s} {base:10.4f} -> {value:10.4f} ({change:+.1%}){marker}")
+        if marker:
+            regressions.append(path)
+    return regressions
+
+
+def _flatten(tree: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    flat = {}
+    for key, value in tree.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{path}."))
+        else:
+            flat[path] = value
+    return flat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--generators", choices=("synthetic", "real"), default="synthetic")
+    parser.add_argument("--profile", help="JSON file of synthetic generator configs keyed tts/face/motion")
+    parser.add_argument("--utterances", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--rate", type=float, default=None, help="utterances per second; default sends all at once")
+    parser.add_argument("--sentences", type=int, default=1, help="sentences per utterance")
+    parser.add_argument("--streaming", action="store_true", help="synthesize and forward one clause at a time")
+    parser.add_argument("--batch-size", type=int, default=1, help="texts per batched TTS call")
+    parser.add_argument("--face-streaming", action="store_true", help="forward face animation chunk by chunk")
+    parser.add_argument("--face-utterance-streams", action="store_true",
+                        help="feed each utterance's clauses into one face stream as TTS produces them")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", nargs="?", const=DEFAULT_BASELINE, help="compare against this results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    parser.add_argument("--min-delta", type=float, default=0.002, help="ignore latency changes below this many seconds")
+    args = parser.parse_args()
+
+    profile = None
+    if args.profile:
+        with open(args.profile) as f:
+            profile = json.load(f)
+
+    results = run(args.generators, args.utterances, args.warmup, args.rate, profile=profile,
+                  sentences=args.sentences, streaming=args.streaming, batch_size=args.batch_size,
+                  face_streaming=args.face_streaming, face_utterance_streams=args.face_utterance_streams)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(results, indent=2, sort_keys=True))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
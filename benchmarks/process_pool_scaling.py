@@ -0,0 +1,86 @@
+"""Throughput of ProcessPoolTTSGenerator as the number of worker processes grows.
+
+Each request burns a fixed amount of pure-Python CPU in the worker and returns
+one second of 16 kHz PCM through shared memory, standing in for Bark on CPU.
+
+Run from the repository root:
+    python -m benchmarks.process_pool_scaling
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+import numpy as np
+
+from components.audio.abstract_tts_generator import AbstractTTSGenerator
+from components.process_pool_generator import ProcessPoolTTSGenerator
+from constants.constants_enum import AudioFormat
+from entities.entity_audio import AudioData
+
+
+class CpuBoundTTSGenerator(AbstractTTSGenerator):
+    def __init__(self, config: Dict[str, Any]):
+        self.work_iterations = config.get('work_iterations', 2_000_000)
+        self.sample_rate = config.get('sample_rate', 16000)
+
+    def prepare_inputs_for_model(self, texts) -> Dict[str, Any]:
+        return {"texts": texts}
+
+    def generate_speech(self, inputs, cancel_token=None) -> AudioData:
+        total = 0
+        for i in range(self.work_iterations):
+            total += i * i
+        return AudioData(
+            data=np.zeros(self.sample_rate, dtype=np.float32),
+            format=AudioFormat.WAV,
+            name=f"{time.time_ns()}.wav",
+            timestamp=time.time(),
+            sample_rate=self.sample_rate,
+            duration=1.0,
+        )
+
+    def save_audio(self, audio_data: AudioData, format: str = 'wav') -> str:
+        pass
+
+    def load_audio(self, audio_path: str) -> AudioData:
+        pass
+
+    def delete_audio(self, audio_path: str) -> None:
+        pass
+
+
+def measure_throughput(max_workers: int, requests: int) -> float:
+    generator = ProcessPoolTTSGenerator({
+        'generator_factory': CpuBoundTTSGenerator,
+        'max_workers': max_workers,
+        'threads_per_worker': 1,
+    })
+    generator.warm_up()
+
+    try:
+        # One caller thread per worker, as independent stages or sessions would submit
+        with ThreadPoolExecutor(max_workers=max_workers) as callers:
+            start_time = time.perf_counter()
+            results = list(callers.map(lambda i: generator.generate_speech([f"sample {i}"]), range(requests)))
+            elapsed = time.perf_counter() - start_time
+    finally:
+        generator.shutdown()
+
+    assert all(len(audio_data.data) == audio_data.sample_rate for audio_data in results)
+    return requests / elapsed
+
+
+def main(requests: int = 24) -> None:
+    cpu_count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    print(f"Available cores: {cpu_count}")
+
+    baseline = None
+    for max_workers in (1, 2, 4, 8):
+        throughput = measure_throughput(max_workers, requests)
+        baseline = baseline or throughput
+        print(f"{max_workers} worker(s): {throughput:.2f} utterances/s ({throughput / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""24 kHz to 16 kHz resampling: FFT scipy.signal.resample against StreamingResampler.
+
+Times each on whole clips of 1-30 s, and StreamingResampler again fed in
+chunks as a streaming TTS would. The seam column is the largest deviation
+from the whole-clip output when each method is run chunk by chunk.
+
+Run from the repository root:
+    python -m benchmarks.resampling
+"""
+import argparse
+import time
+from typing import Callable
+
+import numpy as np
+import scipy.signal as signal
+
+from utils.resampling import StreamingResampler, resample
+
+ORIG_SR = 24000
+TARGET_SR = 16000
+
+
+def fft_resample(audio: np.ndarray) -> np.ndarray:
+    """What BarkTTSGenerator.resample_audio_scipy did before the polyphase resampler."""
+    return signal.resample(audio, int(len(audio) * float(TARGET_SR) / ORIG_SR))
+
+
+def streaming_resample(audio: np.ndarray, chunk: int) -> np.ndarray:
+    resampler = StreamingResampler(ORIG_SR, TARGET_SR)
+    parts = [resampler.process(audio[start:start + chunk]) for start in range(0, len(audio), chunk)]
+    parts.append(resampler.flush())
+    return np.concatenate(parts)
+
+
+def speech_like(seconds: float, seed: int = 0) -> np.ndarray:
+    """Harmonics of a wandering pitch under a syllable-rate envelope, plus a little noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * ORIG_SR)) / ORIG_SR
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / ORIG_SR
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 4 * t))
+    return (0.3 * voiced * envelope + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def best_of(function: Callable[[], np.ndarray], repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(durations=(1, 2, 5, 10, 20, 30), chunk_ms: float = 20.0, repeats: int = 5) -> None:
+    chunk = int(ORIG_SR * chunk_ms / 1000)
+    print(f"{'clip':>5} {'fft ms':>9} {'poly ms':>9} {'stream ms':>10} {'speedup':>8} {'fft seam':>9} {'stream seam':>12}")
+    for seconds in durations:
+        audio = speech_like(seconds)
+        # Odd lengths are where FFT resampling is slowest; clips come out of TTS at any length
+        audio = audio[:len(audio) - 1]
+
+        fft_time = best_of(lambda: fft_resample(audio), repeats)
+        poly_time = best_of(lambda: resample(audio, ORIG_SR, TARGET_SR), repeats)
+        stream_time = best_of(lambda: streaming_resample(audio, chunk), repeats)
+
+        whole = fft_resample(audio)
+        fft_chunked = np.concatenate([fft_resample(audio[start:start + chunk]) for start in range(0, len(audio), chunk)])
+        length = min(len(whole), len(fft_chunked))
+        fft_seam = np.max(np.abs(whole[:length] - fft_chunked[:length]))
+        stream_seam = np.max(np.abs(resample(audio, ORIG_SR, TARGET_SR) - streaming_resample(audio, chunk)))
+
+        print(f"{seconds:>4}s {fft_time * 1e3:>9.2f} {poly_time * 1e3:>9.2f} {stream_time * 1e3:>10.2f} "
+              f"{fft_time / poly_time:>7.1f}x {fft_seam:>9.4f} {stream_seam:>12.2e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunk-ms", type=float, default=20.0, help="chunk size for the streaming runs")
+    parser.add_argument("--repeats", type=int, default=5, help="best of this many runs per measurement")
+    args = parser.parse_args()
+    main(chunk_ms=args.chunk_ms, repeats=args.repeats)
@@ -0,0 +1,91 @@
+"""Idle CPU and enqueue-to-execute latency of a threaded StageBackbone.
+
+Run from the repository root:
+    python -m benchmarks.stage_wakeup
+"""
+import statistics
+import time
+from typing import Any, Dict, List
+
+from components.audio.abstract_tts_generator import AbstractTTSGenerator
+from constants.constants_enum import AudioFormat
+from entities.entity_audio import AudioData
+from stages.tts_stage import TTSStage
+from stages_backbone import StageBackbone
+
+
+class _TimestampTTSGenerator(AbstractTTSGenerator):
+    """Records when generate_speech is entered instead of synthesizing audio."""
+
+    def __init__(self):
+        self.execute_times: List[float] = []
+
+    def prepare_inputs_for_model(self, texts) -> Dict[str, Any]:
+        return {"texts": texts}
+
+    def generate_speech(self, inputs, cancel_token=None) -> AudioData:
+        self.execute_times.append(time.perf_counter())
+        return AudioData(
+            data=b"",
+            format=AudioFormat.WAV,
+            name=f"{int(time.time())}.wav",
+            timestamp=time.time(),
+            sample_rate=16000,
+            duration=0.0,
+        )
+
+    def save_audio(self, audio_data: AudioData, format: str = 'wav') -> str:
+        pass
+
+    def load_audio(self, audio_path: str) -> AudioData:
+        pass
+
+    def delete_audio(self, audio_path: str) -> None:
+        pass
+
+
+def measure_idle_cpu(backbone: StageBackbone, seconds: float) -> float:
+    """Fraction of one core used by the process while the pipeline has no work."""
+    assert backbone.wait_until_idle(timeout=5.0), "stages still busy, idle CPU would include their work"
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    time.sleep(seconds)
+    return (time.process_time() - cpu_start) / (time.perf_counter() - wall_start)
+
+
+def measure_enqueue_latency(stage: TTSStage, generator: _TimestampTTSGenerator, samples: int, gap: float) -> List[float]:
+    latencies = []
+    for i in range(samples):
+        enqueue_time = time.perf_counter()
+        stage.add_input_text(f"sample {i}")
+        while len(generator.execute_times) <= i:
+            time.sleep(0.0001)
+        latencies.append(generator.execute_times[i] - enqueue_time)
+        # Let the stage go idle again so every sample measures a cold wakeup
+        time.sleep(gap)
+    return latencies
+
+
+def main(idle_seconds: float = 3.0, samples: int = 200, gap: float = 0.01) -> None:
+    generator = _TimestampTTSGenerator()
+    stage = TTSStage(tts_generator=generator)
+    backbone = StageBackbone()
+    backbone.add_stage(stage)
+    backbone.start()
+
+    try:
+        idle_cpu = measure_idle_cpu(backbone, idle_seconds)
+        latencies = sorted(measure_enqueue_latency(stage, generator, samples, gap))
+    finally:
+        backbone.shutdown()
+
+    print(f"Idle CPU: {idle_cpu * 100:.2f}% of one core")
+    print(
+        f"Enqueue-to-execute latency: "
+        f"p50 {statistics.median(latencies) * 1000:.3f} ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.3f} ms, "
+        f"max {latencies[-1] * 1000:.3f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
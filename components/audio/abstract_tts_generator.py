@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from entities.entity_audio import AudioData
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from utils.cancellation import CancellationToken
 
 class AbstractTTSGenerator(ABC):
     @abstractmethod
@@ -8,9 +9,18 @@ class AbstractTTSGenerator(ABC):
         pass
 
     @abstractmethod
-    def generate_speech(self, inputs) -> AudioData:
+    def generate_speech(self, inputs, cancel_token: Optional[CancellationToken] = None) -> AudioData:
+        """Synthesize speech; raise GenerationCancelled as soon as possible once cancel_token is cancelled."""
         pass
 
+    def generate_speech_batch(self, texts: List[str], cancel_token: Optional[CancellationToken] = None) -> List[AudioData]:
+        """One AudioData per text, in order; generators that can batch inference override this."""
+        return [self.generate_speech(self.prepare_inputs_for_model([text]), cancel_token=cancel_token) for text in texts]
+
+    def rendition_params(self) -> Dict[str, Any]:
+        """Settings that change the audio rendered for a given text; part of the TTS cache key."""
+        return {'generator': type(self).__name__}
+
     @abstractmethod
     def save_audio(self, audio_data: AudioData, format: str = 'wav') -> str:
         pass
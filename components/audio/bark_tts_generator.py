@@ -8,75 +8,209 @@ from transformers import AutoProcessor, AutoModel
 from entities.entity_audio import AudioData
 from components.audio.abstract_tts_generator import AbstractTTSGenerator
 from constants.constants_enum import AudioFormat
+from utils.cancellation import CancellationToken, GenerationCancelled
 import soundfile as sf
-import scipy.signal as signal
 logger = logging.getLogger(__name__)
 
+DTYPES = {'float32': torch.float32, 'bfloat16': torch.bfloat16, 'float16': torch.float16}
+
 class BarkTTSGenerator(AbstractTTSGenerator):    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         
         self.model_name = config.get('model_name', 'suno/bark-small')
         self.voice_preset = config.get('voice_preset', 'v2/en_speaker_9')
+        # Every preset a session may switch to; loaded once and kept on the device
+        self.voice_presets = list(dict.fromkeys([self.voice_preset, *config.get('voice_presets', [])]))
         self.device = torch.device(config.get('device', 'cuda' if torch.cuda.is_available() else 'cpu'))
         self.sample_rate = config.get('sample_rate', 24000)
+        self.fine_temperature = config.get('fine_temperature', 0.3)
+        self.coarse_temperature = config.get('coarse_temperature', 0.6)
+        # fp16 only pays off on GPU; on CPU it is emulated and slower than fp32
+        self.dtype = config.get('dtype', 'float16' if self.device.type == 'cuda' else 'float32')
+        # Dynamic int8 quantization of every Linear layer, CPU and float32 weights only
+        self.quantize_int8 = config.get('quantize_int8', False)
+        # None leaves torch's thread pools as the process (or StageGraph `threads`) set them
+        self.intra_op_threads = config.get('intra_op_threads')
+        self.inter_op_threads = config.get('inter_op_threads')
+        # Synthesized once at startup so the first real utterance doesn't pay for lazy init
+        self.warmup_text = config.get('warmup_text')
+        # Token of the generate_speech call in progress, checked before every decode step
+        self._cancel_token: Optional[CancellationToken] = None
         
         self._init_model()
+        self._install_cancel_hooks()
+        # preset name -> {semantic_prompt, coarse_prompt, fine_prompt} tensors on self.device
+        self._history_prompts: Dict[str, Dict[str, torch.Tensor]] = {}
+        for voice_preset in self.voice_presets:
+            self._load_history_prompt(voice_preset)
+
+        if self.warmup_text:
+            self._warm_up()
     
     def _init_model(self) -> None:
         try:
-            torch.backends.cuda.matmul.allow_tf32 = True
-            torch.backends.cudnn.allow_tf32 = True
-            torch.backends.cuda.matmul.allow_fp16_reduced_precision_reduction = True
+            if self.device.type == 'cuda':
+                torch.backends.cuda.matmul.allow_tf32 = True
+                torch.backends.cudnn.allow_tf32 = True
+                torch.backends.cuda.matmul.allow_fp16_reduced_precision_reduction = True
+            self._set_threads()
+
+            if self.quantize_int8 and (self.device.type != 'cpu' or self.dtype != 'float32'):
+                raise ValueError(f"quantize_int8 needs device cpu and dtype float32, got {self.device.type} and {self.dtype}")
             
             self.processor = AutoProcessor.from_pretrained(self.model_name)
 
             self.model = AutoModel.from_pretrained(
                 self.model_name,
-                dtype=torch.float16
+                dtype=DTYPES[self.dtype]
             ).to(self.device).eval()
+
+            if self.quantize_int8:
+                # Weights go to int8 ahead of time, activations are quantized per call;
+                # the Encodec decoder is convolutional and stays in fp32
+                self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
             
         except Exception as e:
             logger.error(f"Failed to initialize Bark model: {e}")
             raise
+
+    def _set_threads(self) -> None:
+        if self.intra_op_threads is not None:
+            torch.set_num_threads(self.intra_op_threads)
+        if self.inter_op_threads is not None:
+            try:
+                torch.set_num_interop_threads(self.inter_op_threads)
+            except RuntimeError as e:
+                # Only settable before the first inter-op parallel work in the process
+                logger.warning(f"Could not set inter-op threads to {self.inter_op_threads}: {e}")
+
+    def _warm_up(self) -> None:
+        start_time = time.perf_counter()
+        audio_data = self.generate_speech(self.prepare_inputs_for_model([self.warmup_text]))
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"Bark warm-up took {elapsed:.2f}s for {audio_data.duration:.2f}s of audio")
     
-    def generate_speech(self, inputs) -> AudioData:
+    def _load_history_prompt(self, voice_preset: str) -> Dict[str, torch.Tensor]:
+        try:
+            if self.processor.speaker_embeddings is not None and voice_preset in self.processor.speaker_embeddings:
+                arrays = self.processor._load_voice_preset(voice_preset)
+            else:
+                arrays = dict(np.load(voice_preset if voice_preset.endswith('.npz') else f"{voice_preset}.npz"))
+            self.processor._validate_voice_preset_dict(arrays)
+        except Exception as e:
+            logger.error(f"Failed to load voice preset {voice_preset}: {e}")
+            raise
+
+        # generate() clones the prompts before offsetting them, so one resident copy serves every call
+        history_prompt = {key: torch.from_numpy(arrays[key]).to(self.device) for key in ('semantic_prompt', 'coarse_prompt', 'fine_prompt')}
+        self._history_prompts[voice_preset] = history_prompt
+        return history_prompt
+
+    def set_voice_preset(self, voice_preset: str) -> None:
+        """Switch voices; presets listed in config are already resident, others load here once."""
+        if voice_preset not in self._history_prompts:
+            self._load_history_prompt(voice_preset)
+        self.voice_preset = voice_preset
+
+    def _install_cancel_hooks(self) -> None:
+        # generate() loops over the semantic, coarse and fine models one token/codebook at a
+        # time, so a pre-forward check aborts within a single step instead of a whole clip.
+        # codec_decode() calls the codec's decoder directly (once per clip when batched), never
+        # codec_model itself, so the decoder is hooked to catch a stop before each waveform
+        for sub_model in (self.model.semantic, self.model.coarse_acoustics, self.model.fine_acoustics,
+                          self.model.codec_model.decoder):
+            sub_model.register_forward_pre_hook(self._check_cancelled)
+
+    def _check_cancelled(self, module, args) -> None:
+        if self._cancel_token is not None:
+            self._cancel_token.raise_if_cancelled()
+
+    def generate_speech(self, inputs, cancel_token: Optional[CancellationToken] = None) -> AudioData:
+        self._cancel_token = cancel_token
         try:
             speech_result = self._inference_model(inputs)
-            speech_result['audio_data'] = self.resample_audio_scipy(speech_result['audio_data'], self.sample_rate, 16000)
-            audio_data = AudioData(
-                data=speech_result['audio_data'],
-                format=AudioFormat.WAV,
-                name=f"{int(time.time())}.wav",
-                timestamp=time.time(),
-                sample_rate=self.sample_rate,
-                duration=speech_result['duration'],
-            )
-            
-            return audio_data
+            return self._to_audio_data(speech_result['audio_data'], speech_result['duration'])
             
+        except GenerationCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error generating speech: {e}")
             raise
+        finally:
+            self._cancel_token = None
     
+    def generate_speech_batch(self, texts: List[str], cancel_token: Optional[CancellationToken] = None) -> List[AudioData]:
+        """Synthesize every text in one padded generate call.
+
+        Bark takes one history prompt per batch, so this only batches texts that
+        share the generator's voice preset, which is all of them.
+        """
+        self._cancel_token = cancel_token
+        try:
+            speech_result = self._inference_model(self.prepare_inputs_for_model(texts), return_output_lengths=True)
+            # The batch is padded to its longest waveform; trim each one back to its own length
+            return [
+                self._to_audio_data(waveform[:length], length / self.sample_rate)
+                for waveform, length in zip(speech_result['audio_data'], speech_result['lengths'])
+            ]
+
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"Error generating batched speech: {e}")
+            raise
+        finally:
+            self._cancel_token = None
+
+    def _to_audio_data(self, waveform: np.ndarray, duration: float) -> AudioData:
+        # Native rate; TTSStage resamples to what downstream stages need
+        return AudioData(
+            data=waveform,
+            format=AudioFormat.WAV,
+            name=f"{time.time_ns()}.wav",
+            timestamp=time.time(),
+            sample_rate=self.sample_rate,
+            duration=duration,
+        )
+
+    def rendition_params(self) -> Dict[str, Any]:
+        return {
+            'generator': type(self).__name__,
+            'model_name': self.model_name,
+            'voice_preset': self.voice_preset,
+            'fine_temperature': self.fine_temperature,
+            'coarse_temperature': self.coarse_temperature,
+            'dtype': self.dtype,
+            'quantize_int8': self.quantize_int8,
+            'sample_rate': self.sample_rate,
+        }
+
     def prepare_inputs_for_model(self, texts: list[str]) -> Dict[str, Any]:
-        inputs = self.processor(
-            text=texts,
-            voice_preset=self.voice_preset,
-        ).to(self.device)
+        # Tokenize only; passing voice_preset here would reload the .npz files on every call
+        inputs = self.processor(text=texts).to(self.device)
+        inputs['history_prompt'] = self._history_prompts[self.voice_preset]
         
         return inputs
     
-    def _inference_model(self, inputs) -> Dict[str, Any]:
+    def _inference_model(self, inputs, return_output_lengths: bool = False) -> Dict[str, Any]:
         try:        
             with torch.inference_mode():
                 speech_values = self.model.generate(
                     **inputs,
                     use_cache=True,
-                    fine_temperature=0.3,
-                    coarse_temperature=0.6,
-                    pad_token_id=self.processor.tokenizer.pad_token_id
+                    fine_temperature=self.fine_temperature,
+                    coarse_temperature=self.coarse_temperature,
+                    pad_token_id=self.processor.tokenizer.pad_token_id,
+                    return_output_lengths=return_output_lengths
                 )
+
+            if return_output_lengths:
+                speech_values, lengths = speech_values
+                return {
+                    'audio_data': speech_values.cpu().numpy(),
+                    'lengths': [int(length) for length in lengths]
+                }
             
             audio_data = speech_values.cpu().numpy().squeeze()
             duration = len(audio_data) / self.sample_rate
@@ -86,17 +220,12 @@ class BarkTTSGenerator(AbstractTTSGenerator):
                 'duration': duration
             }
             
+        except GenerationCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error in model inference: {e}")
             raise
     
-    def resample_audio_scipy(self, audio_data: np.ndarray, orig_sr: int = 24000, target_sr: int = 16000) -> np.ndarray:
-        num_samples = int(len(audio_data) * float(target_sr) / orig_sr)
-        
-        resampled_audio = signal.resample(audio_data, num_samples)
-        
-        return resampled_audio
-    
     def save_audio(self, audio_data: AudioData, format: str = 'wav', output_dir: Optional[str] = None) -> str:
         try:
             import soundfile as sf
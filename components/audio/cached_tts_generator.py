@@ -0,0 +1,303 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from entities.entity_audio import AudioData
+from components.audio.abstract_tts_generator import AbstractTTSGenerator
+from constants.constants_enum import AudioFormat
+from monitoring import stage_metrics
+from utils.cancellation import CancellationToken
+
+logger = logging.getLogger(__name__)
+
+# (samples, sample_rate, duration) of one cached rendition
+Rendition = Tuple[np.ndarray, int, float]
+
+
+class TTSAudioCache:
+    """Content-addressed renditions in an LRU memory tier over a size-bounded disk tier.
+
+    Config keys: memory_entries, memory_bytes, disk_dir (None keeps the cache in
+    memory only) and disk_bytes. Pinned renditions live outside both LRUs and are
+    never evicted; on disk they are kept under disk_dir/pinned.
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        config = config or {}
+        self.memory_entries = config.get('memory_entries', 256)
+        self.memory_bytes = config.get('memory_bytes', 256 * 1024 * 1024)
+        self.disk_dir = config.get('disk_dir')
+        self.disk_bytes = config.get('disk_bytes', 2 * 1024 * 1024 * 1024)
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Rendition]" = OrderedDict()
+        self._memory_size = 0
+        # key -> file size, oldest access first
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_size = 0
+        self._pinned: Dict[str, Rendition] = {}
+        self._counts = {"pinned": 0, "memory": 0, "disk": 0, "miss": 0}
+
+        if self.disk_dir is not None:
+            os.makedirs(os.path.join(self.disk_dir, 'pinned'), exist_ok=True)
+            self._load_disk_index()
+            self._load_pinned()
+
+    def get(self, key: str) -> Optional[Rendition]:
+        with self._lock:
+            rendition, result = self._lookup(key)
+            self._counts[result] += 1
+        stage_metrics.TTS_CACHE_LOOKUPS_TOTAL.inc(result)
+        return rendition
+
+    def put(self, key: str, rendition: Rendition) -> None:
+        rendition = _frozen(rendition)
+        with self._lock:
+            self._put_memory(key, rendition)
+            if self.disk_dir is not None and key not in self._disk:
+                self._put_disk(key, rendition)
+
+    def pin(self, key: str, rendition: Rendition) -> None:
+        rendition = _frozen(rendition)
+        with self._lock:
+            self._pinned[key] = rendition
+            if self.disk_dir is not None:
+                _write_rendition(self._pinned_path(key), rendition)
+
+    def unpin(self, key: str) -> None:
+        with self._lock:
+            self._pinned.pop(key, None)
+            if self.disk_dir is not None and os.path.exists(self._pinned_path(key)):
+                os.remove(self._pinned_path(key))
+
+    def get_metrics(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = sum(self._counts.values())
+            return {
+                "pinned_hits": self._counts["pinned"],
+                "memory_hits": self._counts["memory"],
+                "disk_hits": self._counts["disk"],
+                "misses": self._counts["miss"],
+                "hit_rate": (lookups - self._counts["miss"]) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_size,
+                "pinned_entries": len(self._pinned),
+            }
+
+    def _lookup(self, key: str) -> Tuple[Optional[Rendition], str]:
+        if key in self._pinned:
+            return self._pinned[key], "pinned"
+
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key], "memory"
+
+        if key in self._disk:
+            try:
+                rendition = _read_rendition(self._disk_path(key))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Dropping unreadable TTS cache entry {key}: {e}")
+                self._remove_disk(key)
+                return None, "miss"
+            self._disk.move_to_end(key)
+            try:
+                os.utime(self._disk_path(key))
+            except OSError:
+                # Evicted by another process since the read; the rendition in hand is still good
+                self._remove_disk(key)
+            # Promote, so the next hit skips the disk read
+            self._put_memory(key, rendition)
+            return rendition, "disk"
+
+        return None, "miss"
+
+    def _put_memory(self, key: str, rendition: Rendition) -> None:
+        if key in self._memory:
+            self._memory_size -= self._memory.pop(key)[0].nbytes
+        self._memory[key] = rendition
+        self._memory_size += rendition[0].nbytes
+        while len(self._memory) > 1 and (len(self._memory) > self.memory_entries or self._memory_size > self.memory_bytes):
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= evicted[0].nbytes
+            stage_metrics.TTS_CACHE_EVICTIONS_TOTAL.inc("memory")
+
+    def _put_disk(self, key: str, rendition: Rendition) -> None:
+        path = self._disk_path(key)
+        try:
+            _write_rendition(path, rendition)
+        except OSError as e:
+            logger.warning(f"Could not write TTS cache entry {key}: {e}")
+            return
+        size = os.path.getsize(path)
+        self._disk[key] = size
+        self._disk_size += size
+        while len(self._disk) > 1 and self._disk_size > self.disk_bytes:
+            self._remove_disk(next(iter(self._disk)))
+            stage_metrics.TTS_CACHE_EVICTIONS_TOTAL.inc("disk")
+
+    def _remove_disk(self, key: str) -> None:
+        self._disk_size -= self._disk.pop(key)
+        try:
+            os.remove(self._disk_path(key))
+        except FileNotFoundError:
+            pass
+
+    def _load_disk_index(self) -> None:
+        entries = []
+        for file_name in os.listdir(self.disk_dir):
+            path = os.path.join(self.disk_dir, file_name)
+            if file_name.endswith('.npz') and os.path.isfile(path):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, file_name[:-len('.npz')], stat.st_size))
+        # Least recently used first, so eviction resumes where the last process left off
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+
+    def _load_pinned(self) -> None:
+        pinned_dir = os.path.join(self.disk_dir, 'pinned')
+        for file_name in os.listdir(pinned_dir):
+            if file_name.endswith('.npz'):
+                self._pinned[file_name[:-len('.npz')]] = _read_rendition(os.path.join(pinned_dir, file_name))
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.npz")
+
+    def _pinned_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, 'pinned', f"{key}.npz")
+
+
+class CachedTTSGenerator(AbstractTTSGenerator):
+    """Serves repeated texts from a TTSAudioCache instead of running the wrapped generator.
+
+    The key is the normalized text plus the wrapped generator's rendition_params()
+    (model, voice preset, sampling temperatures...), so changing any of them
+    misses instead of returning audio in the wrong voice. Bark samples, so every
+    miss is a new take; pin() fixes the take a key always returns.
+    """
+
+    def __init__(self, tts_generator: AbstractTTSGenerator, config: Dict[str, Any] = None):
+        self.tts_generator = tts_generator
+        self.cache = TTSAudioCache(config)
+
+    def prepare_inputs_for_model(self, texts) -> Dict[str, Any]:
+        # The wrapped generator prepares inputs only on a miss
+        return {"texts": list(texts)}
+
+    def generate_speech(self, inputs, cancel_token: Optional[CancellationToken] = None) -> AudioData:
+        texts = inputs["texts"]
+        key = self.cache_key(" ".join(texts))
+        rendition = self.cache.get(key)
+        if rendition is not None:
+            return _to_audio_data(rendition)
+
+        audio_data = self.tts_generator.generate_speech(self.tts_generator.prepare_inputs_for_model(texts), cancel_token=cancel_token)
+        self.cache.put(key, _to_rendition(audio_data))
+        return audio_data
+
+    def generate_speech_batch(self, texts: List[str], cancel_token: Optional[CancellationToken] = None) -> List[AudioData]:
+        keys = [self.cache_key(text) for text in texts]
+        results: List[Optional[AudioData]] = []
+        for key in keys:
+            rendition = self.cache.get(key)
+            results.append(None if rendition is None else _to_audio_data(rendition))
+
+        misses = [index for index, result in enumerate(results) if result is None]
+        if len(misses) == 1:
+            generated = [self.tts_generator.generate_speech(
+                self.tts_generator.prepare_inputs_for_model([texts[misses[0]]]), cancel_token=cancel_token
+            )]
+        elif misses:
+            generated = self.tts_generator.generate_speech_batch([texts[index] for index in misses], cancel_token=cancel_token)
+        else:
+            generated = []
+
+        for index, audio_data in zip(misses, generated):
+            self.cache.put(keys[index], _to_rendition(audio_data))
+            results[index] = audio_data
+        return results
+
+    def cache_key(self, text: str) -> str:
+        signature = {"text": normalize_text(text), **self.tts_generator.rendition_params()}
+        return hashlib.sha256(json.dumps(signature, sort_keys=True, default=str).encode()).hexdigest()
+
+    def pin(self, text: str, audio_data: AudioData = None) -> bool:
+        """Always serve `audio_data` (default: the currently cached take) for `text`; False if there is none."""
+        key = self.cache_key(text)
+        rendition = _to_rendition(audio_data) if audio_data is not None else self.cache.get(key)
+        if rendition is None:
+            return False
+        self.cache.pin(key, rendition)
+        return True
+
+    def unpin(self, text: str) -> None:
+        self.cache.unpin(self.cache_key(text))
+
+    def rendition_params(self) -> Dict[str, Any]:
+        return self.tts_generator.rendition_params()
+
+    def save_audio(self, audio_data: AudioData, format: str = 'wav', output_dir: Optional[str] = None) -> str:
+        return self.tts_generator.save_audio(audio_data, format=format, output_dir=output_dir)
+
+    def load_audio(self, audio_path: str) -> AudioData:
+        return self.tts_generator.load_audio(audio_path)
+
+    def delete_audio(self, audio_path: str) -> None:
+        return self.tts_generator.delete_audio(audio_path)
+
+
+def normalize_text(text: str) -> str:
+    """Fold Unicode forms, typographic quotes and whitespace; case and punctuation still shape prosody."""
+    text = unicodedata.normalize('NFKC', text)
+    text = text.translate(str.maketrans({'‘': "'", '’': "'", '“': '"', '”': '"'}))
+    return " ".join(text.split())
+
+
+def _to_rendition(audio_data: AudioData) -> Rendition:
+    return np.asarray(audio_data.data), audio_data.sample_rate, audio_data.duration
+
+
+def _to_audio_data(rendition: Rendition) -> AudioData:
+    samples, sample_rate, duration = rendition
+    # A fresh timestamp, so a hit is not mistaken for audio from before a barge-in
+    return AudioData(
+        data=samples,
+        format=AudioFormat.WAV,
+        name=f"{time.time_ns()}.wav",
+        timestamp=time.time(),
+        sample_rate=sample_rate,
+        duration=duration,
+    )
+
+
+def _frozen(rendition: Rendition) -> Rendition:
+    # Hits share one array across AudioData objects, so nobody may write to it
+    samples, sample_rate, duration = rendition
+    samples = np.array(samples, copy=True)
+    samples.setflags(write=False)
+    return samples, int(sample_rate), float(duration)
+
+
+def _write_rendition(path: str, rendition: Rendition) -> None:
+    samples, sample_rate, duration = rendition
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as f:
+        np.savez(f, samples=samples, sample_rate=sample_rate, duration=duration)
+    os.replace(temp_path, path)
+
+
+def _read_rendition(path: str) -> Rendition:
+    with np.load(path) as archive:
+        samples = archive['samples']
+        samples.setflags(write=False)
+        return samples, int(archive['sample_rate']), float(archive['duration'])
@@ -0,0 +1,107 @@
+import os
+import time
+import zlib
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from entities.entity_audio import AudioData
+from components.audio.abstract_tts_generator import AbstractTTSGenerator
+from constants.constants_enum import AudioFormat
+from utils.latency_profile import LatencyProfile
+from utils.cancellation import CancellationToken
+
+logger = logging.getLogger(__name__)
+
+
+class SyntheticTTSGenerator(AbstractTTSGenerator):
+    """Deterministic speech-like audio with a configurable latency profile, for load testing.
+
+    The same text and seed always give the same samples. Audio length follows the
+    word count, and generation latency is drawn from `config['latency']` (see
+    LatencyProfile), optionally scaled by the audio duration.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+
+        self.sample_rate = config.get('sample_rate', 16000)
+        self.words_per_second = config.get('words_per_second', 2.5)
+        self.min_duration = config.get('min_duration', 0.5)
+        self.max_duration = config.get('max_duration', 30.0)
+        self.seed = config.get('seed', 0)
+        self.latency = LatencyProfile({'seed': self.seed, **config.get('latency', {})})
+
+    def prepare_inputs_for_model(self, texts) -> Dict[str, Any]:
+        return {"texts": list(texts)}
+
+    def generate_speech(self, inputs, cancel_token: Optional[CancellationToken] = None) -> AudioData:
+        text = " ".join(inputs["texts"])
+        duration = self._duration(text)
+        self.latency.spend(duration, cancel_token)
+        return self._to_audio_data(text, duration)
+
+    def generate_speech_batch(self, texts: List[str], cancel_token: Optional[CancellationToken] = None) -> List[AudioData]:
+        # Models a padded batch: one call costs as much as its longest clip
+        durations = [self._duration(text) for text in texts]
+        self.latency.spend(max(durations), cancel_token)
+        return [self._to_audio_data(text, duration) for text, duration in zip(texts, durations)]
+
+    def rendition_params(self) -> Dict[str, Any]:
+        return {
+            'generator': type(self).__name__,
+            'sample_rate': self.sample_rate,
+            'words_per_second': self.words_per_second,
+            'min_duration': self.min_duration,
+            'max_duration': self.max_duration,
+            'seed': self.seed,
+        }
+
+    def _duration(self, text: str) -> float:
+        return min(max(len(text.split()) / self.words_per_second, self.min_duration), self.max_duration)
+
+    def _to_audio_data(self, text: str, duration: float) -> AudioData:
+        return AudioData(
+            data=self._synthesize(text, duration),
+            format=AudioFormat.WAV,
+            name=f"{time.time_ns()}.wav",
+            timestamp=time.time(),
+            sample_rate=self.sample_rate,
+            duration=duration,
+        )
+
+    def _synthesize(self, text: str, duration: float) -> np.ndarray:
+        rng = np.random.default_rng([self.seed, zlib.crc32(text.encode())])
+        t = np.arange(int(duration * self.sample_rate), dtype=np.float32) / self.sample_rate
+
+        # A voiced tone under a ~4 Hz syllable envelope, with a little breath noise
+        pitch = rng.uniform(100.0, 220.0)
+        envelope = 0.5 * (1.0 - np.cos(2 * np.pi * rng.uniform(3.0, 5.0) * t))
+        voiced = np.sin(2 * np.pi * pitch * t) + 0.3 * np.sin(4 * np.pi * pitch * t)
+        noise = rng.normal(0.0, 0.02, size=t.shape)
+        return (0.3 * envelope * voiced + noise).astype(np.float32)
+
+    def save_audio(self, audio_data: AudioData, format: str = 'wav', output_dir: Optional[str] = None) -> str:
+        import soundfile as sf
+
+        output_path = f"{output_dir}/{audio_data.name}" if output_dir else audio_data.name
+        sf.write(output_path, audio_data.data, audio_data.sample_rate)
+        return str(output_path)
+
+    def load_audio(self, audio_path: str) -> AudioData:
+        import soundfile as sf
+
+        data, sample_rate = sf.read(audio_path, dtype='float32')
+        return AudioData(
+            data=data,
+            format=AudioFormat.WAV,
+            name=os.path.basename(audio_path),
+            timestamp=time.time(),
+            sample_rate=sample_rate,
+            duration=len(data) / sample_rate,
+        )
+
+    def delete_audio(self, audio_path: str) -> None:
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
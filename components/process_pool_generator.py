@@ -0,0 +1,198 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from entities.entity_audio import AudioData
+from entities.entity_visual import MotionData
+from components.audio.abstract_tts_generator import AbstractTTSGenerator
+from components.visual.abstract_motion_generator import AbstractMotionGenerator
+from utils.shared_memory import SharedArray, share_array, read_shared_array, take_shared_array, free_shared_array
+from utils.cancellation import CancellationToken, GenerationCancelled
+
+logger = logging.getLogger(__name__)
+
+# Generator owned by the current worker process, built once by _init_worker
+_worker_generator = None
+
+
+def _init_worker(generator_factory: Callable[[Dict[str, Any]], Any], generator_config: Dict[str, Any],
+                 threads_per_worker: int, pin_cores: bool, worker_counter) -> None:
+    global _worker_generator
+    with worker_counter.get_lock():
+        worker_index = worker_counter.value
+        worker_counter.value += 1
+
+    # Give every worker its own slice of cores so stages do not fight over them
+    if pin_cores and hasattr(os, "sched_setaffinity"):
+        cpu_count = os.cpu_count() or 1
+        first_core = (worker_index * threads_per_worker) % cpu_count
+        os.sched_setaffinity(0, {(first_core + i) % cpu_count for i in range(threads_per_worker)})
+
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+        torch.set_num_interop_threads(1)
+    except (ImportError, RuntimeError) as e:
+        logger.debug(f"Could not set torch threads in worker {worker_index}: {e}")
+
+    _worker_generator = generator_factory(generator_config)
+
+
+def _call_worker_generator(method_name: str, *args, **kwargs) -> Any:
+    return getattr(_worker_generator, method_name)(*args, **kwargs)
+
+
+def _generate_speech_in_worker(texts) -> AudioData:
+    inputs = _worker_generator.prepare_inputs_for_model(texts)
+    audio_data = _worker_generator.generate_speech(inputs)
+    audio_data.data = share_array(np.asarray(audio_data.data))
+    return audio_data
+
+
+def _generate_motion_in_worker(audio_data: AudioData, seed_motion: Optional[MotionData]) -> MotionData:
+    audio_data.data = read_shared_array(audio_data.data)
+    if seed_motion is not None:
+        seed_motion.poses = read_shared_array(seed_motion.poses)
+
+    motion_data = _worker_generator.generate_motion(audio_data=audio_data, seed_motion=seed_motion)
+    motion_data.poses = share_array(np.asarray(motion_data.poses, dtype=np.float32))
+    return motion_data
+
+
+class ProcessPoolGenerator:
+    """Hosts a generator in worker processes so its inference runs outside this process's GIL.
+
+    Config keys: generator_factory (a picklable callable taking generator_config,
+    usually the generator class), generator_config, max_workers,
+    threads_per_worker and pin_cores. Workers are spawned, not forked, so torch
+    state never leaks across the fork.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+
+        self.generator_factory = config['generator_factory']
+        self.generator_config = config.get('generator_config', {})
+        self.max_workers = config.get('max_workers', 1)
+        self.threads_per_worker = config.get('threads_per_worker', 1)
+        self.pin_cores = config.get('pin_cores', True)
+        self.cancel_poll_interval = config.get('cancel_poll_interval', 0.005)
+
+        mp_context = multiprocessing.get_context(config.get('start_method', 'spawn'))
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=mp_context,
+            initializer=_init_worker,
+            initargs=(
+                self.generator_factory,
+                self.generator_config,
+                self.threads_per_worker,
+                self.pin_cores,
+                mp_context.Value('i', 0)
+            )
+        )
+
+    def warm_up(self) -> None:
+        """Start every worker and build its generator before the first real request."""
+        futures = [self._executor.submit(os.getpid) for _ in range(self.max_workers)]
+        for future in futures:
+            future.result()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _call(self, method_name: str, *args, **kwargs) -> Any:
+        return self._executor.submit(_call_worker_generator, method_name, *args, **kwargs).result()
+
+
+class ProcessPoolTTSGenerator(ProcessPoolGenerator, AbstractTTSGenerator):
+    """TTS generator whose model runs in worker processes; PCM comes back through shared memory."""
+
+    def prepare_inputs_for_model(self, texts) -> Dict[str, Any]:
+        # The processor lives next to the model in the worker, so only the texts travel
+        return texts
+
+    def generate_speech(self, inputs, cancel_token: Optional[CancellationToken] = None) -> AudioData:
+        future = self._executor.submit(_generate_speech_in_worker, inputs)
+        if cancel_token is not None:
+            _wait_or_abandon(future, cancel_token, self.cancel_poll_interval)
+
+        audio_data = future.result()
+        audio_data.data = take_shared_array(audio_data.data)
+        return audio_data
+
+    def rendition_params(self) -> Dict[str, Any]:
+        # The worker's generator is built from exactly these, so they identify its renditions
+        return {
+            'generator': getattr(self.generator_factory, '__name__', repr(self.generator_factory)),
+            'generator_config': self.generator_config,
+        }
+
+    def save_audio(self, audio_data: AudioData, format: str = 'wav', output_dir: Optional[str] = None) -> str:
+        return self._call('save_audio', audio_data, format=format, output_dir=output_dir)
+
+    def load_audio(self, audio_path: str) -> AudioData:
+        return self._call('load_audio', audio_path)
+
+    def delete_audio(self, audio_path: str) -> None:
+        return self._call('delete_audio', audio_path)
+
+
+class ProcessPoolMotionGenerator(ProcessPoolGenerator, AbstractMotionGenerator):
+    """Motion generator whose model runs in worker processes; PCM and poses move through shared memory."""
+
+    def generate_motion(self, audio_data: AudioData, seed_motion: Optional[MotionData] = None) -> MotionData:
+        shared_audio = share_array(np.asarray(audio_data.data))
+        shared_seed = None
+        if seed_motion is not None:
+            shared_seed = share_array(np.asarray(seed_motion.poses, dtype=np.float32))
+
+        try:
+            motion_data = self._executor.submit(
+                _generate_motion_in_worker,
+                _with_data(audio_data, shared_audio),
+                None if seed_motion is None else _with_poses(seed_motion, shared_seed)
+            ).result()
+        finally:
+            free_shared_array(shared_audio)
+            if shared_seed is not None:
+                free_shared_array(shared_seed)
+
+        motion_data.poses = take_shared_array(motion_data.poses)
+        return motion_data
+
+    def save_motion_data(self, motion_data: MotionData, format: str = 'csv', output_dir: str = None) -> str:
+        return self._call('save_motion_data', motion_data=motion_data, format=format, output_dir=output_dir)
+
+    def load_motion_data(self, motion_data_path: str) -> MotionData:
+        return self._call('load_motion_data', motion_data_path)
+
+    def delete_motion_data(self, motion_data_path: str) -> None:
+        return self._call('delete_motion_data', motion_data_path)
+
+
+def _wait_or_abandon(future: Future, cancel_token: CancellationToken, poll_interval: float) -> None:
+    # The worker cannot be interrupted, so a cancelled request is left to finish and its PCM freed
+    while not future.done():
+        if cancel_token.wait(poll_interval):
+            if not future.cancel():
+                future.add_done_callback(_free_abandoned_audio)
+            raise GenerationCancelled()
+
+
+def _free_abandoned_audio(future: Future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        free_shared_array(future.result().data)
+
+
+def _with_data(audio_data: AudioData, shared_audio: SharedArray) -> AudioData:
+    # Shallow copy so the caller's AudioData keeps its PCM while only the handle is pickled
+    return AudioData(**{**vars(audio_data), 'data': shared_audio})
+
+
+def _with_poses(motion_data: MotionData, shared_poses: SharedArray) -> MotionData:
+    return MotionData(**{**vars(motion_data), 'poses': shared_poses})
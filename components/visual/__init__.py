@@ -2,10 +2,14 @@ from .camn_motion_generator import CamnMotionGenerator
 from .abstract_face_generator import AbstractFaceGenerator
 from .nvidia_face_generator import NvidiaFaceGenerator
 from .abstract_motion_generator import AbstractMotionGenerator
+from .synthetic_face_generator import SyntheticFaceGenerator
+from .synthetic_motion_generator import SyntheticMotionGenerator
 
 __all__ = [
     'CamnMotionGenerator',
     'AbstractFaceGenerator',
     'NvidiaFaceGenerator',
     'AbstractMotionGenerator',
+    'SyntheticFaceGenerator',
+    'SyntheticMotionGenerator',
 ]
@@ -1,7 +1,12 @@
+import time
 from abc import ABC, abstractmethod
+
+import numpy as np
+
+from constants.constants_enum import AudioFormat
 from entities.entity_audio import AudioData
 from entities.entity_visual import FaceExpression
-from typing import Iterator, Optional, Dict, Any
+from typing import AsyncIterable, AsyncIterator, Iterator, Optional, Dict, Any
 
 class AbstractFaceGenerator(ABC):    
     @abstractmethod
@@ -9,6 +14,32 @@ class AbstractFaceGenerator(ABC):
         """Generate face expression for single audio data."""
         pass
 
+    async def generate_face_expression_stream(self, audio_data: AudioData) -> AsyncIterator[FaceExpression]:
+        """Yield face expression chunks as they become available, the last with is_last_chunk set.
+
+        Generators that can't produce partial output yield the whole clip as one chunk.
+        """
+        yield await self.generate_face_expression(audio_data)
+
+    async def generate_face_expression_from_source(self, audio_chunks: AsyncIterable[np.ndarray], sample_rate: int,
+                                                   audio_name: str) -> AsyncIterator[FaceExpression]:
+        """Animate audio that is still being produced, e.g. clause by clause by streaming TTS.
+
+        Chunks carry time codes relative to the start of the whole source. Generators that
+        can't consume audio incrementally wait for the source to close and animate it as one clip.
+        """
+        data = np.concatenate([np.asarray(chunk) async for chunk in audio_chunks] or [np.zeros(0, dtype=np.float32)])
+        audio_data = AudioData(
+            data=data,
+            format=AudioFormat.WAV,
+            name=f"{audio_name}.wav",
+            timestamp=time.time(),
+            sample_rate=sample_rate,
+            duration=len(data) / sample_rate,
+        )
+        async for face_expression in self.generate_face_expression_stream(audio_data):
+            yield face_expression
+
     @abstractmethod
     def save_face_expression(self, face_expression: FaceExpression, format: str = 'json') -> str:
         """Save face expression data to file."""
@@ -1,7 +1,7 @@
 import time
 import logging
 import numpy
-from typing import Dict, Any, Optional
+from typing import AsyncIterable, AsyncIterator, Dict, Any, Optional
 
 from entities.entity_audio import AudioData
 from entities.entity_visual import FaceExpression
@@ -9,7 +9,8 @@ from components.visual.abstract_face_generator import AbstractFaceGenerator
 from models.audio2face.scripts.audio2face_api_client.a2f.client import service
 import asyncio
 from nvidia_ace.services.a2f_controller.v1_pb2_grpc import A2FControllerServiceStub
-from models.audio2face.scripts.audio2face_api_client.a2f.client import auth
+from utils.async_runtime import get_shared_event_loop
+from utils.grpc_channel_pool import GrpcChannelPool
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +23,20 @@ class NvidiaFaceGenerator(AbstractFaceGenerator):
         self.api_key = config.get('api_key', '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')
         self.function_id = config.get('function_id', '0961a6da-fb9e-4f2e-8491-247e5fd7bf8d')
         self.face_config_path = config.get('face_config_path', 'configs/config_face/config_claire.yml')
+        # Longest audio message uploaded; audio from a streaming source is sent as soon as it arrives
+        self.audio_chunk_seconds = config.get('audio_chunk_seconds', 1.0)
+
+        # Channels, and their TLS/HTTP2 setup, are reused across utterances instead of opened per call
+        self._channel_pool = GrpcChannelPool({
+            'uri': config.get('uri', 'grpc.nvcf.nvidia.com:443'),
+            'use_ssl': config.get('use_ssl', True),
+            'ssl_cert': config.get('ssl_cert'),
+            'metadata': [("function-id", self.function_id), ("authorization", "Bearer " + self.api_key)],
+            'max_channels': config.get('max_channels', 2),
+            'max_streams_per_channel': config.get('max_streams_per_channel', 4),
+            'keepalive_time_ms': config.get('keepalive_time_ms', 20000),
+            'keepalive_timeout_ms': config.get('keepalive_timeout_ms', 10000),
+        }, stub_factory=A2FControllerServiceStub)
         
         logger.info(f"Audio2FaceGenerator initialized successfully")
     
@@ -30,16 +45,18 @@ class NvidiaFaceGenerator(AbstractFaceGenerator):
         try:
             face_result = await self._inference_model(audio_data)
             
-            frame_count_result = len(face_result['animation_data'])
+            frame_count_result = len(face_result['time_codes'])
             audio_name_result = audio_data.name.split('.')[0]
 
             face_expression = FaceExpression(
                 audio_name=audio_name_result,
-                blend_shapes=face_result['animation_data'],
+                blend_shapes=face_result['blend_shapes'],
                 emotion=face_result['emotion_data'],
                 timestamp=time.time(),
                 duration=audio_data.duration,
-                frame_count= frame_count_result
+                frame_count= frame_count_result,
+                time_codes=face_result['time_codes'],
+                blend_shape_names=face_result['blendshape_names']
             )
             
             return face_expression
@@ -48,23 +65,104 @@ class NvidiaFaceGenerator(AbstractFaceGenerator):
             logger.error(f"Error generating face expression: {e}")
             raise
     
-    async def _inference_model(self, audio_data: AudioData) -> Dict[str, Any]:
-        metadata_args = [("function-id", self.function_id), ("authorization", "Bearer " + self.api_key)]
-        channel = auth.create_channel(uri="grpc.nvcf.nvidia.com:443", use_ssl=True, metadata=metadata_args)
-                
-        stub = A2FControllerServiceStub(channel)
+    async def generate_face_expression_stream(self, audio_data: AudioData) -> AsyncIterator[FaceExpression]:
+        """Yield one FaceExpression per A2F animation message as it arrives, then an empty
+        chunk with is_last_chunk set once the server closes the stream."""
+        async def whole_clip():
+            yield audio_data.data
+
+        async for face_expression in self.generate_face_expression_from_source(
+                whole_clip(), audio_data.sample_rate, audio_data.name.split('.')[0]):
+            yield face_expression
+
+    async def generate_face_expression_from_source(self, audio_chunks: AsyncIterable[numpy.ndarray], sample_rate: int,
+                                                   audio_name: str) -> AsyncIterator[FaceExpression]:
+        """Upload audio to A2F while the source is still producing it, yielding animation as it comes back."""
+        async with self._channel_pool.stub() as stub:
+            stream = stub.ProcessAudioStream()
+            write = asyncio.create_task(service.write_to_stream_from_source(
+                stream, self.face_config_path, audio_chunks, sample_rate, self.audio_chunk_seconds
+            ))
+            # The server waits for the rest of the audio, so a failed write would otherwise leave the read hanging
+            write.add_done_callback(lambda task: stream.cancel() if not task.cancelled() and task.exception() else None)
 
-        audio_np = numpy.frombuffer(audio_data.data, dtype=numpy.int16)
+            try:
+                chunk_index = 0
+                end_time = 0.0
+                frame_interval = 1.0 / 30
+                blend_shape_names = []
+                async for chunk in service.read_stream_chunks(stream):
+                    time_codes = chunk['time_codes']
+                    blend_shape_names = chunk['blendshape_names']
+                    start_time = float(time_codes[0]) if len(time_codes) else end_time
+                    if len(time_codes) > 1:
+                        frame_interval = float(time_codes[-1] - time_codes[0]) / (len(time_codes) - 1)
+                    end_time = float(time_codes[-1]) + frame_interval if len(time_codes) else end_time
+
+                    yield FaceExpression(
+                        audio_name=audio_name,
+                        blend_shapes=chunk['blend_shapes'],
+                        emotion=chunk['emotion_data'],
+                        timestamp=time.time(),
+                        duration=end_time - start_time,
+                        frame_count=len(time_codes),
+                        start_time=start_time,
+                        chunk_index=chunk_index,
+                        is_last_chunk=False,
+                        time_codes=time_codes,
+                        blend_shape_names=blend_shape_names
+                    )
+                    chunk_index += 1
+
+                await write
+                # The last animation message is only known to be last at EOF
+                yield FaceExpression(
+                    audio_name=audio_name,
+                    blend_shapes=numpy.empty((0, len(blend_shape_names)), dtype=numpy.float32),
+                    emotion={"input": [], "a2e_output": [], "a2f_smoothed_output": []},
+                    timestamp=time.time(),
+                    duration=0.0,
+                    frame_count=0,
+                    start_time=end_time,
+                    chunk_index=chunk_index,
+                    is_last_chunk=True,
+                    time_codes=numpy.empty(0, dtype=numpy.float64),
+                    blend_shape_names=blend_shape_names
+                )
+            except BaseException:
+                write.cancel()
+                stream.cancel()
+                if write.done() and not write.cancelled() and write.exception() is not None:
+                    raise write.exception()
+                raise
+
+    async def _inference_model(self, audio_data: AudioData) -> Dict[str, Any]:
+        async with self._channel_pool.stub() as stub:
+            stream = stub.ProcessAudioStream()
+            write = asyncio.create_task(service.write_to_stream_with_data(
+                stream, self.face_config_path, audio_data.data, audio_data.sample_rate, self.audio_chunk_seconds
+            ))
+            # A2F animates at 30 fps; sizing the frame buffer for that avoids regrowing it
+            read = asyncio.create_task(service.read_stream_data_only(stream, expected_frames=int(audio_data.duration * 30) + 1))
 
-        stream = stub.ProcessAudioStream()
-        write = asyncio.create_task(service.write_to_stream_with_data(stream, self.face_config_path, audio_np, audio_data.sample_rate))
-        read = asyncio.create_task(service.read_stream_data_only(stream))
+            try:
+                await write
+                return await read
+            except BaseException:
+                # Barge-in or a failed write: stop the server generating frames nobody will
+                # play, rather than leaving a dead stream open on the shared connection
+                write.cancel()
+                read.cancel()
+                stream.cancel()
+                raise
 
-        await write
-        return await read
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Close the pooled channels, giving streams still running up to `timeout` seconds."""
+        future = asyncio.run_coroutine_threadsafe(self._channel_pool.close(grace=timeout), get_shared_event_loop())
+        future.result(timeout + 1.0)
    
     
-    def save_face_expression(self, face_expression: FaceExpression, format: str = 'json') -> str:
+    def save_face_expression(self, face_expression: FaceExpression, format: str = 'json', output_dir: Optional[str] = None) -> str:
         pass
 
     def load_face_expression(self, face_expression_path: str) -> FaceExpression:
@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import zlib
+import logging
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional
+
+import numpy as np
+
+from entities.entity_audio import AudioData
+from entities.entity_visual import FaceExpression
+from components.visual.abstract_face_generator import AbstractFaceGenerator
+from constants.constants_enum import EmotionType, FaceBlendShape
+from utils.latency_profile import LatencyProfile
+
+logger = logging.getLogger(__name__)
+
+# The 52 ARKit blendshapes Audio2Face streams back, in FaceBlendShape order
+ARKIT_BLEND_SHAPES = [shape.name for shape in FaceBlendShape if shape.value <= FaceBlendShape.TongueOut.value]
+
+
+class SyntheticFaceGenerator(AbstractFaceGenerator):
+    """Deterministic Audio2Face-shaped output with a configurable latency profile, for load testing.
+
+    Frames use the same float32 (frames x blendshapes) layout as the A2F client, with
+    JawOpen following the audio envelope. Identical audio gives identical frames.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+
+        self.fps = config.get('fps', 30)
+        self.emotion_interval = config.get('emotion_interval', 1.0)
+        self.seed = config.get('seed', 0)
+        # Seconds of animation per streamed chunk, like A2F's animation messages
+        self.chunk_seconds = config.get('chunk_seconds', 1.0)
+        self.latency = LatencyProfile({'seed': self.seed, **config.get('latency', {})})
+
+    async def generate_face_expression(self, audio_data: AudioData, seed_expression: Optional[FaceExpression] = None) -> FaceExpression:
+        await self.latency.spend_async(audio_data.duration)
+
+        samples = _audio_samples(audio_data.data)
+        rng = np.random.default_rng([self.seed, zlib.crc32(samples.tobytes())])
+        frame_count = max(1, int(audio_data.duration * self.fps))
+        blend_shapes = self._blend_shape_frames(samples, frame_count, rng)
+
+        return FaceExpression(
+            audio_name=audio_data.name.split('.')[0],
+            blend_shapes=blend_shapes,
+            emotion=self._emotion_frames(audio_data.duration, rng),
+            timestamp=time.time(),
+            duration=audio_data.duration,
+            frame_count=frame_count,
+            time_codes=np.arange(frame_count) / self.fps,
+            blend_shape_names=ARKIT_BLEND_SHAPES
+        )
+
+    async def generate_face_expression_stream(self, audio_data: AudioData) -> AsyncIterator[FaceExpression]:
+        # The call's fixed latency comes before the first chunk, then each chunk costs its share of audio time
+        await self.latency.wait_async(self.latency.sample())
+
+        samples = _audio_samples(audio_data.data)
+        rng = np.random.default_rng([self.seed, zlib.crc32(samples.tobytes())])
+        frame_count = max(1, int(audio_data.duration * self.fps))
+        blend_shapes = self._blend_shape_frames(samples, frame_count, rng)
+        time_codes = np.arange(frame_count) / self.fps
+        emotion = self._emotion_frames(audio_data.duration, rng)
+
+        frames_per_chunk = max(1, int(self.chunk_seconds * self.fps))
+        starts = range(0, frame_count, frames_per_chunk)
+        for chunk_index, start in enumerate(starts):
+            end = min(start + frames_per_chunk, frame_count)
+            start_time, end_time = start / self.fps, end / self.fps
+            await self.latency.wait_async(self.latency.per_audio_second * (end_time - start_time))
+
+            is_last_chunk = end == frame_count
+            yield FaceExpression(
+                audio_name=audio_data.name.split('.')[0],
+                blend_shapes=blend_shapes[start:end],
+                emotion={
+                    key: [key_frame for key_frame in key_frames
+                          if start_time <= key_frame["time_code"] and (is_last_chunk or key_frame["time_code"] < end_time)]
+                    for key, key_frames in emotion.items()
+                },
+                timestamp=time.time(),
+                duration=end_time - start_time,
+                frame_count=end - start,
+                start_time=start_time,
+                chunk_index=chunk_index,
+                is_last_chunk=is_last_chunk,
+                time_codes=time_codes[start:end],
+                blend_shape_names=ARKIT_BLEND_SHAPES
+            )
+
+    async def generate_face_expression_from_source(self, audio_chunks: AsyncIterable[np.ndarray], sample_rate: int,
+                                                   audio_name: str) -> AsyncIterator[FaceExpression]:
+        # Like A2F fed live: the call's fixed latency once, then each piece of audio is animated as it arrives
+        await self.latency.wait_async(self.latency.sample())
+
+        frames_per_chunk = max(1, int(self.chunk_seconds * self.fps))
+        received_samples = emitted_frames = chunk_index = 0
+        async for audio in audio_chunks:
+            samples = _audio_samples(audio)
+            received_samples += len(samples)
+            frame_count = int(received_samples * self.fps / sample_rate) - emitted_frames
+            if frame_count <= 0:
+                continue
+
+            rng = np.random.default_rng([self.seed, zlib.crc32(samples.tobytes())])
+            blend_shapes = self._blend_shape_frames(samples, frame_count, rng)
+            piece_start = emitted_frames / self.fps
+            emotion = {
+                key: [{**key_frame, "time_code": key_frame["time_code"] + piece_start} for key_frame in key_frames]
+                for key, key_frames in self._emotion_frames(frame_count / self.fps, rng).items()
+            }
+            for start in range(0, frame_count, frames_per_chunk):
+                end = min(start + frames_per_chunk, frame_count)
+                await self.latency.wait_async(self.latency.per_audio_second * (end - start) / self.fps)
+                yield FaceExpression(
+                    audio_name=audio_name,
+                    blend_shapes=blend_shapes[start:end],
+                    emotion=emotion if start == 0 else {key: [] for key in emotion},
+                    timestamp=time.time(),
+                    duration=(end - start) / self.fps,
+                    frame_count=end - start,
+                    start_time=(emitted_frames + start) / self.fps,
+                    chunk_index=chunk_index,
+                    is_last_chunk=False,
+                    time_codes=np.arange(emitted_frames + start, emitted_frames + end) / self.fps,
+                    blend_shape_names=ARKIT_BLEND_SHAPES
+                )
+                chunk_index += 1
+            emitted_frames += frame_count
+
+        yield FaceExpression(
+            audio_name=audio_name,
+            blend_shapes=np.empty((0, len(ARKIT_BLEND_SHAPES)), dtype=np.float32),
+            emotion={"input": [], "a2e_output": [], "a2f_smoothed_output": []},
+            timestamp=time.time(),
+            duration=0.0,
+            frame_count=0,
+            start_time=emitted_frames / self.fps,
+            chunk_index=chunk_index,
+            is_last_chunk=True,
+            time_codes=np.empty(0),
+            blend_shape_names=ARKIT_BLEND_SHAPES
+        )
+
+    def _blend_shape_frames(self, samples: np.ndarray, frame_count: int, rng: np.random.Generator) -> np.ndarray:
+        # Slowly drifting low weights for every shape, jaw driven by loudness
+        drift = np.cumsum(rng.normal(0.0, 0.01, size=(frame_count, len(ARKIT_BLEND_SHAPES))), axis=0)
+        weights = np.clip(0.1 + drift, 0.0, 1.0).astype(np.float32)
+        energy = _frame_energy(samples, frame_count)
+        weights[:, FaceBlendShape.JawOpen.value] = energy / energy.max() if energy.max() > 0 else 0.0
+        return weights
+
+    def _emotion_frames(self, duration: float, rng: np.random.Generator) -> Dict[str, List[Dict[str, Any]]]:
+        emotions = [emotion.value for emotion in EmotionType if emotion is not EmotionType.NEUTRAL]
+        key_frames = []
+        for time_code in np.arange(0.0, max(duration, self.emotion_interval), self.emotion_interval):
+            key_frames.append({
+                "time_code": float(time_code),
+                "emotion_values": dict(zip(emotions, rng.uniform(0.0, 0.3, size=len(emotions)).tolist())),
+            })
+        return {"input": [], "a2e_output": key_frames, "a2f_smoothed_output": key_frames}
+
+    def save_face_expression(self, face_expression: FaceExpression, format: str = 'json', output_dir: Optional[str] = None) -> str:
+        if format != 'json':
+            raise ValueError(f"Unsupported format: {format}")
+
+        output_path = f"{output_dir}/{face_expression.audio_name}.json" if output_dir else f"{face_expression.audio_name}.json"
+        with open(output_path, 'w') as f:
+            json.dump({
+                'audio_name': face_expression.audio_name,
+                'blend_shapes': face_expression.blend_shapes.tolist(),
+                'emotion': face_expression.emotion,
+                'timestamp': face_expression.timestamp,
+                'duration': face_expression.duration,
+                'frame_count': face_expression.frame_count,
+                'time_codes': face_expression.time_codes.tolist() if face_expression.time_codes is not None else None,
+                'blend_shape_names': face_expression.blend_shape_names
+            }, f)
+        return str(output_path)
+
+    def load_face_expression(self, face_expression_path: str) -> FaceExpression:
+        with open(face_expression_path) as f:
+            face_expression = FaceExpression(**json.load(f))
+        face_expression.blend_shapes = np.asarray(face_expression.blend_shapes, dtype=np.float32)
+        if face_expression.time_codes is not None:
+            face_expression.time_codes = np.asarray(face_expression.time_codes, dtype=np.float64)
+        return face_expression
+
+    def delete_face_expression(self, face_expression_path: str) -> None:
+        if os.path.exists(face_expression_path):
+            os.remove(face_expression_path)
+
+
+def _audio_samples(data) -> np.ndarray:
+    if isinstance(data, np.ndarray):
+        return data.astype(np.float32, copy=False)
+    return np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def _frame_energy(samples: np.ndarray, frame_count: int) -> np.ndarray:
+    frames = np.array_split(samples, frame_count)
+    return np.array([np.sqrt(np.mean(frame ** 2)) if len(frame) else 0.0 for frame in frames])
@@ -0,0 +1,89 @@
+import os
+import json
+import time
+import zlib
+import logging
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from entities.entity_audio import AudioData
+from entities.entity_visual import MotionData
+from components.visual.abstract_motion_generator import AbstractMotionGenerator
+from constants.constants_enum import SkeletonJoint
+from utils.latency_profile import LatencyProfile
+
+logger = logging.getLogger(__name__)
+
+# CAMN returns one axis-angle rotation per SMPL-X joint per frame
+POSE_DIMS = len(SkeletonJoint) * 3
+
+
+class SyntheticMotionGenerator(AbstractMotionGenerator):
+    """Deterministic CAMN-shaped poses (frames x 55 joints x 3) with a configurable latency profile.
+
+    Poses are a smooth random walk that continues from the seed motion's last frame,
+    so consecutive clips of a session join up the way real generations do.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+
+        self.pose_fps = config.get('pose_fps', 30)
+        self.step_std = config.get('step_std', 0.005)
+        self.seed = config.get('seed', 0)
+        self.latency = LatencyProfile({'seed': self.seed, **config.get('latency', {})})
+
+    def generate_motion(self, audio_data: AudioData, seed_motion: Optional[MotionData] = None) -> MotionData:
+        self.latency.spend(audio_data.duration)
+
+        audio_bytes = audio_data.data.tobytes() if isinstance(audio_data.data, np.ndarray) else bytes(audio_data.data)
+        rng = np.random.default_rng([self.seed, zlib.crc32(audio_bytes)])
+        frame_count = max(1, int(audio_data.duration * self.pose_fps))
+
+        start = np.zeros(POSE_DIMS)
+        if seed_motion is not None and len(seed_motion.poses) > 0:
+            start = np.asarray(seed_motion.poses[-1], dtype=np.float64)
+        poses = start + np.cumsum(rng.normal(0.0, self.step_std, size=(frame_count, POSE_DIMS)), axis=0)
+
+        return MotionData(
+            audio_name=audio_data.name.split('.')[0],
+            poses=poses.tolist(),
+            timestamp=time.time(),
+            duration=audio_data.duration,
+            frame_count=frame_count
+        )
+
+    def save_motion_data(self, motion_data: MotionData, format: str = 'csv', output_dir: str = None) -> str:
+        output_path = f"{output_dir}/{motion_data.audio_name}.{format}" if output_dir else f"{motion_data.audio_name}.{format}"
+
+        if format == 'csv':
+            pd.DataFrame(motion_data.poses).to_csv(output_path, index=False)
+        elif format == 'json':
+            with open(output_path, 'w') as f:
+                json.dump({
+                    'poses': motion_data.poses,
+                    'audio_name': motion_data.audio_name,
+                    'timestamp': motion_data.timestamp,
+                    'duration': motion_data.duration,
+                    'frame_count': motion_data.frame_count
+                }, f)
+        else:
+            raise ValueError(f"Unsupported format: {format}")
+
+        return str(output_path)
+
+    def load_motion_data(self, motion_data_path: str) -> MotionData:
+        poses = pd.read_csv(motion_data_path).values.tolist()
+        return MotionData(
+            audio_name=os.path.splitext(os.path.basename(motion_data_path))[0],
+            poses=poses,
+            timestamp=time.time(),
+            duration=len(poses) / self.pose_fps,
+            frame_count=len(poses)
+        )
+
+    def delete_motion_data(self, motion_data_path: str) -> None:
+        if os.path.exists(motion_data_path):
+            os.remove(motion_data_path)
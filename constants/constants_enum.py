@@ -7,6 +7,16 @@ class StageStatus(Enum):
     Stop = 2
     Error = 3
 
+class QueuePolicy(Enum):
+    Block = 0
+    DropOldest = 1
+    DropNewest = 2
+    Coalesce = 3
+
+class SchedulingPolicy(Enum):
+    RoundRobin = 0
+    EarliestDeadlineFirst = 1
+
 class AudioFormat(Enum):
     WAV = "wav"
     MP3 = "mp3"
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 from constants.constants_enum import AudioFormat
 
 @dataclass
@@ -9,3 +10,11 @@ class AudioData:
     timestamp: float
     sample_rate: int
     duration: float
+    session_id: Optional[str] = None
+    # Wall-clock time this audio is due to start playing
+    deadline: Optional[float] = None
+    # Correlates everything produced for one utterance across stages
+    trace_id: Optional[str] = None
+    # Clause index within the utterance when TTS streams, and whether it is the last clause
+    sequence: int = 0
+    is_final: bool = True
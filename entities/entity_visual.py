@@ -1,14 +1,28 @@
-from dataclasses import dataclass
-from typing import List, Dict
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional
+
+import numpy as np
 
 @dataclass
 class FaceExpression:
     audio_name: str
-    blend_shapes: List[List[float]]
+    # float32 (frame_count x len(blend_shape_names)) weights
+    blend_shapes: np.ndarray
     emotion: List[List[float]]
     timestamp: float
     duration: float
     frame_count: int
+    session_id: Optional[str] = None
+    trace_id: Optional[str] = None
+    sequence: int = 0
+    is_final: bool = True
+    # A partial chunk of one clip's animation, starting start_time seconds into the clip
+    start_time: float = 0.0
+    chunk_index: int = 0
+    is_last_chunk: bool = True
+    # Seconds into the clip of each frame, and the blendshape of each weight column
+    time_codes: Optional[np.ndarray] = None
+    blend_shape_names: List[str] = field(default_factory=list)
 
 @dataclass
 class MotionData:
@@ -17,9 +31,17 @@ class MotionData:
     timestamp: float
     duration: float
     frame_count: int
+    session_id: Optional[str] = None
+    trace_id: Optional[str] = None
+    sequence: int = 0
+    is_final: bool = True
     
 @dataclass
 class VisualOutput:
     audio_name: str
     face_expressions: FaceExpression
-    motion_data: MotionData
\ No newline at end of file
+    motion_data: MotionData
+    session_id: Optional[str] = None
+    trace_id: Optional[str] = None
+    sequence: int = 0
+    is_final: bool = True
@@ -1,76 +1,36 @@
-import stages_backbone
-from omegaconf import OmegaConf
-import time
-from stages.tts_stage import TTSStage
-from stages.face_stage import FaceStage
-from stages.motion_stage import MotionStage
+from stages_graph import StageGraph
+from monitoring import MetricsExporter, TRACER
 
-from components.audio.bark_tts_generator import BarkTTSGenerator
-from components.visual.nvidia_face_generator import NvidiaFaceGenerator
-from components.visual.camn_motion_generator import CamnMotionGenerator
+# Stages, edges, queue sizes and per-stage device/worker/thread budgets
+pipeline_config_path = "configs/config_pipeline.yml"
 
-def load_config():
-    config = OmegaConf.load('configs/config_path.yml')
-    return config
+# Serve per-stage metrics at http://127.0.0.1:9464/metrics while running
+export_metrics = True
 
-def initialize_components(config):
-    tts_generator = BarkTTSGenerator({})
-    face_generator = NvidiaFaceGenerator({})
-    motion_generator = CamnMotionGenerator({})
-    
-    return tts_generator, face_generator, motion_generator
-
-def initialize_stages(config, tts_generator, face_generator, motion_generator):
-    tts_stage = TTSStage(
-        tts_generator=tts_generator,
-        output_dir=config.text_to_speech.output_dir
-    )
-    
-    face_stage = FaceStage(
-        face_generator=face_generator,
-        output_dir=config.audio_to_face.output_dir
-    )
-    
-    motion_stage = MotionStage(
-        motion_generator=motion_generator,
-        input_dir=config.audio_to_gesture.output_dir,
-        output_dir=config.audio_to_gesture.output_dir
-    )
-    
-    return tts_stage, face_stage, motion_stage
-
-# Initialize everything
-config = load_config()
-tts_generator, face_generator, motion_generator = initialize_components(config)
-tts_stage, face_stage, motion_stage = initialize_stages(
-    config,
-    tts_generator,
-    face_generator,
-    motion_generator
-)
-
-# Setup stage backbone
-stage_backbone = stages_backbone.StageBackbone()
-stage_backbone.add_stage(tts_stage)
-stage_backbone.add_stage(face_stage)
-stage_backbone.add_stage(motion_stage)
-
-
-
-loop_time = 10
-for i in range(loop_time):
-    tts_stage.add_input_text(f"Life is full of challenges and opportunities {i}")
+# Chrome trace-event JSON of every utterance's stage spans; open in chrome://tracing
+trace_path = "pipeline_trace.json"
 
+# Latency percentiles and throughput are measured by `python -m benchmarks.pipeline`
 if __name__ == "__main__":
-    current_loop = 0
-    total_consume = 0
-    while current_loop < loop_time:
-        current_loop += 1
-        start_time = time.time()
-        stage_backbone.loop_stage()
-        total_consume += time.time() - start_time
-    print(f"Average consume {total_consume / loop_time:.2f} seconds")
-
-
-    
-
+    stage_graph = StageGraph.from_yaml(pipeline_config_path)
+    stage_backbone = stage_graph.backbone
+    tts_stage = stage_graph.stages["tts"]
+
+    metrics_exporter = MetricsExporter(stage_backbone)
+    if export_metrics:
+        metrics_exporter.start()
+
+    for i in range(10):
+        tts_stage.add_input_text(f"Life is full of challenges and opportunities {i}")
+
+    stage_backbone.start()
+    stage_backbone.wait_until_idle()
+    stage_graph.shutdown()
+
+    for stage_name, exception_type, _ in stage_backbone.get_exceptions():
+        print(f"{stage_name} reported {exception_type.name}")
+    for trace_id, first_outputs in TRACER.get_first_output_latencies().items():
+        print(trace_id, ", ".join(f"first {output} {seconds:.2f}s" for output, seconds in first_outputs.items()))
+    TRACER.dump(trace_path)
+    if export_metrics:
+        metrics_exporter.stop()
@@ -16,10 +16,11 @@
 import grpc
 from pathlib import Path
 import os
-from typing import List, Optional, Tuple, Union
+from typing import Any, List, Optional, Tuple, Union
 
 def create_channel(ssl_cert: Optional[Union[str, os.PathLike]] = None,
-        uri= "grpc.nvcf.nvidia.com:443", use_ssl: bool = False, metadata: Optional[List[Tuple[str, str]]] = None) -> grpc.Channel:
+        uri= "grpc.nvcf.nvidia.com:443", use_ssl: bool = False, metadata: Optional[List[Tuple[str, str]]] = None,
+        options: Optional[List[Tuple[str, Any]]] = None) -> grpc.Channel:
     def metadata_callback(context, callback):
         callback(metadata, None)
         
@@ -33,9 +34,9 @@ def create_channel(ssl_cert: Optional[Union[str, os.PathLike]] = None,
         if metadata:
             auth_creds = grpc.metadata_call_credentials(metadata_callback)
             creds = grpc.composite_channel_credentials(creds, auth_creds)
-        channel = grpc.aio.secure_channel(uri, creds)
+        channel = grpc.aio.secure_channel(uri, creds, options=options)
     else:
-        channel = grpc.aio.insecure_channel(uri)
+        channel = grpc.aio.insecure_channel(uri, options=options)
     return channel
 
 class Auth:
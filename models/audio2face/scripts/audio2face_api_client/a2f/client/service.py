@@ -13,7 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import argparse, asyncio, os, grpc, scipy, numpy, yaml, pandas, warnings
+import argparse, asyncio, os, struct, grpc, scipy, numpy, yaml, pandas, warnings
 from sys import stderr
 from datetime import datetime
 from nvidia_ace.animation_data.v1_pb2 import AnimationData, AnimationDataStreamHeader
@@ -161,11 +161,152 @@ async def read_from_stream(stream, output_dir, name_prefix):
             print(f"Received status message with value: '{status.message}'")
             print(f"Status code: '{status.code}'")
 
-async def read_stream_data_only(stream):
+class BlendShapeFrameBuffer:
+    """
+    Growable (frames x blendshapes) float32 array plus a float64 timecode per frame.
+    Storage is allocated for `capacity` frames up front and doubles when full, so
+    accumulating a clip costs a handful of copies rather than an object per frame.
+    """
+
+    def __init__(self, blend_shape_count, capacity=0):
+        self._weights = numpy.empty((max(capacity, 1), blend_shape_count), dtype=numpy.float32)
+        self._time_codes = numpy.empty(max(capacity, 1), dtype=numpy.float64)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, time_codes, weights):
+        end = self._size + len(time_codes)
+        if end > len(self._time_codes):
+            capacity = max(end, 2 * len(self._time_codes))
+            self._weights = numpy.resize(self._weights, (capacity, self._weights.shape[1]))
+            self._time_codes = numpy.resize(self._time_codes, capacity)
+        self._weights[self._size:end] = weights
+        self._time_codes[self._size:end] = time_codes
+        self._size = end
+
+    @property
+    def weights(self):
+        return self._weights[:self._size]
+
+    @property
+    def time_codes(self):
+        return self._time_codes[:self._size]
+
+# Wire-format keys: SkelAnimation.blend_shape_weights, FloatArrayWithTimeCode.time_code and packed .values
+_BLEND_SHAPE_WEIGHTS_KEY = (1 << 3) | 2
+_TIME_CODE_KEY = (1 << 3) | 1
+_PACKED_VALUES_KEY = (2 << 3) | 2
+_unpack_double = struct.Struct("<d").unpack_from
+
+def _read_varint(buffer, position):
+    result = shift = 0
+    while True:
+        byte = buffer[position]
+        position += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+def decode_blend_shape_weights(skel_animation, blend_shape_count):
+    """
+    Decodes a SkelAnimation's blendshape frames into (time codes, weights) arrays of
+    shape (frames,) and (frames, blend_shape_count). The packed float values are
+    copied straight from the message's wire bytes into the array; reading them through
+    the protobuf fields would box every weight as a Python float first.
+    """
+    frame_count = len(skel_animation.blend_shape_weights)
+    time_codes = numpy.zeros(frame_count, dtype=numpy.float64)
+    weights = numpy.zeros((frame_count, blend_shape_count), dtype=numpy.float32)
+
+    buffer = skel_animation.SerializeToString()
+    view = memoryview(buffer)
+    position = frame = 0
+    while position < len(buffer):
+        key, position = _read_varint(buffer, position)
+        length, position = _read_varint(buffer, position)
+        if key != _BLEND_SHAPE_WEIGHTS_KEY:
+            position += length
+            continue
+
+        frame_end = position + length
+        while position < frame_end:
+            key = buffer[position]
+            position += 1
+            if key == _TIME_CODE_KEY:
+                time_codes[frame] = _unpack_double(buffer, position)[0]
+                position += 8
+            elif key == _PACKED_VALUES_KEY:
+                length, position = _read_varint(buffer, position)
+                weights[frame] = numpy.frombuffer(view[position:position + length], dtype="<f4")
+                position += length
+            else:
+                # Not the layout proto3 writes (e.g. unpacked values); take the slow path
+                return _decode_blend_shape_fields(skel_animation, time_codes, weights)
+        frame += 1
+
+    return time_codes, weights
+
+def _decode_blend_shape_fields(skel_animation, time_codes, weights):
+    for frame, blendshapes in enumerate(skel_animation.blend_shape_weights):
+        time_codes[frame] = blendshapes.time_code
+        weights[frame] = list(blendshapes.values)
+    return time_codes, weights
+
+async def read_stream_chunks(stream):
+    """
+    Async iterator over the stream's animation as it arrives: yields one dict per
+    `animation_data` message with that message's frames, emotion key frames
+    and audio, so callers can use the first frames before A2F has finished the clip.
+    Frames come as a float32 (frames x blendshapes) array ordered like
+    `blendshape_names`, plus the matching timecodes.
+    """
+    # List of blendshapes names, from the header that precedes all animation data
+    bs_names = []
+    audio_header = None
+
+    while True:
+        message = await stream.read()
+        if message == grpc.aio.EOF:
+            return
+
+        if message.HasField("animation_data_stream_header"):
+            animation_data_stream_header = message.animation_data_stream_header
+            bs_names = list(animation_data_stream_header.skel_animation_header.blend_shapes)
+            audio_header = animation_data_stream_header.audio_header
+
+        elif message.HasField("animation_data"):
+            animation_data = message.animation_data
+            emotion_key_frames = {
+                "input": [],
+                "a2e_output": [],
+                "a2f_smoothed_output": []
+            }
+            parse_emotion_data(animation_data, emotion_key_frames)
+            time_codes, weights = decode_blend_shape_weights(animation_data.skel_animation, len(bs_names))
+
+            yield {
+                "audio_data": {
+                    "header": audio_header,
+                    "buffer": animation_data.audio.audio_buffer
+                },
+                "time_codes": time_codes,
+                "blend_shapes": weights,
+                "emotion_data": emotion_key_frames,
+                "blendshape_names": bs_names
+            }
+
+async def read_stream_data_only(stream, expected_frames=0):
+    """
+    Reads the whole stream. `expected_frames` sizes the frame buffer up front;
+    it grows if the clip turns out longer.
+    """
     # List of blendshapes names
-    bs_names = []    
-    # List of animation key frames
-    animation_key_frames = []
+    bs_names = []
+    # Animation frames
+    frames = None
     # Audio buffer
     audio_buffer = b''
     # Audio header
@@ -177,58 +318,54 @@ async def read_stream_data_only(stream):
         "a2f_smoothed_output": []
     }
     
-    while True:
-        message = await stream.read()
-        if message == grpc.aio.EOF:
-            # Trả về dữ liệu thay vì lưu file
-            return {
-                "audio_data": {
-                    "header": audio_header,
-                    "buffer": audio_buffer
-                },
-                "animation_data": animation_key_frames,
-                "emotion_data": emotion_key_frames,
-                "blendshape_names": bs_names
-            }
+    async for chunk in read_stream_chunks(stream):
+        bs_names = chunk["blendshape_names"]
+        audio_header = chunk["audio_data"]["header"]
+        audio_buffer += chunk["audio_data"]["buffer"]
+        if frames is None:
+            frames = BlendShapeFrameBuffer(len(bs_names), expected_frames)
+        frames.append(chunk["time_codes"], chunk["blend_shapes"])
+        for key, key_frames in chunk["emotion_data"].items():
+            emotion_key_frames[key] += key_frames
 
-        if message.HasField("animation_data_stream_header"):
-            animation_data_stream_header = message.animation_data_stream_header
-            bs_names = animation_data_stream_header.skel_animation_header.blend_shapes
-            audio_header = animation_data_stream_header.audio_header
-            
-        elif message.HasField("animation_data"):
-            animation_data = message.animation_data
-            parse_emotion_data(animation_data, emotion_key_frames)
-            
-            blendshape_list = animation_data.skel_animation.blend_shape_weights
-            for blendshapes in blendshape_list:
-                bs_values_dict = dict(zip(bs_names, blendshapes.values))
-                time_code = blendshapes.time_code
-                animation_key_frames.append({
-                    "timeCode": time_code,
-                    "blendShapes": bs_values_dict
-                })
-            
-            audio_buffer += animation_data.audio.audio_buffer
+    if frames is None:
+        frames = BlendShapeFrameBuffer(len(bs_names))
+
+    # Trả về dữ liệu thay vì lưu file
+    return {
+        "audio_data": {
+            "header": audio_header,
+            "buffer": audio_buffer
+        },
+        "time_codes": frames.time_codes,
+        "blend_shapes": frames.weights,
+        "emotion_data": emotion_key_frames,
+        "blendshape_names": bs_names
+    }
+
+# (config path, sample rate) -> ((mtime_ns, size) of the config file, AudioStream header, emotion timecode list)
+_stream_header_cache = {}
 
-async def write_to_stream_with_data(stream, config_path, audio_data, sample_rate):
+def get_stream_header(config_path, sample_rate):
     """
-    Phiên bản mới của write_to_stream nhận trực tiếp audio data
-    
-    Args:
-        stream: gRPC stream
-        config_path: Đường dẫn đến file config
-        audio_data: Audio data trực tiếp (numpy array)
-        sample_rate: Tần số lấy mẫu của audio
+    AudioStream header and emotion timecode list for a face config, built once per
+    (config path, sample rate) and rebuilt only when the file's mtime or size changes.
+    The returned messages are shared between streams and must not be modified.
     """
-    config = None
+    stat = os.stat(config_path)
+    file_stamp = (stat.st_mtime_ns, stat.st_size)
+    key = (os.path.abspath(config_path), sample_rate)
+    cached = _stream_header_cache.get(key)
+    if cached is not None and cached[0] == file_stamp:
+        return cached[1], cached[2]
+
     with open(config_path, "r") as f:
         config = yaml.safe_load(f)
 
     audio_stream_header = AudioStream(
         audio_stream_header=AudioStreamHeader(
             audio_header=AudioHeader(
-                samples_per_second=sample_rate,  # Sử dụng sample_rate được truyền vào
+                samples_per_second=sample_rate,
                 bits_per_sample=BITS_PER_SAMPLE,
                 channel_count=CHANNEL_COUNT,
                 audio_format=AUDIO_FORMAT
@@ -243,41 +380,85 @@ async def write_to_stream_with_data(stream, config_path, audio_data, sample_rate
             )
         )
     )
+    list_emotion_tc = [
+        EmotionWithTimeCode(
+            emotion={
+                **v["emotions"]
+            },
+            time_code=v["time_code"]
+        ) for v in config["emotion_with_timecode_list"].values()
+    ]
+
+    _stream_header_cache[key] = (file_stamp, audio_stream_header, list_emotion_tc)
+    return audio_stream_header, list_emotion_tc
+
+def to_pcm16(audio):
+    """
+    16-bit PCM samples of `audio`: int16 arrays pass through, float arrays in [-1, 1]
+    are scaled, and raw bytes are read as int16.
+    """
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        return numpy.frombuffer(audio, dtype=numpy.int16)
+    audio = numpy.asarray(audio).reshape(-1)
+    if numpy.issubdtype(audio.dtype, numpy.floating):
+        return (numpy.clip(audio, -1.0, 1.0) * 32767).astype(numpy.int16)
+    return audio.astype(numpy.int16, copy=False)
+
+async def write_to_stream_from_source(stream, config_path, audio_chunks, sample_rate, chunk_seconds=1.0):
+    """
+    Streams audio to A2F while it is still being produced.
+
+    Args:
+        stream: gRPC stream
+        config_path: face config file
+        audio_chunks: async iterable of audio arrays (int16, or float in [-1, 1]) or PCM bytes
+        sample_rate: sample rate of every chunk
+        chunk_seconds: longest audio message sent; each chunk goes out as soon as it
+            arrives, split into messages of at most this duration
+
+    EndOfAudio is sent once the source is exhausted.
+    """
+    audio_stream_header, list_emotion_tc = get_stream_header(config_path, sample_rate)
 
     await stream.write(audio_stream_header)
 
-    # Chia audio thành các chunks
-    for i in range(len(audio_data) // sample_rate + 1):
-        chunk = audio_data[i * sample_rate: i * sample_rate + sample_rate]
-        
-        if i == 0:
-            list_emotion_tc = [
-                EmotionWithTimeCode(
-                    emotion={
-                        **v["emotions"]
-                    },
-                    time_code=v["time_code"]
-                ) for v in config["emotion_with_timecode_list"].values()
-            ]
+    samples_per_message = max(1, int(chunk_seconds * sample_rate))
+    # The emotion with timecode list goes with the first audio message
+    emotions = list_emotion_tc
+    async for audio in audio_chunks:
+        samples = to_pcm16(audio)
+        for start in range(0, len(samples), samples_per_message):
             await stream.write(
                 AudioStream(
                     audio_with_emotion=AudioWithEmotion(
-                        audio_buffer=chunk.astype(numpy.int16).tobytes(),
-                        emotions=list_emotion_tc
-                    )
-                )
-            )
-        else:
-            await stream.write(
-                AudioStream(
-                    audio_with_emotion=AudioWithEmotion(
-                        audio_buffer=chunk.astype(numpy.int16).tobytes()
+                        audio_buffer=samples[start:start + samples_per_message].tobytes(),
+                        emotions=emotions
                     )
                 )
             )
+            emotions = None
+
+    if emotions is not None:
+        await stream.write(AudioStream(audio_with_emotion=AudioWithEmotion(emotions=emotions)))
 
     await stream.write(AudioStream(end_of_audio=AudioStream.EndOfAudio()))
 
+async def write_to_stream_with_data(stream, config_path, audio_data, sample_rate, chunk_seconds=1.0):
+    """
+    Phiên bản mới của write_to_stream nhận trực tiếp audio data
+    
+    Args:
+        stream: gRPC stream
+        config_path: Đường dẫn đến file config
+        audio_data: Audio data trực tiếp (numpy array)
+        sample_rate: Tần số lấy mẫu của audio
+        chunk_seconds: Độ dài mỗi chunk audio gửi đi
+    """
+    async def whole_clip():
+        yield audio_data
+
+    await write_to_stream_from_source(stream, config_path, whole_clip(), sample_rate, chunk_seconds)
+
 async def write_to_stream(stream, config_path, audio_file_path):
     # Read the content of the audio file, extracting sample rate and data.
     samplerate, data = scipy.io.wavfile.read(audio_file_path)
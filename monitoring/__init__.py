@@ -0,0 +1,13 @@
+from .exporter import MetricsExporter
+from .metrics import Counter, Histogram
+from .tracing import Tracer, TRACER, new_trace_id, chunk_trace_id
+
+__all__ = [
+    'MetricsExporter',
+    'Counter',
+    'Histogram',
+    'Tracer',
+    'TRACER',
+    'new_trace_id',
+    'chunk_trace_id',
+]
@@ -0,0 +1,88 @@
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from monitoring.metrics import render_samples
+from monitoring.stage_metrics import ALL_METRICS
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsExporter:
+    """Serves stage metrics for a StageBackbone in Prometheus text format at /metrics."""
+
+    def __init__(self, stage_backbone, host: str = "127.0.0.1", port: int = 9464):
+        self.stage_backbone = stage_backbone
+        self.host = host
+        self.port = port
+        self._server: ThreadingHTTPServer = None
+        self._thread: threading.Thread = None
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in ALL_METRICS:
+            lines.extend(metric.render())
+
+        queue_samples = []
+        deadline_samples = []
+        for stage in list(self.stage_backbone.stages):
+            for queue_name, queue_metrics in stage.get_queue_metrics().items():
+                queue_samples.append(((stage.name, queue_name), queue_metrics))
+            for outcome in ("met", "late", "skipped"):
+                deadline_samples.append(((stage.name, outcome), stage.get_deadline_metrics()[outcome]))
+
+        for key, metric_type, documentation in (
+            ("depth", "gauge", "Items currently queued."),
+            ("capacity", "gauge", "Queue capacity, 0 when unbounded."),
+            ("max_depth", "gauge", "Highest queue depth seen."),
+            ("dropped", "counter", "Items discarded by the queue policy."),
+            ("coalesced", "counter", "Items merged into an already queued item."),
+            ("expired", "counter", "Items dropped because their deadline passed."),
+        ):
+            name = f"stage_queue_{key}" + ("_total" if metric_type == "counter" else "")
+            samples = [(labels, metrics[key]) for labels, metrics in queue_samples if key in metrics]
+            lines.extend(render_samples(name, documentation, metric_type, ("stage", "queue"), samples))
+
+        lines.extend(render_samples(
+            "stage_deadline_total",
+            "Items by deadline outcome: met, late or skipped.",
+            "counter",
+            ("stage", "outcome"),
+            deadline_samples
+        ))
+        return "\n".join(lines) + "\n"
+
+    def start(self) -> None:
+        exporter = self
+
+        class _MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self._server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="MetricsExporter", daemon=True)
+        self._thread.start()
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
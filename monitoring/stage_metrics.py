@@ -0,0 +1,55 @@
+from monitoring.metrics import Counter, Histogram
+
+QUEUE_WAIT_SECONDS = Histogram(
+    "stage_queue_wait_seconds",
+    "Time an item spent queued before the stage took it.",
+    ("stage", "queue")
+)
+
+EXECUTE_SECONDS = Histogram(
+    "stage_execute_seconds",
+    "Time a stage spent producing one output; a batched call is split evenly over its outputs.",
+    ("stage",)
+)
+
+ITEMS_TOTAL = Counter(
+    "stage_items_total",
+    "Items a stage finished successfully.",
+    ("stage",)
+)
+
+ERRORS_TOTAL = Counter(
+    "stage_errors_total",
+    "Errors a stage raised, by StageExceptionType.",
+    ("stage", "type")
+)
+
+TIME_TO_FIRST_OUTPUT_SECONDS = Histogram(
+    "time_to_first_output_seconds",
+    "Time from an utterance's text being queued to its first audio, face or motion output.",
+    ("output",)
+)
+
+STOP_SECONDS = Histogram(
+    "stage_stop_seconds",
+    "Time from a StopRequest reaching a stage to its in-flight work for that session being cancelled and flushed.",
+    ("stage",),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+TTS_CACHE_LOOKUPS_TOTAL = Counter(
+    "tts_cache_lookups_total",
+    "TTS cache lookups, by result: pinned, memory or disk hit, or miss.",
+    ("result",)
+)
+
+TTS_CACHE_EVICTIONS_TOTAL = Counter(
+    "tts_cache_evictions_total",
+    "Renditions evicted from a TTS cache tier to stay within its bounds.",
+    ("tier",)
+)
+
+ALL_METRICS = (
+    QUEUE_WAIT_SECONDS, EXECUTE_SECONDS, ITEMS_TOTAL, ERRORS_TOTAL, TIME_TO_FIRST_OUTPUT_SECONDS, STOP_SECONDS,
+    TTS_CACHE_LOOKUPS_TOTAL, TTS_CACHE_EVICTIONS_TOTAL
+)
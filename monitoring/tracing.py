@@ -0,0 +1,172 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from monitoring import stage_metrics
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def chunk_trace_id(trace_id: Optional[str], sequence: int) -> Optional[str]:
+    """Trace id for one streamed chunk of an utterance.
+
+    The first chunk keeps the utterance's id, so time-to-first-output still
+    measures the utterance; later chunks get child ids of their own.
+    """
+    if trace_id is None or sequence == 0:
+        return trace_id
+    return f"{trace_id}/{sequence}"
+
+
+def utterance_trace_id(trace_id: Optional[str]) -> Optional[str]:
+    """The utterance trace id a chunk_trace_id() was derived from."""
+    if trace_id is None:
+        return None
+    return trace_id.split("/", 1)[0]
+
+
+class Tracer:
+    """Records per-utterance stage spans and dumps them as Chrome trace-event JSON.
+
+    Each stage reports enqueue, start and finish for a trace id. The time between
+    enqueue and start becomes a "queued" span, start to finish an "execute" span.
+    Open the dump in chrome://tracing or https://ui.perfetto.dev.
+    """
+
+    def __init__(self, max_events: int = 100000, max_traces: int = 10000, enabled: bool = True):
+        self.enabled = enabled
+        self.max_traces = max_traces
+        self._epoch = time.perf_counter()
+        self._lock = threading.Lock()
+        self._events: Deque[dict] = deque(maxlen=max_events)
+        # (trace_id, stage) -> perf_counter() of the pending enqueue or start
+        self._enqueued: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._started: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        # trace_id -> perf_counter() of the first enqueue, and first output per kind
+        self._trace_starts: "OrderedDict[str, float]" = OrderedDict()
+        self._first_outputs: Dict[str, Dict[str, float]] = {}
+
+    def enqueue(self, trace_id: Optional[str], stage: str) -> None:
+        if not self.enabled or trace_id is None:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            if trace_id not in self._trace_starts:
+                self._trace_starts[trace_id] = now
+                self._first_outputs[trace_id] = {}
+                self._evict(self._trace_starts, on_evict=self._first_outputs.pop)
+            # A join stage sees one trace twice; the first arrival starts the wait
+            if (trace_id, stage) not in self._enqueued:
+                self._enqueued[(trace_id, stage)] = now
+                self._evict(self._enqueued)
+
+    def start(self, trace_id: Optional[str], stage: str) -> None:
+        if not self.enabled or trace_id is None:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            enqueued = self._enqueued.pop((trace_id, stage), None)
+            if enqueued is not None:
+                self._add_span(trace_id, stage, "queued", enqueued, now)
+            self._started[(trace_id, stage)] = now
+            self._evict(self._started)
+
+    def finish(self, trace_id: Optional[str], stage: str, output: str = None) -> None:
+        """Close the execute span; `output` names what the stage produced (audio, face, motion...)."""
+        if not self.enabled or trace_id is None:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            started = self._started.pop((trace_id, stage), None)
+            if started is not None:
+                self._add_span(trace_id, stage, "execute", started, now)
+        if output is not None:
+            self.output(trace_id, output, now)
+
+    def output(self, trace_id: Optional[str], output: str, now: float = None) -> None:
+        """Record that part of `output` exists, e.g. a stage's first streamed chunk, without closing its span."""
+        if not self.enabled or trace_id is None:
+            return
+        now = time.perf_counter() if now is None else now
+        first_latency = None
+        with self._lock:
+            first_outputs = self._first_outputs.get(trace_id)
+            if first_outputs is not None and output not in first_outputs:
+                first_latency = now - self._trace_starts[trace_id]
+                first_outputs[output] = first_latency
+
+        if first_latency is not None:
+            stage_metrics.TIME_TO_FIRST_OUTPUT_SECONDS.observe(first_latency, output)
+
+    def discard(self, trace_id: Optional[str], stage: str) -> None:
+        """Forget a pending enqueue or start, e.g. when the item was dropped or failed."""
+        if trace_id is None:
+            return
+        with self._lock:
+            self._enqueued.pop((trace_id, stage), None)
+            self._started.pop((trace_id, stage), None)
+
+    def get_first_output_latencies(self) -> Dict[str, Dict[str, float]]:
+        """Seconds from a trace's first enqueue to the first output of each kind, per trace id."""
+        with self._lock:
+            return {trace_id: dict(outputs) for trace_id, outputs in self._first_outputs.items()}
+
+    def get_spans(self) -> List[dict]:
+        """Recorded spans as {name, cat, ts, dur, args} dicts, timestamps in microseconds."""
+        with self._lock:
+            return [dict(event) for event in self._events]
+
+    def to_chrome_trace(self) -> Dict[str, List[dict]]:
+        with self._lock:
+            events = list(self._events)
+
+        # One process row per trace, one thread row per stage
+        pids: Dict[str, int] = {}
+        tids: Dict[Tuple[int, str], int] = {}
+        trace_events = []
+        for event in events:
+            trace_id, stage = event["args"]["trace_id"], event["args"]["stage"]
+            pid = pids.setdefault(trace_id, len(pids) + 1)
+            tid = tids.setdefault((pid, stage), len(tids) + 1)
+            trace_events.append({**event, "pid": pid, "tid": tid})
+
+        metadata = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": trace_id}} for trace_id, pid in pids.items()]
+        metadata += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": stage}} for (pid, stage), tid in tids.items()]
+        return {"traceEvents": metadata + trace_events, "displayTimeUnit": "ms"}
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._events.clear()
+            self._enqueued.clear()
+            self._started.clear()
+            self._trace_starts.clear()
+            self._first_outputs.clear()
+
+    def _add_span(self, trace_id: str, stage: str, name: str, start: float, end: float) -> None:
+        self._events.append({
+            "name": name,
+            "cat": stage,
+            "ph": "X",
+            "ts": (start - self._epoch) * 1e6,
+            "dur": (end - start) * 1e6,
+            "args": {"trace_id": trace_id, "stage": stage},
+        })
+
+    def _evict(self, pending: OrderedDict, on_evict=None) -> None:
+        # Items dropped by a queue policy never finish; keep the bookkeeping bounded
+        while len(pending) > self.max_traces:
+            key, _ = pending.popitem(last=False)
+            if on_evict is not None:
+                on_evict(key, None)
+
+
+TRACER = Tracer()
@@ -4,47 +4,110 @@ from entities.entity_audio import AudioData
 from entities.entity_visual import FaceExpression
 from components.visual.abstract_face_generator import AbstractFaceGenerator
 from stages.template_node_stage import TemplateNodeStage
-from constants.constants_enum import StageStatus, AudioFormat, StageExceptionType
+from constants.constants_enum import StageStatus, AudioFormat, StageExceptionType, QueuePolicy
 from entities.entity_conversation import StopRequest
-from typing import Deque, Dict
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
 from collections import deque
 from constants.constants_value import MIN_AUDIO_SIZE, MAX_AUDIO_SIZE
-from queue import Queue
+from stages.stage_queue import StageQueue, SessionStageQueue
+from utils.async_runtime import get_shared_event_loop
+from monitoring.tracing import utterance_trace_id
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import concurrent.futures
+import contextlib
+import threading
 import time
+
+import numpy as np
 logger = logging.getLogger(__name__)
 
 
 class FaceStage(TemplateNodeStage):
-    def __init__(self, face_generator: AbstractFaceGenerator, output_dir: str = None):
+    is_async = True
+
+    def __init__(self, face_generator: AbstractFaceGenerator, output_dir: str = None,
+                 max_concurrent_streams: int = 4, timeout: float = 30.0, streaming: bool = False,
+                 utterance_streams: bool = False,
+                 input_queue_capacity: int = None, input_queue_policy: QueuePolicy = QueuePolicy.Block,
+                 output_queue_capacity: int = None, output_queue_policy: QueuePolicy = QueuePolicy.DropOldest):
         super().__init__()
+        if self.is_async and output_queue_capacity is not None and output_queue_policy == QueuePolicy.Block:
+            # Outputs are appended on the shared event loop, and the link draining them runs there too
+            raise ValueError("FaceStage runs on the shared event loop; its bounded output queue cannot use the Block policy")
         self.face_generator = face_generator
+        self._output_dir = output_dir
+        self.max_concurrent_streams = max_concurrent_streams
+        self.timeout = timeout
+        # Forward each partial FaceExpression as the generator produces it instead of the whole clip;
+        # partial chunks are not saved to output_dir
+        self.streaming = streaming
+        # Feed every clause of a streamed TTS utterance into one generator stream as it arrives,
+        # mapping the animation back onto clauses; output is chunked as in streaming mode
+        self.utterance_streams = utterance_streams
         
-        self._input_audio_deque: Deque[AudioData] = deque()
-        self._stop_deque: Deque[StopRequest] = deque()
+        self._input_audio_deque: SessionStageQueue[AudioData] = SessionStageQueue(
+            input_queue_capacity, input_queue_policy, deadline_of=lambda audio_data: audio_data.deadline
+        )
+        self._input_audio_deque.set_drop_observer(self._on_audio_dropped)
 
-        self._output_face_deque: Queue[FaceExpression] = Queue()
+        self._output_face_deque: StageQueue[FaceExpression] = StageQueue(output_queue_capacity, output_queue_policy)
         self._exception_deque: Deque[Dict[StageExceptionType, AudioData]] = deque()
         
         self.status = StageStatus.Wait
-        self.executor = ThreadPoolExecutor(max_workers=1)
+        # In-flight A2F streams (tasks, or futures on the sync path) and their session
+        self._in_flight_tasks: Dict[object, Optional[str]] = {}
+        self._in_flight_count = 0
+        # (session, utterance trace id) -> stream taking that utterance's later clauses; the TTS
+        # link thread registers streams while tasks on the shared loop end them, hence the lock
+        self._utterance_streams: Dict[Tuple[Optional[str], str], _UtteranceStream] = {}
+        self._utterance_streams_lock = threading.Lock()
 
     def add_input_audio_data(self, audio_data: AudioData) -> None:
         exception = self._is_resource_exception(audio_data)
         if exception is not None:
-            self._exception_deque.append(exception, audio_data)
+            self._exception_deque.append({exception: audio_data})
+            self._record_error(exception)
+            self.notify()
             return
         
-        self._input_audio_deque.append(audio_data)
+        if self._is_stopped(audio_data.session_id, audio_data.timestamp):
+            return
+
+        self._trace_enqueue(audio_data.trace_id)
+        if self._feed_utterance_stream(audio_data):
+            self.notify()
+            return
 
-    def add_stop_request(self, stop_request: StopRequest) -> None:
-        self._stop_deque.append(stop_request)
+        # Registered before the append, so a worker that pops the first clause right away finds its stream
+        opens_stream = self.utterance_streams and audio_data.sequence == 0 and not audio_data.is_final \
+            and audio_data.trace_id is not None
+        if opens_stream:
+            self._open_utterance_stream(audio_data)
+        if not self._input_audio_deque.append(audio_data, audio_data.session_id):
+            logger.warning(f"Input queue full, dropped audio {audio_data.name}")
+            self._trace_discard(audio_data.trace_id)
+            if opens_stream:
+                self._close_utterance_stream(_utterance_key(audio_data))
+        self.notify()
+
+    def _on_audio_dropped(self, audio_data: AudioData) -> None:
+        # DropOldest evicted a queued clause to make room
+        logger.warning(f"Input queue full, dropped oldest audio {audio_data.name}")
+        self._trace_discard(audio_data.trace_id)
+        if audio_data.sequence == 0:
+            self._close_utterance_stream(_utterance_key(audio_data))
+
+    def set_session_weight(self, session_id: str, weight: int) -> None:
+        """Give a session `weight` turns per round-robin pass over the shared generator."""
+        self._input_audio_deque.set_weight(session_id, weight)
+
+    def remove_session(self, session_id: str) -> None:
+        self._input_audio_deque.remove_session(session_id)
 
     def get_face_expression(self) -> FaceExpression:
-        if self._output_face_deque.empty():
+        if len(self._output_face_deque) == 0:
             return None
-        return self._output_face_deque.get()
+        return self._output_face_deque.popleft()
     
     def get_exception_data(self) -> Dict[StageExceptionType, AudioData]:
         if len(self._exception_deque) == 0:
@@ -53,12 +116,17 @@ class FaceStage(TemplateNodeStage):
 
     def notify_exception_data_handled(self) -> None:
         self._exception_deque.popleft()
+        self.notify()
 
     def wait(self) -> None:
         if len(self._exception_deque) != 0:
             self.status = StageStatus.Error
             return
 
+        if len(self._stop_deque) != 0:
+            self.status = StageStatus.Stop
+            return
+
         if len(self._input_audio_deque) > 0: 
             self.status = StageStatus.Execute
             return
@@ -72,47 +140,293 @@ class FaceStage(TemplateNodeStage):
             self.status = StageStatus.Stop
             return
 
+        self._skip_expired_audio()
         if len(self._input_audio_deque) == 0:
             self.status = StageStatus.Wait
             return
 
+        audio_data = self._input_audio_deque.popleft()
+        self._in_flight_count += 1
+        future = asyncio.run_coroutine_threadsafe(self._generate_face_expression(audio_data), get_shared_event_loop())
+        self._in_flight_tasks[future] = audio_data.session_id
         try:
+            future.result()
+        except concurrent.futures.CancelledError:
+            pass
+        finally:
+            self._in_flight_tasks.pop(future, None)
+
+    async def execute_async(self) -> None:
+        if len(self._exception_deque) != 0:
+            self.status = StageStatus.Error
+            return
+        
+        if len(self._stop_deque) != 0:
+            self.status = StageStatus.Stop
+            return
+
+        self._skip_expired_audio()
+        if len(self._input_audio_deque) == 0:
+            self.status = StageStatus.Wait
+            return
+
+        # Start as many A2F streams as capacity allows; results are collected by the tasks
+        while len(self._input_audio_deque) > 0 and self._in_flight_count < self.max_concurrent_streams:
             audio_data = self._input_audio_deque.popleft()
-            
-            def run_async():
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                return loop.run_until_complete(
-                    self.face_generator.generate_face_expression(audio_data)
-                )
-            
-            future = self.executor.submit(run_async)
-            face_expression = future.result(timeout=30)
-            self._output_face_deque.put(face_expression)
+            self._in_flight_count += 1
+            task = asyncio.create_task(self._generate_face_expression(audio_data))
+            self._in_flight_tasks[task] = audio_data.session_id
+
+    async def _generate_face_expression(self, audio_data: AudioData) -> None:
+        try:
+            start_time = time.perf_counter()
+            self._trace_start(audio_data.trace_id)
+            if self.utterance_streams:
+                await self._stream_utterance(audio_data, start_time)
+                return
+            if self.streaming:
+                await self._stream_face_expression(audio_data, start_time)
+                return
 
+            face_expression = await asyncio.wait_for(
+                self.face_generator.generate_face_expression(audio_data),
+                timeout=self.timeout
+            )
+            if self._is_stopped(audio_data.session_id, audio_data.timestamp):
+                self._trace_discard(audio_data.trace_id)
+                return
+
+            face_expression.session_id = audio_data.session_id
+            face_expression.trace_id = audio_data.trace_id
+            face_expression.sequence = audio_data.sequence
+            face_expression.is_final = audio_data.is_final
             if self._output_dir:
                 self.face_generator.save_face_expression(face_expression, format='json', output_dir=self._output_dir)
 
+            self._trace_finish(audio_data.trace_id, output="face")
+            self._output_face_deque.append(face_expression)
+            self._record_execute(time.perf_counter() - start_time)
+            self._record_deadline(audio_data.deadline)
+
+        except asyncio.CancelledError:
+            logger.info(f"Cancelled face generation for session {audio_data.session_id}")
+            self._trace_discard(audio_data.trace_id)
+            raise
         except Exception as e:
             logger.error(f"Error in face generation: {e}")
+            self._trace_discard(audio_data.trace_id)
             self._exception_deque.append({StageExceptionType.EXECUTION_FAILED: None})
+            self._record_error(StageExceptionType.EXECUTION_FAILED)
+        finally:
+            # Untracked before notify() so a worker waiting out a stop sees the stream gone
+            self._in_flight_tasks.pop(asyncio.current_task(), None)
+            self._in_flight_count -= 1
+            self.notify()
+
+    async def _stream_face_expression(self, audio_data: AudioData, start_time: float) -> None:
+        async with asyncio.timeout(self.timeout):
+            async with contextlib.aclosing(self.face_generator.generate_face_expression_stream(audio_data)) as chunks:
+                async for face_expression in chunks:
+                    if self._is_stopped(audio_data.session_id, audio_data.timestamp):
+                        self._trace_discard(audio_data.trace_id)
+                        return
+                    self._emit_face_chunk(audio_data, face_expression, start_time)
+
+    async def _stream_utterance(self, audio_data: AudioData, start_time: float) -> None:
+        key = _utterance_key(audio_data)
+        with self._utterance_streams_lock:
+            stream = self._utterance_streams.get(key) if audio_data.sequence == 0 else None
+        if stream is None:
+            # A single-clause utterance, or a clause whose utterance stream is gone: it streams on its own
+            stream = _UtteranceStream(audio_data.session_id)
+            stream.closed = True
+
+        timeout = asyncio.timeout(self.timeout)
+        try:
+            async with timeout:
+                source = self._utterance_audio(stream, audio_data, start_time, timeout)
+                chunks = self.face_generator.generate_face_expression_from_source(
+                    source, audio_data.sample_rate, audio_data.name.split('.')[0]
+                )
+                async with contextlib.aclosing(chunks):
+                    async for face_expression in chunks:
+                        if self._is_stopped(audio_data.session_id, audio_data.timestamp):
+                            return
+                        for clause, clause_face_expression in stream.split(face_expression):
+                            self._emit_face_chunk(clause.audio_data, clause_face_expression, clause.started_at)
+        finally:
+            self._end_utterance_stream(key, stream)
+
+    async def _utterance_audio(self, stream: "_UtteranceStream", audio_data: AudioData, start_time: float,
+                               timeout: asyncio.Timeout) -> AsyncIterator[np.ndarray]:
+        """The utterance's clauses as TTS delivers them, ending after its final clause."""
+        while True:
+            stream.add_clause(audio_data, start_time)
+            # The timeout bounds the wait for each clause, not the whole utterance
+            timeout.reschedule(asyncio.get_running_loop().time() + self.timeout)
+            yield audio_data.data
+            if audio_data.is_final or stream.closed:
+                break
+
+            audio_data = await stream.pending.get()
+            if audio_data is None:
+                break
+            start_time = time.perf_counter()
+            self._trace_start(audio_data.trace_id)
+        stream.closed = True
+
+    def _skip_expired_audio(self) -> None:
+        for audio_data in self._skip_expired(self._input_audio_deque):
+            # Clauses already handed to the stream go with its expired first clause;
+            # later ones are animated on their own
+            self._close_utterance_stream(_utterance_key(audio_data))
+
+    def _emit_face_chunk(self, audio_data: AudioData, face_expression: FaceExpression, start_time: float) -> None:
+        face_expression.session_id = audio_data.session_id
+        face_expression.trace_id = audio_data.trace_id
+        face_expression.sequence = audio_data.sequence
+        face_expression.is_final = audio_data.is_final and face_expression.is_last_chunk
+
+        if face_expression.chunk_index == 0:
+            self._trace_output(audio_data.trace_id, "face")
+        if face_expression.is_last_chunk:
+            self._trace_finish(audio_data.trace_id, output="face")
+            self._record_execute(time.perf_counter() - start_time)
+            self._record_deadline(audio_data.deadline)
+        self._output_face_deque.append(face_expression)
+        self.notify()
+
+    def _open_utterance_stream(self, audio_data: AudioData) -> None:
+        with self._utterance_streams_lock:
+            # Utterances in a session arrive one after another; one still open lost its final clause.
+            # It stays registered until its task ends it, so a first clause still queued finds it
+            for stream in self._utterance_streams.values():
+                if stream.session_id == audio_data.session_id:
+                    get_shared_event_loop().call_soon_threadsafe(stream.end_after_pending)
+            self._utterance_streams[_utterance_key(audio_data)] = _UtteranceStream(audio_data.session_id)
+
+    def _close_utterance_stream(self, key: Tuple[Optional[str], str]) -> None:
+        """Unregister an utterance's stream whose first clause will never run, and end it on the loop."""
+        with self._utterance_streams_lock:
+            stream = self._utterance_streams.pop(key, None)
+        if stream is not None:
+            get_shared_event_loop().call_soon_threadsafe(self._end_utterance_stream, key, stream)
+
+    def _feed_utterance_stream(self, audio_data: AudioData) -> bool:
+        """Hand a later clause straight to its utterance's stream, which already holds a generator slot."""
+        if not self.utterance_streams or audio_data.sequence == 0:
+            return False
+        with self._utterance_streams_lock:
+            stream = self._utterance_streams.get(_utterance_key(audio_data))
+        if stream is None:
+            return False
+        get_shared_event_loop().call_soon_threadsafe(self._put_clause, stream, audio_data)
+        return True
+
+    def _put_clause(self, stream: "_UtteranceStream", audio_data: AudioData) -> None:
+        if not stream.closed:
+            stream.pending.put_nowait(audio_data)
+            return
+        self._drop_clause(audio_data)
+
+    def _end_utterance_stream(self, key: Tuple[Optional[str], str], stream: "_UtteranceStream") -> None:
+        stream.closed = True
+        with self._utterance_streams_lock:
+            if self._utterance_streams.get(key) is stream:
+                del self._utterance_streams[key]
+        for clause in stream.unfinished_clauses():
+            self._trace_discard(clause.audio_data.trace_id)
+        while not stream.pending.empty():
+            audio_data = stream.pending.get_nowait()
+            if audio_data is not None:
+                self._drop_clause(audio_data)
+        # Wakes a task still waiting on the stream for its next clause, even if the drain took its None
+        stream.pending.put_nowait(None)
+
+    def _drop_clause(self, audio_data: AudioData) -> None:
+        # Only after a stop, a failed stream, or an utterance that lost its final clause;
+        # requeueing from the event loop could block it on a full input queue
+        if not self._is_stopped(audio_data.session_id, audio_data.timestamp):
+            logger.warning(f"Utterance stream ended before clause {audio_data.name}, dropped it")
+        self._trace_discard(audio_data.trace_id)
 
     def stop(self) -> None:
         if len(self._stop_deque) == 0:
             self.status = StageStatus.Wait
             return
+
+        session_ids = [stop_request.conversation_id for _, stop_request in self._stop_deque]
+        for session_id in session_ids:
+            # Again here: a stream dispatched just before the stop arrived was not yet tracked
+            self._cancel_in_flight(session_id)
+            self._input_audio_deque.clear(session_id)
+            with self._utterance_streams_lock:
+                keys = [key for key, stream in self._utterance_streams.items() if self._stop_applies(session_id, stream.session_id)]
+            for key in keys:
+                self._close_utterance_stream(key)
+            self._output_face_deque.remove_if(lambda face_expression: self._stop_applies(session_id, face_expression.session_id))
+
+        # Stay in Stop until the cancelled streams have unwound; each one notifies when done
+        if self.has_pending_stop():
+            return
+
+        while len(self._stop_deque) > 0:
+            received_at, _ = self._stop_deque.popleft()
+            self._record_stop(received_at)
+        self.status = StageStatus.Wait
         
     def error(self) -> None:
         if len(self._exception_deque) == 0: 
             self.status = StageStatus.Wait
             return
     
+    def is_idle(self) -> bool:
+        return (
+            self.status == StageStatus.Wait
+            and len(self._input_audio_deque) == 0
+            and self._in_flight_count == 0
+            and len(self._stop_deque) == 0
+        )
+
+    def has_runnable_work(self) -> bool:
+        if self.status == StageStatus.Wait:
+            return len(self._input_audio_deque) > 0 or len(self._exception_deque) > 0
+        
+        if self.status == StageStatus.Execute:
+            return len(self._input_audio_deque) == 0 or self._in_flight_count < self.max_concurrent_streams
+
+        if self.status == StageStatus.Stop:
+            return not self.has_pending_stop()
+        
+        return False
+    
     def loof(self) -> None:
         handler = self.status_handlers.get(self.status, lambda: logging.warning("Unknown status"))
         handler()
 
+    async def loof_async(self) -> None:
+        if self.status == StageStatus.Execute:
+            await self.execute_async()
+            return
+        
+        self.loof()
+
+    def _in_flight_session_ids(self) -> List[Optional[str]]:
+        return list(self._in_flight_tasks.values())
+
+    def _cancel_in_flight(self, session_id: Optional[str]) -> None:
+        # Cancelling the task unwinds the A2F client, which cancels its gRPC stream
+        loop = get_shared_event_loop()
+        for in_flight, in_flight_session_id in list(self._in_flight_tasks.items()):
+            if not self._stop_applies(session_id, in_flight_session_id):
+                continue
+            if isinstance(in_flight, asyncio.Task):
+                loop.call_soon_threadsafe(in_flight.cancel)
+            else:
+                in_flight.cancel()
+
     def _is_resource_exception(self, audio_data: AudioData) -> StageExceptionType:
-        if not audio_data or not audio_data.data:
+        if audio_data is None or audio_data.data is None or len(audio_data.data) == 0:
             return StageExceptionType.INVALID_DATA_CONTENT
             
         if len(audio_data.data) < MIN_AUDIO_SIZE:
@@ -134,3 +448,95 @@ class FaceStage(TemplateNodeStage):
             return StageExceptionType.INVALID_DATA_CONTENT
 
         return None
+
+
+def _utterance_key(audio_data: AudioData) -> Tuple[Optional[str], str]:
+    return audio_data.session_id, utterance_trace_id(audio_data.trace_id)
+
+
+class _Clause:
+    def __init__(self, audio_data: AudioData, start: float, end: float, started_at: float):
+        self.audio_data = audio_data
+        # Seconds into the utterance stream
+        self.start = start
+        self.end = end
+        self.started_at = started_at
+        self.chunk_index = 0
+
+
+class _UtteranceStream:
+    """The clauses of one utterance fed through a single generator stream.
+
+    The generator animates the clauses as one continuous clip; split() cuts each
+    animation chunk back into per-clause FaceExpressions timed from the clause start.
+    """
+
+    def __init__(self, session_id: Optional[str]):
+        self.session_id = session_id
+        # Clauses that arrived after the stream opened; None ends the stream
+        self.pending: asyncio.Queue = asyncio.Queue()
+        self.closed = False
+        self._ending = False
+        self._clauses: List[_Clause] = []
+        self._fed_seconds = 0.0
+
+    def end_after_pending(self) -> None:
+        """Let the clauses already pending run, then end the stream."""
+        if not self._ending:
+            self._ending = True
+            self.pending.put_nowait(None)
+
+    def add_clause(self, audio_data: AudioData, started_at: float) -> None:
+        end = self._fed_seconds + audio_data.duration
+        self._clauses.append(_Clause(audio_data, self._fed_seconds, end, started_at))
+        self._fed_seconds = end
+
+    def unfinished_clauses(self) -> List[_Clause]:
+        return list(self._clauses)
+
+    def split(self, face_expression: FaceExpression) -> List[Tuple[_Clause, FaceExpression]]:
+        frame_count = face_expression.frame_count
+        frame_interval = face_expression.duration / frame_count if frame_count else 1.0 / 30
+        time_codes = face_expression.time_codes
+        if time_codes is None:
+            time_codes = face_expression.start_time + np.arange(frame_count) * frame_interval
+
+        chunks = []
+        for clause in list(self._clauses):
+            in_clause = (time_codes >= clause.start) & (time_codes < clause.end)
+            # Frames arrive in order, so once the next frame would fall past the clause it is complete
+            is_last_chunk = face_expression.is_last_chunk or \
+                (frame_count > 0 and bool(time_codes[-1] + frame_interval >= clause.end - 1e-6))
+            if in_clause.any() or is_last_chunk:
+                chunks.append((clause, _clause_chunk(face_expression, clause, in_clause, frame_interval, is_last_chunk)))
+            if is_last_chunk:
+                self._clauses.remove(clause)
+        return chunks
+
+
+def _clause_chunk(face_expression: FaceExpression, clause: _Clause, in_clause: np.ndarray,
+                  frame_interval: float, is_last_chunk: bool) -> FaceExpression:
+    time_codes = face_expression.time_codes[in_clause] - clause.start if face_expression.time_codes is not None \
+        else (np.flatnonzero(in_clause) * frame_interval + face_expression.start_time - clause.start)
+    start_time = float(time_codes[0]) if len(time_codes) else clause.end - clause.start
+    duration = float(time_codes[-1] - time_codes[0]) + frame_interval if len(time_codes) else 0.0
+
+    chunk = FaceExpression(
+        audio_name=clause.audio_data.name.split('.')[0],
+        blend_shapes=face_expression.blend_shapes[in_clause],
+        emotion={
+            key: [{**key_frame, "time_code": key_frame["time_code"] - clause.start} for key_frame in key_frames
+                  if clause.start <= key_frame["time_code"] < clause.end]
+            for key, key_frames in face_expression.emotion.items()
+        },
+        timestamp=face_expression.timestamp,
+        duration=duration,
+        frame_count=len(time_codes),
+        start_time=start_time,
+        chunk_index=clause.chunk_index,
+        is_last_chunk=is_last_chunk,
+        time_codes=time_codes,
+        blend_shape_names=face_expression.blend_shape_names
+    )
+    clause.chunk_index += 1
+    return chunk
@@ -4,47 +4,66 @@ from entities.entity_audio import AudioData
 from entities.entity_visual import MotionData
 from components.visual.abstract_motion_generator import AbstractMotionGenerator
 from stages.template_node_stage import TemplateNodeStage
-from constants.constants_enum import StageStatus, AudioFormat, StageExceptionType
+from constants.constants_enum import StageStatus, AudioFormat, StageExceptionType, QueuePolicy
 from entities.entity_conversation import StopRequest
-from typing import Deque, Dict
+from typing import Deque, Dict, Tuple
 from collections import deque
 from constants.constants_value import MIN_AUDIO_SIZE, MAX_AUDIO_SIZE
-from queue import Queue
+from stages.stage_queue import StageQueue, SessionStageQueue
 import time
 
 logger = logging.getLogger(__name__)
 
 
 class MotionStage(TemplateNodeStage):
-    def __init__(self, motion_generator: AbstractMotionGenerator, input_dir, output_dir):
+    def __init__(self, motion_generator: AbstractMotionGenerator, input_dir, output_dir,
+                 input_queue_capacity: int = None, input_queue_policy: QueuePolicy = QueuePolicy.Block,
+                 output_queue_capacity: int = None, output_queue_policy: QueuePolicy = QueuePolicy.Block):
         super().__init__()
         self.motion_generator = motion_generator
         self._input_dir = input_dir
         self._output_dir = output_dir
         
-        self._input_audio_deque: Deque[AudioData] = deque()
-        self._stop_deque: Deque[StopRequest] = deque()
+        self._input_audio_deque: SessionStageQueue[AudioData] = SessionStageQueue(
+            input_queue_capacity, input_queue_policy, deadline_of=lambda audio_data: audio_data.deadline
+        )
 
-        self._output_motion_deque: Queue[MotionData] = Queue()
+        self._output_motion_deque: StageQueue[MotionData] = StageQueue(output_queue_capacity, output_queue_policy)
         self._exception_deque: Deque[(StageExceptionType, AudioData)] = deque()
         
         self.status = StageStatus.Wait
-        self.seed_motion = None
-        self.last_time_generate = 0
+        # Each session continues its own motion from its last generated clip
+        self._seed_motions: Dict[str, MotionData] = {}
+        self._last_time_generates: Dict[str, float] = {}
     
     def add_input_audio_data(self, audio_data: AudioData) -> None:
         exception = self._is_resource_exception(audio_data)
         if exception is not None:
             self._exception_deque.append((exception, audio_data))
+            self._record_error(exception)
+            self.notify()
             return
         
-        self._input_audio_deque.append(audio_data)
+        if self._is_stopped(audio_data.session_id, audio_data.timestamp):
+            return
+
+        self._trace_enqueue(audio_data.trace_id)
+        if not self._input_audio_deque.append(audio_data, audio_data.session_id):
+            logger.warning(f"Input queue full, dropped audio {audio_data.name}")
+            self._trace_discard(audio_data.trace_id)
+        self.notify()
+
+    def set_session_weight(self, session_id: str, weight: int) -> None:
+        """Give a session `weight` turns per round-robin pass over the shared generator."""
+        self._input_audio_deque.set_weight(session_id, weight)
 
-    def add_stop_request(self, stop_request: StopRequest) -> None:
-        self._stop_deque.append(stop_request)
+    def remove_session(self, session_id: str) -> None:
+        self._input_audio_deque.remove_session(session_id)
+        self._seed_motions.pop(session_id, None)
+        self._last_time_generates.pop(session_id, None)
 
     def get_motion_data(self) -> MotionData:
-        if self._output_motion_deque.empty():
+        if len(self._output_motion_deque) == 0:
             return None
         return self._output_motion_deque.popleft()
     
@@ -55,18 +74,26 @@ class MotionStage(TemplateNodeStage):
 
     def notify_exception_data_handled(self) -> None:
         self._exception_deque.popleft()
+        self.notify()
 
     def wait(self) -> None:
         if len(self._exception_deque) != 0:
             self.status = StageStatus.Error
             return
 
+        if len(self._stop_deque) != 0:
+            self.status = StageStatus.Stop
+            return
+
         if len(self._input_audio_deque) > 0: 
             self.status = StageStatus.Execute
             return
         
-        if time.time() - self.last_time_generate > 10:
-            self.seed_motion = None
+        now = time.time()
+        for session_id, last_time_generate in list(self._last_time_generates.items()):
+            if now - last_time_generate > 10:
+                self._seed_motions.pop(session_id, None)
+                self._last_time_generates.pop(session_id, None)
 
 
     def execute(self) -> None:  
@@ -78,43 +105,82 @@ class MotionStage(TemplateNodeStage):
             self.status = StageStatus.Stop
             return
 
+        self._skip_expired(self._input_audio_deque)
         if len(self._input_audio_deque) == 0:
             self.status = StageStatus.Wait
             return
 
         try:
             audio_data = self._input_audio_deque.popleft()
-            motion_data = self.motion_generator.generate_motion(audio_data=audio_data, seed_motion=self.seed_motion)
+            session_id = audio_data.session_id
+            start_time = time.perf_counter()
+            self._trace_start(audio_data.trace_id)
+            motion_data = self.motion_generator.generate_motion(audio_data=audio_data, seed_motion=self._seed_motions.get(session_id))
+            # CAMN runs as one forward pass; a stop during it discards the result instead
+            if self._is_stopped(session_id, audio_data.timestamp):
+                logger.info(f"Dropped motion for stopped session {session_id}")
+                self._trace_discard(audio_data.trace_id)
+                return
+
+            motion_data.session_id = session_id
+            motion_data.trace_id = audio_data.trace_id
+            motion_data.sequence = audio_data.sequence
+            motion_data.is_final = audio_data.is_final
             
             if self._output_dir is not None:
                 self.motion_generator.save_motion_data(motion_data=motion_data, format='csv', output_dir=self._output_dir)
             
-            self._output_motion_deque.put(motion_data)
-            self.seed_motion = motion_data
-            self.last_time_generate = time.time()
+            self._trace_finish(audio_data.trace_id, output="motion")
+            self._output_motion_deque.append(motion_data)
+            self._record_execute(time.perf_counter() - start_time)
+            self._record_deadline(audio_data.deadline)
+            self._seed_motions[session_id] = motion_data
+            self._last_time_generates[session_id] = time.time()
 
         except Exception as e:
+            logger.error(f"Error in motion generation: {e}")
+            self._trace_discard(audio_data.trace_id)
             self._exception_deque.append((StageExceptionType.STAGE_EXECUTE_FAILED, None))
-            print("execute exception", e)
+            self._record_error(StageExceptionType.STAGE_EXECUTE_FAILED)
 
     def stop(self) -> None:
         if len(self._stop_deque) == 0:
             self.status = StageStatus.Wait
             return
         
-        self.last_time_generate = time.time()
+        while len(self._stop_deque) > 0:
+            received_at, stop_request = self._stop_deque.popleft()
+            session_id = stop_request.conversation_id
+            self._input_audio_deque.clear(session_id)
+            self._output_motion_deque.remove_if(lambda motion_data: self._stop_applies(session_id, motion_data.session_id))
+            self._record_stop(received_at)
+
+        self._touch_sessions()
+        self.status = StageStatus.Wait
 
     def error(self) -> None:
         if len(self._exception_deque) == 0: 
             self.status = StageStatus.Wait
             return
         
-        self.last_time_generate = time.time()
+        self._touch_sessions()
+    
+    def is_idle(self) -> bool:
+        return (
+            self.status == StageStatus.Wait
+            and len(self._input_audio_deque) == 0
+            and len(self._stop_deque) == 0
+        )
     
     def loof(self) -> None:
         handler = self.status_handlers.get(self.status, lambda: logging.warning("Unknown status"))
         handler()
 
+    def _touch_sessions(self) -> None:
+        now = time.time()
+        for session_id in list(self._last_time_generates):
+            self._last_time_generates[session_id] = now
+
     def _is_resource_exception(self, audio_data: AudioData):
         # if not audio_data or not audio_data.data:
         #     return StageExceptionType.INVALID_DATA_CONTENT
@@ -0,0 +1,283 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from constants.constants_enum import QueuePolicy, SchedulingPolicy
+
+T = TypeVar("T")
+
+
+class StageQueue(Generic[T]):
+    """Thread-safe FIFO between stages with an optional capacity and overflow policy.
+
+    When full, Block waits for the consumer (up to block_timeout, then drops the
+    new item), DropOldest sheds the stalest item, DropNewest rejects the new one
+    and Coalesce merges the new item into the newest queued one. Block stalls the
+    producing thread, so avoid it on queues fed from the shared event loop.
+    """
+
+    def __init__(self, capacity: int = None, policy: QueuePolicy = QueuePolicy.Block,
+                 coalesce: Callable[[T, T], T] = None, block_timeout: float = None):
+        if capacity is not None and capacity < 1:
+            raise ValueError(f"Queue capacity must be at least 1, got {capacity}")
+        
+        self.capacity = capacity
+        self.policy = policy
+        self.coalesce = coalesce or (lambda queued, item: item)
+        self.block_timeout = block_timeout
+
+        self._items: Deque[T] = deque()
+        # perf_counter() at enqueue, kept in step with _items for wait-time metrics
+        self._enqueue_times: Deque[float] = deque()
+        self._not_full = threading.Condition()
+        self.wait_observer: Callable[[float], None] = None
+        # Called with each item DropOldest evicts, after the queue lock is released
+        self.drop_observer: Callable[[T], None] = None
+
+        self.enqueued_count = 0
+        self.dropped_count = 0
+        self.coalesced_count = 0
+        self.max_depth = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def append(self, item: T) -> bool:
+        """Enqueue an item; returns False if the policy discarded it."""
+        evicted: List[T] = []
+        accepted = self._append(item, evicted)
+        if self.drop_observer is not None:
+            for evicted_item in evicted:
+                self.drop_observer(evicted_item)
+        return accepted
+
+    def _append(self, item: T, evicted: List[T]) -> bool:
+        with self._not_full:
+            if self.capacity is not None and len(self._items) >= self.capacity:
+                if self.policy == QueuePolicy.Block:
+                    if not self._not_full.wait_for(lambda: len(self._items) < self.capacity, self.block_timeout):
+                        self.dropped_count += 1
+                        return False
+                elif self.policy == QueuePolicy.DropOldest:
+                    evicted.append(self._items.popleft())
+                    self._enqueue_times.popleft()
+                    self.dropped_count += 1
+                elif self.policy == QueuePolicy.DropNewest:
+                    self.dropped_count += 1
+                    return False
+                elif self.policy == QueuePolicy.Coalesce:
+                    self._items[-1] = self.coalesce(self._items[-1], item)
+                    self.coalesced_count += 1
+                    return True
+
+            self._items.append(item)
+            self._enqueue_times.append(time.perf_counter())
+            self.enqueued_count += 1
+            self.max_depth = max(self.max_depth, len(self._items))
+            return True
+
+    def popleft(self) -> T:
+        with self._not_full:
+            item = self._items.popleft()
+            enqueue_time = self._enqueue_times.popleft()
+            self._not_full.notify()
+        
+        if self.wait_observer is not None:
+            self.wait_observer(time.perf_counter() - enqueue_time)
+        return item
+
+    def set_wait_observer(self, wait_observer: Callable[[float], None]) -> None:
+        self.wait_observer = wait_observer
+
+    def set_drop_observer(self, drop_observer: Callable[[T], None]) -> None:
+        self.drop_observer = drop_observer
+
+    def peekleft(self) -> T:
+        return self._items[0]
+
+    def drop_expired(self, is_expired: Callable[[T], bool]) -> List[T]:
+        return self.remove_if(is_expired)
+
+    def remove_if(self, predicate: Callable[[T], bool]) -> List[T]:
+        """Remove and return every queued item matching `predicate`, keeping the rest in order."""
+        with self._not_full:
+            removed = [item for item in self._items if predicate(item)]
+            if removed:
+                kept = [(item, enqueue_time) for item, enqueue_time in zip(self._items, self._enqueue_times) if not predicate(item)]
+                self._items = deque(item for item, _ in kept)
+                self._enqueue_times = deque(enqueue_time for _, enqueue_time in kept)
+                self._not_full.notify_all()
+            return removed
+
+    def clear(self) -> None:
+        with self._not_full:
+            self._items.clear()
+            self._enqueue_times.clear()
+            self._not_full.notify_all()
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "depth": len(self._items),
+            "capacity": self.capacity or 0,
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued_count,
+            "dropped": self.dropped_count,
+            "coalesced": self.coalesced_count,
+        }
+
+
+class SessionStageQueue(Generic[T]):
+    """One StageQueue per session, drained by weighted round-robin or earliest deadline.
+
+    Sessions share the stage's generator, so under RoundRobin popleft() serves
+    up to `weight` items from one session before moving on, keeping a chatty
+    session from starving the others. Under EarliestDeadlineFirst it serves the
+    session whose oldest item is due soonest; items stay FIFO within a session.
+    Capacity and policy apply to each session separately.
+    """
+
+    def __init__(self, capacity: int = None, policy: QueuePolicy = QueuePolicy.Block,
+                 coalesce: Callable[[T, T], T] = None, block_timeout: float = None,
+                 scheduling: SchedulingPolicy = SchedulingPolicy.RoundRobin,
+                 deadline_of: Callable[[T], Optional[float]] = None):
+        self.capacity = capacity
+        self.policy = policy
+        self.coalesce = coalesce
+        self.block_timeout = block_timeout
+        self.scheduling = scheduling
+        self.deadline_of = deadline_of or (lambda item: None)
+        self.expired_count = 0
+        self.wait_observer: Callable[[float], None] = None
+        self.drop_observer: Callable[[T], None] = None
+
+        self._queues: Dict[str, StageQueue[T]] = {}
+        self._weights: Dict[str, int] = {}
+        self._credits: Dict[str, int] = {}
+        self._ready: Deque[str] = deque()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(queue) for queue in list(self._queues.values()))
+
+    def set_wait_observer(self, wait_observer: Callable[[float], None]) -> None:
+        with self._lock:
+            self.wait_observer = wait_observer
+            for queue in self._queues.values():
+                queue.wait_observer = wait_observer
+
+    def set_drop_observer(self, drop_observer: Callable[[T], None]) -> None:
+        with self._lock:
+            self.drop_observer = drop_observer
+            for queue in self._queues.values():
+                queue.drop_observer = drop_observer
+
+    def set_weight(self, session_id: str, weight: int) -> None:
+        if weight < 1:
+            raise ValueError(f"Session weight must be at least 1, got {weight}")
+        self._weights[session_id] = weight
+
+    def append(self, item: T, session_id: str = None) -> bool:
+        with self._lock:
+            queue = self._queues.get(session_id)
+            if queue is None:
+                queue = StageQueue(self.capacity, self.policy, self.coalesce, self.block_timeout)
+                queue.wait_observer = self.wait_observer
+                queue.drop_observer = self.drop_observer
+                self._queues[session_id] = queue
+        
+        # Outside the lock so a blocking session queue only stalls its own producer
+        accepted = queue.append(item)
+        with self._lock:
+            if accepted and session_id not in self._ready:
+                self._ready.append(session_id)
+        return accepted
+
+    def popleft(self) -> T:
+        return self.popleft_with_session()[1]
+
+    def popleft_with_session(self) -> Tuple[str, T]:
+        with self._lock:
+            if len(self._ready) == 0:
+                # An append may have filled its queue before registering as ready
+                self._ready.extend(session_id for session_id, queue in self._queues.items() if len(queue) > 0)
+            
+            if self.scheduling == SchedulingPolicy.EarliestDeadlineFirst:
+                self._move_earliest_deadline_to_front()
+
+            while len(self._ready) > 0:
+                session_id = self._ready[0]
+                queue = self._queues[session_id]
+                if len(queue) == 0:
+                    self._ready.popleft()
+                    self._credits.pop(session_id, None)
+                    continue
+                
+                if self._credits.get(session_id, 0) <= 0:
+                    self._credits[session_id] = self._weights.get(session_id, 1)
+                
+                item = queue.popleft()
+                self._credits[session_id] -= 1
+                if self._credits[session_id] <= 0 or len(queue) == 0:
+                    self._ready.rotate(-1)
+                return session_id, item
+        
+        raise IndexError("pop from an empty SessionStageQueue")
+
+    def drop_expired(self, now: float) -> List[T]:
+        """Remove and return every queued item whose deadline is already behind `now`."""
+        def is_expired(item: T) -> bool:
+            deadline = self.deadline_of(item)
+            return deadline is not None and deadline < now
+
+        with self._lock:
+            queues = list(self._queues.values())
+        expired = [item for queue in queues for item in queue.drop_expired(is_expired)]
+        self.expired_count += len(expired)
+        return expired
+
+    def _move_earliest_deadline_to_front(self) -> None:
+        earliest_index, earliest_deadline = 0, float("inf")
+        for index, session_id in enumerate(self._ready):
+            queue = self._queues[session_id]
+            if len(queue) == 0:
+                continue
+            deadline = self.deadline_of(queue.peekleft())
+            # Items without a deadline yield to every item that has one
+            if deadline is not None and deadline < earliest_deadline:
+                earliest_index, earliest_deadline = index, deadline
+        self._ready.rotate(-earliest_index)
+
+    def clear(self, session_id: str = None) -> None:
+        """Clear one session, or every session when session_id is None."""
+        with self._lock:
+            queues = self._queues.values() if session_id is None else [self._queues.get(session_id)]
+            for queue in queues:
+                if queue is not None:
+                    queue.clear()
+
+    def remove_session(self, session_id: str) -> None:
+        with self._lock:
+            queue = self._queues.pop(session_id, None)
+            if queue is not None:
+                queue.clear()
+            self._weights.pop(session_id, None)
+            self._credits.pop(session_id, None)
+            if session_id in self._ready:
+                self._ready.remove(session_id)
+
+    def sessions(self) -> List[str]:
+        return list(self._queues.keys())
+
+    def metrics(self) -> Dict[str, float]:
+        session_metrics = [queue.metrics() for queue in list(self._queues.values())]
+        return {
+            "depth": sum(metrics["depth"] for metrics in session_metrics),
+            "capacity": self.capacity or 0,
+            "max_depth": max((metrics["max_depth"] for metrics in session_metrics), default=0),
+            "enqueued": sum(metrics["enqueued"] for metrics in session_metrics),
+            "dropped": sum(metrics["dropped"] for metrics in session_metrics),
+            "coalesced": sum(metrics["coalesced"] for metrics in session_metrics),
+            "expired": self.expired_count,
+            "sessions": len(session_metrics),
+        }
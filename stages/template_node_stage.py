@@ -1,15 +1,163 @@
 from abc import abstractmethod, ABC
-from constants.constants_enum import StageStatus
+from constants.constants_enum import StageStatus, SchedulingPolicy, StageExceptionType
+from stages.stage_queue import StageQueue, SessionStageQueue
+from monitoring import stage_metrics
+from monitoring.tracing import TRACER
+from entities.entity_conversation import StopRequest
+from typing import Deque, Dict, List, Optional, Tuple
+from collections import deque
 import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
 
 class TemplateNodeStage(ABC):
+    # Async stages are driven through loof_async() on the shared event loop
+    is_async = False
+
     def __init__(self):
+        # Label used in metrics; override to tell apart two stages of the same type
+        self.name = type(self).__name__
         self.status_handlers = {
             StageStatus.Wait: self.wait,
             StageStatus.Execute: self.execute,
             StageStatus.Stop: self.stop,
             StageStatus.Error: self.error
         }
+        self._work_event = threading.Event()
+        self._deadline_counts = {"met": 0, "late": 0, "skipped": 0}
+        # (perf_counter() on arrival, request), drained by stop()
+        self._stop_deque: Deque[Tuple[float, StopRequest]] = deque()
+        # Wall-clock time of the latest stop per session; None stops every session
+        self._stopped_at: Dict[Optional[str], float] = {}
+
+    def notify(self) -> None:
+        """Wake a worker blocked in wait_for_work()."""
+        self._work_event.set()
+
+    def wait_for_work(self, timeout: float = None) -> bool:
+        """Block until notify() is called or the timeout elapses."""
+        woken = self._work_event.wait(timeout)
+        self._work_event.clear()
+        return woken
+
+    def add_stop_request(self, stop_request: StopRequest) -> None:
+        """Interrupt the session named by stop_request.conversation_id, or every session if it is None.
+
+        In-flight work is cancelled right here on the caller's thread, since the
+        worker may be blocked inside a generator; queues are flushed by stop().
+        """
+        self._stop_deque.append((time.perf_counter(), stop_request))
+        self._mark_stopped(stop_request.conversation_id)
+        self._cancel_in_flight(stop_request.conversation_id)
+        self.notify()
+
+    def has_pending_stop(self) -> bool:
+        """Whether generation for a stopped session is still running in this stage.
+
+        Queued leftovers do not count: they predate the stop, so the stage drops
+        them by timestamp whenever it gets to them.
+        """
+        in_flight_session_ids = self._in_flight_session_ids()
+        return any(
+            self._stop_applies(stop_request.conversation_id, session_id)
+            for _, stop_request in list(self._stop_deque)
+            for session_id in in_flight_session_ids
+        )
+
+    def has_runnable_work(self) -> bool:
+        """Whether another loof() call can make progress right now."""
+        return not self.is_idle() and self.status != StageStatus.Error
+
+    def get_queue_metrics(self) -> Dict[str, Dict[str, float]]:
+        """Depth and drop counters for every bounded queue the stage owns."""
+        return {
+            name.strip("_"): queue.metrics()
+            for name, queue in vars(self).items()
+            if isinstance(queue, (StageQueue, SessionStageQueue))
+        }
+
+    def bind_queue_metrics(self) -> None:
+        """Report how long items wait in each of the stage's queues."""
+        for name, queue in vars(self).items():
+            if isinstance(queue, (StageQueue, SessionStageQueue)):
+                labels = (self.name, name.strip("_"))
+                queue.set_wait_observer(lambda seconds, labels=labels: stage_metrics.QUEUE_WAIT_SECONDS.observe(seconds, *labels))
+
+    def set_scheduling_policy(self, policy: SchedulingPolicy) -> None:
+        for queue in vars(self).values():
+            if isinstance(queue, SessionStageQueue):
+                queue.scheduling = policy
+
+    def get_deadline_metrics(self) -> Dict[str, float]:
+        """Items finished before (met) or after (late) their deadline, or skipped as already expired."""
+        total = sum(self._deadline_counts.values())
+        missed = self._deadline_counts["late"] + self._deadline_counts["skipped"]
+        return {**self._deadline_counts, "miss_rate": missed / total if total else 0.0}
+
+    def _record_execute(self, seconds: float) -> None:
+        stage_metrics.EXECUTE_SECONDS.observe(seconds, self.name)
+        stage_metrics.ITEMS_TOTAL.inc(self.name)
+
+    def _record_error(self, exception_type: StageExceptionType) -> None:
+        stage_metrics.ERRORS_TOTAL.inc(self.name, exception_type.name)
+
+    def _trace_enqueue(self, trace_id: Optional[str]) -> None:
+        TRACER.enqueue(trace_id, self.name)
+
+    def _trace_start(self, trace_id: Optional[str]) -> None:
+        TRACER.start(trace_id, self.name)
+
+    def _trace_finish(self, trace_id: Optional[str], output: str = None) -> None:
+        TRACER.finish(trace_id, self.name, output)
+
+    def _trace_output(self, trace_id: Optional[str], output: str) -> None:
+        TRACER.output(trace_id, output)
+
+    def _trace_discard(self, trace_id: Optional[str]) -> None:
+        TRACER.discard(trace_id, self.name)
+
+    def _cancel_in_flight(self, session_id: Optional[str]) -> None:
+        """Abort generation running for `session_id` (every session if None); stages with in-flight work override this."""
+        pass
+
+    def _in_flight_session_ids(self) -> List[Optional[str]]:
+        """Sessions with cancellable generation running right now."""
+        return []
+
+    def _mark_stopped(self, session_id: Optional[str]) -> None:
+        self._stopped_at[session_id] = time.time()
+
+    def _is_stopped(self, session_id: Optional[str], created_at: float) -> bool:
+        """Whether an item of `session_id` created at `created_at` predates a stop of its session."""
+        stopped_at = max(self._stopped_at.get(session_id, 0.0), self._stopped_at.get(None, 0.0))
+        return created_at <= stopped_at
+
+    @staticmethod
+    def _stop_applies(stopped_session_id: Optional[str], session_id: Optional[str]) -> bool:
+        return stopped_session_id is None or stopped_session_id == session_id
+
+    def _record_stop(self, received_at: float) -> None:
+        stage_metrics.STOP_SECONDS.observe(time.perf_counter() - received_at, self.name)
+
+    def _record_deadline(self, deadline: Optional[float]) -> None:
+        if deadline is None:
+            return
+        self._deadline_counts["met" if time.time() <= deadline else "late"] += 1
+
+    def _skip_expired(self, queue: SessionStageQueue) -> List:
+        expired = queue.drop_expired(time.time())
+        if expired:
+            self._deadline_counts["skipped"] += len(expired)
+            logger.warning(f"{type(self).__name__} skipped {len(expired)} item(s) past their deadline")
+        return expired
+
+    async def execute_async(self) -> None:
+        self.execute()
+
+    async def loof_async(self) -> None:
+        self.loof()
 
     @abstractmethod
     def wait(self) -> None:
@@ -30,3 +178,7 @@ class TemplateNodeStage(ABC):
     @abstractmethod
     def loof(self) -> None:
         pass
+
+    @abstractmethod
+    def is_idle(self) -> bool:
+        pass
@@ -1,48 +1,108 @@
 import logging
-from typing import Deque, Dict
+from typing import Deque, Dict, List, Optional, Tuple
 from collections import deque
-from queue import Queue
 import time
 
+import numpy as np
+
 from entities.entity_audio import AudioData
 from components.audio.abstract_tts_generator import AbstractTTSGenerator
 from stages.template_node_stage import TemplateNodeStage
-from constants.constants_enum import StageStatus, StageExceptionType
+from stages.stage_queue import StageQueue, SessionStageQueue
+from constants.constants_enum import StageStatus, StageExceptionType, QueuePolicy
 from entities.entity_conversation import StopRequest
+from monitoring.tracing import new_trace_id, chunk_trace_id
+from utils.cancellation import CancellationToken, GenerationCancelled
+from utils.text_segmentation import split_into_clauses
+from utils.resampling import StreamingResampler
+from constants.constants_value import REQUIRED_SAMPLE_RATE
 
 logger = logging.getLogger(__name__)
 
 class TTSStage(TemplateNodeStage):
-    def __init__(self, tts_generator: AbstractTTSGenerator, output_dir: str = None):
+    def __init__(self, tts_generator: AbstractTTSGenerator, output_dir: str = None,
+                 input_queue_capacity: int = None, input_queue_policy: QueuePolicy = QueuePolicy.Block,
+                 output_queue_capacity: int = None, output_queue_policy: QueuePolicy = QueuePolicy.Block,
+                 streaming: bool = False, max_clause_chars: int = 150,
+                 batch_size: int = 1, batch_wait: float = 0.02,
+                 output_sample_rate: Optional[int] = REQUIRED_SAMPLE_RATE):
         super().__init__()
         self.tts_generator = tts_generator
         self._output_dir = output_dir
+        # Streaming synthesizes one clause per execute() so downstream starts on the first one
+        self.streaming = streaming
+        self.max_clause_chars = max_clause_chars
+        # Up to batch_size texts share one generate call, waiting at most batch_wait seconds to fill it
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        # Audio is resampled to this rate before it leaves the stage; None passes it through
+        self.output_sample_rate = output_sample_rate
+        # utterance trace id -> (session_id, resampler) carrying filter state from one clause to the next
+        self._resamplers: Dict[str, Tuple[Optional[str], StreamingResampler]] = {}
         
-        self._input_text_deque: Deque[str] = deque()
-        self._stop_deque: Deque[StopRequest] = deque()
+        # Items are (text, deadline, trace_id); coalescing merges a burst of texts into
+        # one utterance due as early as the earliest of them, traced as the first
+        self._input_text_deque: SessionStageQueue[Tuple[str, Optional[float], str]] = SessionStageQueue(
+            input_queue_capacity, input_queue_policy, coalesce=self._coalesce_texts, deadline_of=lambda item: item[1]
+        )
+        # trace id of a text merged by Coalesce -> trace id of the queued text it joined
+        self._coalesced_into: Dict[str, str] = {}
 
+        # (session_id, deadline, trace_id, handled_at, sequence, is_final, text), one per clause when streaming
         self._input_handled_deque = deque()
+        # (session ids, token) of the generation running right now, cancelled by add_stop_request
+        self._in_flight: Optional[Tuple[List[Optional[str]], CancellationToken]] = None
         
-        self._output_audio_deque: Queue[AudioData] = Queue()
+        self._output_audio_deque: StageQueue[AudioData] = StageQueue(output_queue_capacity, output_queue_policy)
         self._exception_deque: Deque[Dict[StageExceptionType, str]] = deque()
         
         self.status = StageStatus.Wait
         self.last_time_generate = 0
 
-    def add_input_text(self, text: str) -> None:
+    def add_input_text(self, text: str, session_id: str = None, deadline: float = None, trace_id: str = None) -> str:
+        """Queue text for synthesis; returns the trace id its outputs will carry."""
         if not text or len(text.strip()) == 0:
             self._exception_deque.append({StageExceptionType.INVALID_DATA_CONTENT: text})
-            return
+            self._record_error(StageExceptionType.INVALID_DATA_CONTENT)
+            self.notify()
+            return None
         
-        self._input_text_deque.append(text)
+        trace_id = trace_id or new_trace_id()
+        self._trace_enqueue(trace_id)
+        if not self._input_text_deque.append((text, deadline, trace_id), session_id):
+            logger.warning(f"Input queue full, dropped text for session {session_id}")
+            self._trace_discard(trace_id)
+        self.notify()
+        # A coalesced text is synthesized, and traced, as part of the queued one
+        return self._coalesced_into.pop(trace_id, trace_id)
+
+    def _coalesce_texts(self, queued: Tuple[str, Optional[float], str],
+                        item: Tuple[str, Optional[float], str]) -> Tuple[str, Optional[float], str]:
+        # Runs inside append(), on the thread of the add_input_text call that is being merged
+        self._trace_discard(item[2])
+        self._coalesced_into[item[2]] = queued[2]
+        return f"{queued[0]} {item[0]}", _earliest_deadline(queued[1], item[1]), queued[2]
+
+    def _cancel_in_flight(self, session_id: Optional[str]) -> None:
+        in_flight = self._in_flight
+        if in_flight is not None and any(self._stop_applies(session_id, in_flight_session_id) for in_flight_session_id in in_flight[0]):
+            in_flight[1].cancel()
 
-    def add_stop_request(self, stop_request: StopRequest) -> None:
-        self._stop_deque.append(stop_request)
+    def _in_flight_session_ids(self) -> List[Optional[str]]:
+        in_flight = self._in_flight
+        return [] if in_flight is None else list(in_flight[0])
+
+    def set_session_weight(self, session_id: str, weight: int) -> None:
+        """Give a session `weight` turns per round-robin pass over the shared generator."""
+        self._input_text_deque.set_weight(session_id, weight)
+
+    def remove_session(self, session_id: str) -> None:
+        self._input_text_deque.remove_session(session_id)
 
     def get_audio_data(self) -> AudioData:
-        if self._output_audio_deque.empty():
+        if len(self._output_audio_deque) == 0:
             return None
-        return self._output_audio_deque.get()
+        return self._output_audio_deque.popleft()
     
     def get_exception_data(self) -> Dict[StageExceptionType, str]:
         if len(self._exception_deque) == 0:
@@ -51,11 +111,16 @@ class TTSStage(TemplateNodeStage):
 
     def notify_exception_data_handled(self) -> None:
         self._exception_deque.popleft()
+        self.notify()
 
     def wait(self) -> None:
         if len(self._exception_deque) != 0:
             self.status = StageStatus.Error
             return
+
+        if len(self._stop_deque) != 0:
+            self.status = StageStatus.Stop
+            return
     
         if len(self._input_handled_deque) > 0: 
             self.status = StageStatus.Execute
@@ -74,30 +139,154 @@ class TTSStage(TemplateNodeStage):
             self.status = StageStatus.Wait
             return
 
+        if self._batch_window_open():
+            # Hold the batch open for texts still arriving; add_input_text wakes us early
+            self.wait_for_work(self._input_handled_deque[0][3] + self.batch_wait - time.time())
+            return
+
+        batch = self._take_batch()
+        cancel_token = CancellationToken()
+        self._in_flight = ([item[0] for item in batch], cancel_token)
         try:
-            input_handled = self._input_handled_deque.popleft()
+            # A stop that landed between dequeue and now missed the token above
+            batch = self._drop_stopped(batch)
+            if len(batch) == 0:
+                return
 
-            audio_data = self.tts_generator.generate_speech(input_handled)
-            
-            if self._output_dir:
-                self.tts_generator.save_audio(audio_data, format='wav', output_dir=self._output_dir)
-            
-            self._output_audio_deque.put(audio_data)
+            start_time = time.perf_counter()
+            for item in batch:
+                self._trace_start(chunk_trace_id(item[2], item[4]))
+            texts = [item[6] for item in batch]
+            if len(texts) == 1:
+                audios = [self.tts_generator.generate_speech(self.tts_generator.prepare_inputs_for_model(texts), cancel_token=cancel_token)]
+            else:
+                audios = self.tts_generator.generate_speech_batch(texts, cancel_token=cancel_token)
+            if cancel_token.is_cancelled:
+                raise GenerationCancelled()
+
+            self._emit(batch, audios, time.perf_counter() - start_time)
+        except GenerationCancelled:
+            # One stopped session cancels the whole batch; the others go back to the front
+            survivors = self._drop_stopped(batch)
+            self._input_handled_deque.extendleft(reversed(survivors))
+            logger.info(f"Cancelled TTS batch of {len(batch)}, requeued {len(survivors)}")
         except Exception as e:
             logger.error(f"Error in TTS generation: {e}")
+            for item in batch:
+                self._trace_discard(chunk_trace_id(item[2], item[4]))
+                if item[5]:
+                    self._resamplers.pop(item[2], None)
             self._exception_deque.append({StageExceptionType.STAGE_EXECUTE_FAILED: None})
+            self._record_error(StageExceptionType.STAGE_EXECUTE_FAILED)
+        finally:
+            self._in_flight = None
+
+    def _batch_window_open(self) -> bool:
+        if self.batch_size <= 1 or len(self._input_handled_deque) >= self.batch_size:
+            return False
+        # Queued texts reach the handled deque on the next loof(), no need to block for them
+        if len(self._input_text_deque) > 0:
+            return False
+        return time.time() < self._input_handled_deque[0][3] + self.batch_wait
+
+    def _take_batch(self) -> list:
+        batch = []
+        while len(self._input_handled_deque) > 0 and len(batch) < self.batch_size:
+            item = self._input_handled_deque.popleft()
+            session_id, deadline, trace_id, _, sequence, is_final, _ = item
+            if deadline is not None and deadline < time.time():
+                self._deadline_counts["skipped"] += 1
+                self._trace_discard(chunk_trace_id(trace_id, sequence))
+                if is_final:
+                    self._resamplers.pop(trace_id, None)
+                logger.warning(f"Skipped TTS for session {session_id} past its deadline")
+                continue
+            batch.append(item)
+        return batch
+
+    def _drop_stopped(self, batch: list) -> list:
+        kept = []
+        for item in batch:
+            if self._is_stopped(item[0], item[3]):
+                self._trace_discard(chunk_trace_id(item[2], item[4]))
+            else:
+                kept.append(item)
+        return kept
+
+    def _emit(self, batch: list, audios: List[AudioData], seconds: float) -> None:
+        # Each clause is due when the one before it ends; clause_ends carries that across the batch
+        clause_ends: Dict[str, float] = {}
+        # The batch shares one generate call; each clause is charged an even share of it
+        seconds_per_item = seconds / len(batch)
+        for (session_id, deadline, utterance_trace_id, _, sequence, is_final, _), audio_data in zip(batch, audios):
+            trace_id = chunk_trace_id(utterance_trace_id, sequence)
+            deadline = clause_ends.get(utterance_trace_id, deadline)
+            audio_data.session_id = session_id
+            audio_data.deadline = deadline
+            audio_data.trace_id = trace_id
+            audio_data.sequence = sequence
+            audio_data.is_final = is_final
+            self._resample(audio_data, utterance_trace_id)
+            if not is_final and deadline is not None:
+                clause_ends[utterance_trace_id] = deadline + audio_data.duration
+
+            if self._output_dir:
+                self.tts_generator.save_audio(audio_data, format='wav', output_dir=self._output_dir)
+
+            self._trace_finish(trace_id, output="audio")
+            self._output_audio_deque.append(audio_data)
+            self._record_execute(seconds_per_item)
+            self._record_deadline(deadline)
+
+        for utterance_trace_id, clause_end in clause_ends.items():
+            self._set_next_clause_deadline(utterance_trace_id, clause_end)
+
+    def _resample(self, audio_data: AudioData, utterance_trace_id: str) -> None:
+        if self.output_sample_rate is None or audio_data.sample_rate == self.output_sample_rate:
+            return
+        if utterance_trace_id not in self._resamplers:
+            self._resamplers[utterance_trace_id] = (
+                audio_data.session_id, StreamingResampler(audio_data.sample_rate, self.output_sample_rate)
+            )
+        resampler = self._resamplers[utterance_trace_id][1]
+
+        # Clauses are resampled as one stream, so no clause boundary gets filter edges;
+        # the filter delay's worth of each clause goes out with the next one
+        data = resampler.process(audio_data.data)
+        if audio_data.is_final:
+            data = np.concatenate([data, resampler.flush()])
+            del self._resamplers[utterance_trace_id]
+        audio_data.data = data
+        audio_data.sample_rate = self.output_sample_rate
+        audio_data.duration = len(data) / self.output_sample_rate
+
+    def _set_next_clause_deadline(self, trace_id: str, deadline: float) -> None:
+        for index, item in enumerate(self._input_handled_deque):
+            if item[2] == trace_id:
+                self._input_handled_deque[index] = (item[0], deadline, *item[2:])
+                return
 
     def stop(self) -> None:
         if len(self._stop_deque) == 0:
             self.status = StageStatus.Wait
             return
         
-        # Clear all queues
-        self._input_text_deque.clear()
-        while not self._output_audio_deque.empty():
-            self._output_audio_deque.get()
+        while len(self._stop_deque) > 0:
+            received_at, stop_request = self._stop_deque.popleft()
+            session_id = stop_request.conversation_id
+            # None clears every session, as it does for SessionStageQueue.clear
+            self._input_text_deque.clear(session_id)
+            self._input_handled_deque = deque(
+                item for item in self._input_handled_deque if not self._stop_applies(session_id, item[0])
+            )
+            self._output_audio_deque.remove_if(lambda audio_data: self._stop_applies(session_id, audio_data.session_id))
+            self._resamplers = {
+                trace_id: entry for trace_id, entry in self._resamplers.items() if not self._stop_applies(session_id, entry[0])
+            }
+            self._record_stop(received_at)
         
         self.last_time_generate = time.time()
+        self.status = StageStatus.Wait
 
     def error(self) -> None:
         if len(self._exception_deque) == 0: 
@@ -105,11 +294,36 @@ class TTSStage(TemplateNodeStage):
             return
         
         self.last_time_generate = time.time()
+
+    def is_idle(self) -> bool:
+        return (
+            self.status == StageStatus.Wait
+            and len(self._input_text_deque) == 0
+            and len(self._input_handled_deque) == 0
+            and len(self._stop_deque) == 0
+        )
     
     def loof(self) -> None:
-        if len(self._input_text_deque) > 0:
-            handled_text = self.tts_generator.prepare_inputs_for_model([self._input_text_deque.popleft()])
-            self._input_handled_deque.append(handled_text)
+        self._skip_expired(self._input_text_deque)
+        # Top the handled deque up to a full batch; one text at a time when not batching
+        moved = 0
+        while len(self._input_text_deque) > 0 and (moved == 0 or len(self._input_handled_deque) < self.batch_size):
+            moved += 1
+            session_id, (text, deadline, trace_id) = self._input_text_deque.popleft_with_session()
+            handled_at = time.time()
+            clauses = split_into_clauses(text, self.max_clause_chars) if self.streaming else [text]
+            for sequence, clause in enumerate(clauses):
+                if sequence > 0:
+                    self._trace_enqueue(chunk_trace_id(trace_id, sequence))
+                is_final = sequence == len(clauses) - 1
+                self._input_handled_deque.append((session_id, deadline, trace_id, handled_at, sequence, is_final, clause))
         
         handler = self.status_handlers.get(self.status, lambda: logging.warning("Unknown status"))
         handler()
+
+
+
+def _earliest_deadline(first: Optional[float], second: Optional[float]) -> Optional[float]:
+    if first is None or second is None:
+        return first if second is None else second
+    return min(first, second)
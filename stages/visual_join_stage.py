@@ -0,0 +1,211 @@
+import dataclasses
+import logging
+from typing import Callable, Deque, Dict
+from collections import deque
+import time
+
+from entities.entity_visual import FaceExpression, MotionData, VisualOutput
+from stages.template_node_stage import TemplateNodeStage
+from stages.stage_queue import StageQueue
+from monitoring import stage_metrics
+from constants.constants_enum import StageStatus, StageExceptionType, QueuePolicy
+from entities.entity_conversation import StopRequest
+
+logger = logging.getLogger(__name__)
+
+
+class VisualJoinStage(TemplateNodeStage):
+    """Pairs FaceExpression and MotionData produced for the same audio into a VisualOutput."""
+
+    def __init__(self, max_pending: int = 64,
+                 input_queue_capacity: int = None, input_queue_policy: QueuePolicy = QueuePolicy.Block,
+                 output_queue_capacity: int = None, output_queue_policy: QueuePolicy = QueuePolicy.Block):
+        super().__init__()
+        self.max_pending = max_pending
+
+        self._input_face_deque: StageQueue[FaceExpression] = StageQueue(input_queue_capacity, input_queue_policy)
+        self._input_motion_deque: StageQueue[MotionData] = StageQueue(input_queue_capacity, input_queue_policy)
+
+        # audio_name -> chunk_index -> face, so a streamed clip's chunks wait side by side
+        # and max_pending counts clips, not chunks
+        self._pending_faces: Dict[str, Dict[int, FaceExpression]] = {}
+        self._pending_motions: Dict[str, MotionData] = {}
+
+        self._output_visual_deque: StageQueue[VisualOutput] = StageQueue(output_queue_capacity, output_queue_policy)
+        self._exception_deque: Deque[Dict[StageExceptionType, object]] = deque()
+
+        self.status = StageStatus.Wait
+        self.last_time_generate = 0
+
+    def add_face_expression(self, face_expression: FaceExpression) -> None:
+        if self._is_stopped(face_expression.session_id, face_expression.timestamp):
+            return
+        self._trace_enqueue(face_expression.trace_id)
+        self._input_face_deque.append(face_expression)
+        self.notify()
+
+    def add_motion_data(self, motion_data: MotionData) -> None:
+        if self._is_stopped(motion_data.session_id, motion_data.timestamp):
+            return
+        self._trace_enqueue(motion_data.trace_id)
+        self._input_motion_deque.append(motion_data)
+        self.notify()
+
+    def get_visual_output(self) -> VisualOutput:
+        if len(self._output_visual_deque) == 0:
+            return None
+        return self._output_visual_deque.popleft()
+
+    def get_exception_data(self) -> Dict[StageExceptionType, object]:
+        if len(self._exception_deque) == 0:
+            return None
+        return self._exception_deque[0]
+
+    def notify_exception_data_handled(self) -> None:
+        self._exception_deque.popleft()
+        self.notify()
+
+    def wait(self) -> None:
+        if len(self._exception_deque) != 0:
+            self.status = StageStatus.Error
+            return
+
+        if len(self._stop_deque) != 0:
+            self.status = StageStatus.Stop
+            return
+
+        if len(self._input_face_deque) > 0 or len(self._input_motion_deque) > 0:
+            self.status = StageStatus.Execute
+            return
+
+    def execute(self) -> None:
+        if len(self._exception_deque) != 0:
+            self.status = StageStatus.Error
+            return
+
+        if len(self._stop_deque) != 0:
+            self.status = StageStatus.Stop
+            return
+
+        if len(self._input_face_deque) == 0 and len(self._input_motion_deque) == 0:
+            self.status = StageStatus.Wait
+            return
+
+        while len(self._input_face_deque) > 0:
+            self._join_face(self._input_face_deque.popleft())
+
+        while len(self._input_motion_deque) > 0:
+            self._join_motion(self._input_motion_deque.popleft())
+
+        self.last_time_generate = time.time()
+
+    def stop(self) -> None:
+        if len(self._stop_deque) == 0:
+            self.status = StageStatus.Wait
+            return
+
+        while len(self._stop_deque) > 0:
+            received_at, stop_request = self._stop_deque.popleft()
+            session_id = stop_request.conversation_id
+            in_session = lambda item: self._stop_applies(session_id, item.session_id)
+            self._input_face_deque.remove_if(in_session)
+            self._input_motion_deque.remove_if(in_session)
+            self._output_visual_deque.remove_if(in_session)
+            for audio_name in [audio_name for audio_name, chunks in self._pending_faces.items() if in_session(_first_chunk(chunks))]:
+                self._trace_discard(_first_chunk(self._pending_faces.pop(audio_name)).trace_id)
+            for audio_name in [audio_name for audio_name, motion_data in self._pending_motions.items() if in_session(motion_data)]:
+                self._trace_discard(self._pending_motions.pop(audio_name).trace_id)
+            self._record_stop(received_at)
+
+        self.status = StageStatus.Wait
+
+    def error(self) -> None:
+        if len(self._exception_deque) == 0:
+            self.status = StageStatus.Wait
+            return
+
+    def is_idle(self) -> bool:
+        return (
+            self.status == StageStatus.Wait
+            and len(self._input_face_deque) == 0
+            and len(self._input_motion_deque) == 0
+            and len(self._stop_deque) == 0
+        )
+
+    def loof(self) -> None:
+        handler = self.status_handlers.get(self.status, lambda: logging.warning("Unknown status"))
+        handler()
+
+    def _join_face(self, face_expression: FaceExpression) -> None:
+        motion_data = self._pending_motions.get(face_expression.audio_name)
+        if motion_data is None:
+            self._pending_faces.setdefault(face_expression.audio_name, {})[face_expression.chunk_index] = face_expression
+            self._evict_stale(self._pending_faces, trace_id_of=lambda chunks: _first_chunk(chunks).trace_id)
+            return
+
+        if face_expression.is_last_chunk:
+            self._pending_motions.pop(face_expression.audio_name)
+        self._emit(face_expression, motion_data)
+
+    def _join_motion(self, motion_data: MotionData) -> None:
+        chunks = self._pending_faces.pop(motion_data.audio_name, {})
+        face_expressions = [chunks[chunk_index] for chunk_index in sorted(chunks)]
+        for face_expression in face_expressions:
+            self._emit(face_expression, motion_data)
+
+        # Streamed faces arrive in chunks; hold the motion for the chunks still to come
+        if not any(face_expression.is_last_chunk for face_expression in face_expressions):
+            self._pending_motions[motion_data.audio_name] = motion_data
+            self._evict_stale(self._pending_motions, trace_id_of=lambda motion_data: motion_data.trace_id)
+
+    def _emit(self, face_expression: FaceExpression, motion_data: MotionData) -> None:
+        # The queued span covers the wait for the slower of face and motion
+        if face_expression.chunk_index == 0:
+            self._trace_start(face_expression.trace_id)
+        self._output_visual_deque.append(VisualOutput(
+            audio_name=face_expression.audio_name,
+            face_expressions=face_expression,
+            motion_data=_motion_window(motion_data, face_expression),
+            session_id=face_expression.session_id,
+            trace_id=face_expression.trace_id,
+            sequence=face_expression.sequence,
+            is_final=face_expression.is_final
+        ))
+        if face_expression.is_last_chunk:
+            self._trace_finish(face_expression.trace_id, output="visual")
+        else:
+            self._trace_output(face_expression.trace_id, "visual")
+        stage_metrics.ITEMS_TOTAL.inc(self.name)
+
+    def _evict_stale(self, pending: Dict, trace_id_of: Callable) -> None:
+        # A counterpart that failed upstream never arrives; drop the oldest half-pair, a face with all its chunks
+        while len(pending) > self.max_pending:
+            audio_name = next(iter(pending))
+            logger.warning(f"Dropping unmatched visual data for {audio_name}")
+            self._trace_discard(trace_id_of(pending.pop(audio_name)))
+            # Load shedding, not a stage failure: counted, but the stage keeps running
+            self._record_error(StageExceptionType.MISSING_REQUIRED_DATA)
+
+
+def _first_chunk(chunks: Dict[int, FaceExpression]) -> FaceExpression:
+    # Every chunk of a clip carries the same session and trace id
+    return next(iter(chunks.values()))
+
+
+def _motion_window(motion_data: MotionData, face_expression: FaceExpression) -> MotionData:
+    """The motion frames covering a face chunk's time span; the whole clip for an unchunked face."""
+    if face_expression.chunk_index == 0 and face_expression.is_last_chunk:
+        return motion_data
+
+    fps = motion_data.frame_count / motion_data.duration if motion_data.duration > 0 else 0.0
+    start = min(motion_data.frame_count, round(face_expression.start_time * fps))
+    end = motion_data.frame_count if face_expression.is_last_chunk else \
+        min(motion_data.frame_count, round((face_expression.start_time + face_expression.duration) * fps))
+    end = max(start, end)
+    return dataclasses.replace(
+        motion_data,
+        poses=motion_data.poses[start:end],
+        duration=(end - start) / fps if fps > 0 else 0.0,
+        frame_count=end - start,
+        is_final=face_expression.is_final
+    )
@@ -1,18 +1,215 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
 from stages.template_node_stage import TemplateNodeStage
+from constants.constants_enum import SchedulingPolicy, StageExceptionType
+from entities.entity_conversation import StopRequest
+from utils.async_runtime import get_shared_event_loop
+
+logger = logging.getLogger(__name__)
+
 
 class StageBackbone:
-    def __init__(self):
+    def __init__(self, poll_interval: float = 0.005, idle_timeout: float = 1.0,
+                 scheduling_policy: SchedulingPolicy = SchedulingPolicy.RoundRobin,
+                 on_exception: Callable[[TemplateNodeStage, StageExceptionType, Any], None] = None,
+                 max_exceptions: int = 100):
         self.stages = []
+        self.scheduling_policy = scheduling_policy
+        self.poll_interval = poll_interval
+        # Idle workers block on their stage's wakeup event; the timeout only keeps
+        # time-based housekeeping in wait() (e.g. motion seed reset) ticking.
+        self.idle_timeout = idle_timeout
+
+        self._links: Dict[TemplateNodeStage, List[Tuple[Callable[[], Any], Tuple[Callable[[Any], None], ...]]]] = {}
+        self._workers: Dict[TemplateNodeStage, Union[threading.Thread, Future]] = {}
+        self._stop_event = threading.Event()
+        # Stage errors are handled here so the stage can leave Error; called from the stage's worker
+        self.on_exception = on_exception
+        # (stage name, exception type, offending data), newest last
+        self._exceptions: Deque[Tuple[str, StageExceptionType, Any]] = deque(maxlen=max_exceptions)
         
     def add_stage(self, stage: TemplateNodeStage):
+        stage.set_scheduling_policy(self.scheduling_policy)
+        stage.bind_queue_metrics()
         self.stages.append(stage)
+        if self._workers:
+            self._start_worker(stage)
+
+    def link(self, get_output: Callable[[], Any], *put_inputs: Callable[[Any], None]) -> None:
+        """Hand every item returned by a stage getter to one or more stage adders.
+
+        Several adders fan the same object out without copying it, and several
+        links into one stage's adders fan in, so a graph is declared edge by edge.
+        """
+        source = get_output.__self__
+        self._links.setdefault(source, []).append((get_output, put_inputs))
         
     def loop_stage(self):
         for stage in self.stages:
             stage.loof()
+            self._pump_links(stage)
+            self._drain_exceptions(stage)
     
     def remove_stage(self, stage: TemplateNodeStage):
         self.stages.remove(stage)
-    
+        self._links.pop(stage, None)
+        worker = self._workers.pop(stage, None)
+        stage.notify()
+        if worker is not None and worker is not threading.current_thread():
+            self._join_worker(worker)
+
+    def start(self) -> None:
+        """Run every stage concurrently until shutdown() is called.
+
+        Sync stages get a worker thread each; async stages share one long-lived
+        event loop so their network-bound work can overlap.
+        """
+        if self._workers:
+            return
+        
+        self._stop_event.clear()
+        for stage in self.stages:
+            self._start_worker(stage)
+
+    def shutdown(self, timeout: float = None) -> None:
+        self._stop_event.set()
+        for stage in self._workers:
+            stage.notify()
+        for worker in self._workers.values():
+            self._join_worker(worker, timeout)
+        self._workers.clear()
+
+    def stop_conversation(self, stop_request: StopRequest, timeout: float = None) -> Optional[float]:
+        """Barge-in: cancel and flush every stage's work for one conversation.
+
+        Blocks until every stage has aborted its in-flight generation for
+        stop_request.conversation_id (every session if None) and returns that
+        stop-to-silence time in seconds, or None on timeout. Anything still queued
+        for the conversation predates the stop and is dropped as stages reach it.
+        """
+        start_time = time.perf_counter()
+        for stage in self.stages:
+            stage.add_stop_request(stop_request)
+
+        deadline = None if timeout is None else start_time + timeout
+        while any(stage.has_pending_stop() for stage in self.stages):
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+            time.sleep(0.0005)
+        return time.perf_counter() - start_time
+
+    def set_scheduling_policy(self, policy: SchedulingPolicy) -> None:
+        """Choose how every stage picks its next item, e.g. earliest playback deadline first."""
+        self.scheduling_policy = policy
+        for stage in self.stages:
+            stage.set_scheduling_policy(policy)
+
+    def get_exceptions(self) -> List[Tuple[str, StageExceptionType, Any]]:
+        """The latest exceptions stages reported, as (stage name, exception type, data)."""
+        return list(self._exceptions)
+
+    def get_deadline_metrics(self) -> Dict[str, Dict[str, float]]:
+        return {stage.name: stage.get_deadline_metrics() for stage in self.stages}
+
+    def is_running(self) -> bool:
+        return len(self._workers) > 0
+
+    def wait_until_idle(self, timeout: float = None) -> bool:
+        deadline = None if timeout is None else time.time() + timeout
+        idle_checks = 0
+        # Two consecutive idle observations so an item caught between stages is not missed
+        while idle_checks < 2:
+            if all(stage.is_idle() for stage in self.stages):
+                idle_checks += 1
+            else:
+                idle_checks = 0
+            
+            if deadline is not None and time.time() > deadline:
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+    def _start_worker(self, stage: TemplateNodeStage) -> None:
+        if stage.is_async:
+            self._workers[stage] = asyncio.run_coroutine_threadsafe(
+                self._run_async_worker(stage),
+                get_shared_event_loop()
+            )
+            return
+        
+        worker = threading.Thread(
+            target=self._run_worker,
+            args=(stage,),
+            name=f"{type(stage).__name__}Worker",
+            daemon=True
+        )
+        self._workers[stage] = worker
+        worker.start()
+
+    def _join_worker(self, worker: Union[threading.Thread, Future], timeout: float = None) -> None:
+        if isinstance(worker, threading.Thread):
+            worker.join(timeout)
+            return
+        
+        try:
+            worker.result(timeout)
+        except Exception as e:
+            logger.error(f"Async worker did not stop cleanly: {e}")
+
+    def _run_worker(self, stage: TemplateNodeStage) -> None:
+        while not self._stop_event.is_set() and stage in self.stages:
+            try:
+                stage.loof()
+                self._pump_links(stage)
+                self._drain_exceptions(stage)
+            except Exception as e:
+                logger.error(f"Unhandled error in {type(stage).__name__}: {e}")
+
+            if not stage.has_runnable_work():
+                stage.wait_for_work(self.idle_timeout)
+
+    async def _run_async_worker(self, stage: TemplateNodeStage) -> None:
+        while not self._stop_event.is_set() and stage in self.stages:
+            try:
+                await stage.loof_async()
+                self._pump_links(stage)
+                self._drain_exceptions(stage)
+            except Exception as e:
+                logger.error(f"Unhandled error in {type(stage).__name__}: {e}")
+
+            if not stage.has_runnable_work():
+                await asyncio.to_thread(stage.wait_for_work, self.idle_timeout)
+
+    def _drain_exceptions(self, stage: TemplateNodeStage) -> None:
+        # A stage stays in Error until its exceptions are handled; nothing else consumes them
+        get_exception_data = getattr(stage, 'get_exception_data', None)
+        if get_exception_data is None:
+            return
+
+        exception_data = get_exception_data()
+        while exception_data is not None:
+            for exception_type, data in exception_data.items():
+                logger.error(f"{stage.name} reported {exception_type.name}")
+                self._exceptions.append((stage.name, exception_type, data))
+                if self.on_exception is not None:
+                    try:
+                        self.on_exception(stage, exception_type, data)
+                    except Exception as e:
+                        logger.error(f"on_exception failed for {stage.name}: {e}")
+            # Notifies the stage, so its worker comes back to leave Error right away
+            stage.notify_exception_data_handled()
+            exception_data = get_exception_data()
 
-      
+    def _pump_links(self, stage: TemplateNodeStage) -> None:
+        for get_output, put_inputs in self._links.get(stage, []):
+            item = get_output()
+            while item is not None:
+                for put_input in put_inputs:
+                    put_input(item)
+                item = get_output()
@@ -0,0 +1,181 @@
+import importlib
+import logging
+from typing import Any, Dict, Optional
+
+from omegaconf import OmegaConf
+
+from constants.constants_enum import QueuePolicy, SchedulingPolicy
+from stages.template_node_stage import TemplateNodeStage
+from stages_backbone import StageBackbone
+
+logger = logging.getLogger(__name__)
+
+STAGE_TYPES = {
+    'TTSStage': 'stages.tts_stage:TTSStage',
+    'FaceStage': 'stages.face_stage:FaceStage',
+    'MotionStage': 'stages.motion_stage:MotionStage',
+    'VisualJoinStage': 'stages.visual_join_stage:VisualJoinStage',
+}
+
+# Imported lazily so a graph only pulls in the model libraries it actually uses
+GENERATOR_TYPES = {
+    'bark': 'components.audio.bark_tts_generator:BarkTTSGenerator',
+    'nvidia_a2f': 'components.visual.nvidia_face_generator:NvidiaFaceGenerator',
+    'camn': 'components.visual.camn_motion_generator:CamnMotionGenerator',
+    'synthetic_tts': 'components.audio.synthetic_tts_generator:SyntheticTTSGenerator',
+    'synthetic_face': 'components.visual.synthetic_face_generator:SyntheticFaceGenerator',
+    'synthetic_motion': 'components.visual.synthetic_motion_generator:SyntheticMotionGenerator',
+}
+
+# Stage constructor argument that receives the generator
+GENERATOR_ARGUMENTS = {
+    'TTSStage': 'tts_generator',
+    'FaceStage': 'face_generator',
+    'MotionStage': 'motion_generator',
+}
+
+# Sync generators that `workers` moves into a process pool
+PROCESS_POOL_TYPES = {
+    'TTSStage': 'components.process_pool_generator:ProcessPoolTTSGenerator',
+    'MotionStage': 'components.process_pool_generator:ProcessPoolMotionGenerator',
+}
+
+
+class StageGraph:
+    """A StageBackbone built from a YAML graph spec, plus the named stages and generators it owns.
+
+    Spec layout (see configs/config_pipeline.yml):
+        backbone: poll_interval, idle_timeout, scheduling_policy
+        stages: name -> stage type, generator, generator_config, device, workers,
+                threads, process_pool, cache (TTS only, see TTSAudioCache),
+                input_queue / output_queue {capacity, policy},
+                options (extra stage constructor arguments)
+        edges: list of {from: "<stage>.<getter>", to: ["<stage>.<adder>", ...]}
+
+    `workers` is how many generator calls a stage runs at once: worker processes
+    for TTS and motion, concurrent A2F streams for face. `threads` is the torch
+    thread budget of each worker process, or of this process when workers is 0.
+    """
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.spec = spec
+        self.stages: Dict[str, TemplateNodeStage] = {}
+        self.generators: Dict[str, Any] = {}
+
+        backbone_spec = spec.get('backbone', {})
+        self.backbone = StageBackbone(
+            poll_interval=backbone_spec.get('poll_interval', 0.005),
+            idle_timeout=backbone_spec.get('idle_timeout', 1.0),
+            scheduling_policy=SchedulingPolicy[backbone_spec.get('scheduling_policy', 'RoundRobin')]
+        )
+
+        stage_specs = spec.get('stages', {})
+        self._set_process_threads(stage_specs)
+        for name, stage_spec in stage_specs.items():
+            self.stages[name] = self._build_stage(name, stage_spec)
+            self.backbone.add_stage(self.stages[name])
+
+        for edge in spec.get('edges', []):
+            targets = edge['to'] if isinstance(edge['to'], list) else [edge['to']]
+            self.backbone.link(self._resolve_endpoint(edge['from']), *(self._resolve_endpoint(target) for target in targets))
+
+    @classmethod
+    def from_yaml(cls, path: str) -> "StageGraph":
+        return cls(OmegaConf.to_container(OmegaConf.load(path), resolve=True))
+
+    def shutdown(self) -> None:
+        self.backbone.shutdown()
+        for generator in self.generators.values():
+            # Process-pool generators own worker processes, possibly behind a cache
+            generator = getattr(generator, 'tts_generator', generator)
+            if hasattr(generator, 'shutdown'):
+                generator.shutdown()
+
+    def _build_stage(self, name: str, stage_spec: Dict[str, Any]) -> TemplateNodeStage:
+        stage_type = stage_spec['stage']
+        if stage_type not in STAGE_TYPES:
+            raise ValueError(f"Unknown stage type for '{name}': {stage_type}")
+
+        kwargs = dict(stage_spec.get('options') or {})
+        for queue_name in ('input_queue', 'output_queue'):
+            queue_spec = stage_spec.get(queue_name) or {}
+            if 'capacity' in queue_spec:
+                kwargs[f'{queue_name}_capacity'] = queue_spec['capacity']
+            if 'policy' in queue_spec:
+                kwargs[f'{queue_name}_policy'] = QueuePolicy[queue_spec['policy']]
+
+        if stage_type in GENERATOR_ARGUMENTS:
+            generator = self._build_generator(name, stage_type, stage_spec)
+            self.generators[name] = generator
+            kwargs[GENERATOR_ARGUMENTS[stage_type]] = generator
+        if stage_type == 'FaceStage' and 'workers' in stage_spec:
+            kwargs['max_concurrent_streams'] = stage_spec['workers']
+        if stage_type == 'MotionStage':
+            kwargs.setdefault('input_dir', None)
+            kwargs.setdefault('output_dir', None)
+
+        return _import_object(STAGE_TYPES[stage_type])(**kwargs)
+
+    def _build_generator(self, name: str, stage_type: str, stage_spec: Dict[str, Any]) -> Any:
+        generator_class = _import_object(GENERATOR_TYPES.get(stage_spec['generator'], stage_spec['generator']))
+        generator_config = _load_generator_config(stage_spec.get('generator_config'))
+        if stage_spec.get('device') is not None:
+            generator_config['device'] = stage_spec['device']
+
+        workers = stage_spec.get('workers', 0)
+        if workers > 0 and stage_type in PROCESS_POOL_TYPES:
+            logger.info(f"Hosting the '{name}' generator in {workers} worker process(es)")
+            generator = _import_object(PROCESS_POOL_TYPES[stage_type])({
+                **(stage_spec.get('process_pool') or {}),
+                'generator_factory': generator_class,
+                'generator_config': generator_config,
+                'max_workers': workers,
+                'threads_per_worker': stage_spec.get('threads', 1),
+            })
+        else:
+            generator = generator_class(generator_config)
+
+        # The cache sits in this process, in front of any worker pool
+        if stage_type == 'TTSStage' and stage_spec.get('cache') is not None:
+            generator = _import_object('components.audio.cached_tts_generator:CachedTTSGenerator')(generator, stage_spec['cache'])
+        return generator
+
+    def _set_process_threads(self, stage_specs: Dict[str, Any]) -> None:
+        # Torch has one intra-op pool per process, so in-process stages share the largest budget
+        budgets = [
+            stage_spec['threads'] for stage_spec in stage_specs.values()
+            if stage_spec.get('threads') and not (stage_spec.get('workers', 0) > 0 and stage_spec['stage'] in PROCESS_POOL_TYPES)
+        ]
+        if not budgets:
+            return
+
+        try:
+            import torch
+            torch.set_num_threads(max(budgets))
+        except ImportError:
+            logger.warning("torch is not installed; ignoring stage thread budgets")
+
+    def _resolve_endpoint(self, endpoint: str):
+        stage_name, method_name = endpoint.split('.', 1)
+        if stage_name not in self.stages:
+            raise ValueError(f"Edge references unknown stage: {stage_name}")
+        return getattr(self.stages[stage_name], method_name)
+
+
+def _load_generator_config(generator_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Inline keys, layered over the `key` section of `file` when one is given."""
+    generator_config = dict(generator_config or {})
+    config_file = generator_config.pop('file', None)
+    config_key = generator_config.pop('key', None)
+    if config_file is None:
+        return generator_config
+
+    file_config = OmegaConf.load(config_file)
+    if config_key is not None:
+        file_config = OmegaConf.select(file_config, config_key)
+    return {**OmegaConf.to_container(file_config, resolve=True), **generator_config}
+
+
+def _import_object(path: str) -> Any:
+    module_name, object_name = path.split(':')
+    return getattr(importlib.import_module(module_name), object_name)
@@ -0,0 +1,22 @@
+import asyncio
+import threading
+
+_shared_loop: asyncio.AbstractEventLoop = None
+_shared_loop_lock = threading.Lock()
+
+
+def get_shared_event_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide event loop that drives network-bound generators.
+
+    The loop is created once and runs forever on a daemon thread, so callers
+    schedule work on it with asyncio.run_coroutine_threadsafe instead of
+    creating a new loop per request.
+    """
+    global _shared_loop
+    with _shared_loop_lock:
+        if _shared_loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="SharedEventLoop", daemon=True)
+            thread.start()
+            _shared_loop = loop
+    return _shared_loop
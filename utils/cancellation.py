@@ -0,0 +1,28 @@
+import threading
+from typing import Optional
+
+
+class GenerationCancelled(Exception):
+    """Raised inside a generator when its CancellationToken is cancelled mid-generation."""
+
+
+class CancellationToken:
+    """Thread-safe flag a stage sets to abort the generation running on another thread."""
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Sleep up to `timeout` seconds, returning early with True if cancelled."""
+        return self._cancelled.wait(timeout)
+
+    def raise_if_cancelled(self) -> None:
+        if self._cancelled.is_set():
+            raise GenerationCancelled()
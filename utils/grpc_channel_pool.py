@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import grpc
+
+from models.audio2face.scripts.audio2face_api_client.a2f.client import auth
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledChannel:
+    def __init__(self, channel: grpc.aio.Channel, stub: Any):
+        self.channel = channel
+        self.stub = stub
+        self.active_streams = 0
+
+
+class GrpcChannelPool:
+    """Long-lived grpc.aio channels shared by concurrent streaming calls.
+
+    Each channel multiplexes up to max_streams_per_channel calls over one HTTP/2
+    connection; a new channel is opened only when every open one is full, up to
+    max_channels, after which callers wait for a free stream. Keepalive pings keep
+    idle connections (and their TLS sessions) from being dropped by proxies between
+    utterances. grpc.aio channels belong to the event loop that created them, so
+    the pool must be used from a single loop, normally the shared one.
+    """
+
+    def __init__(self, config: Dict[str, Any], stub_factory: Callable[[grpc.aio.Channel], Any] = None):
+        self.uri = config.get('uri', 'grpc.nvcf.nvidia.com:443')
+        self.use_ssl = config.get('use_ssl', True)
+        self.ssl_cert = config.get('ssl_cert')
+        self.metadata: Optional[List[Tuple[str, str]]] = config.get('metadata')
+        self.max_channels = config.get('max_channels', 2)
+        self.max_streams_per_channel = config.get('max_streams_per_channel', 4)
+        self.options = [
+            ('grpc.keepalive_time_ms', config.get('keepalive_time_ms', 20000)),
+            ('grpc.keepalive_timeout_ms', config.get('keepalive_timeout_ms', 10000)),
+            ('grpc.keepalive_permit_without_calls', 1),
+            ('grpc.http2.max_pings_without_data', 0),
+            # Otherwise gRPC may share one subchannel between all our "separate" channels
+            ('grpc.use_local_subchannel_pool', 1),
+        ]
+        self.stub_factory = stub_factory or (lambda channel: channel)
+
+        self._channels: List[_PooledChannel] = []
+        self._available: Optional[asyncio.Condition] = None
+        self._closed = False
+
+    @asynccontextmanager
+    async def stub(self):
+        """Reserve one stream slot for the duration of a call and yield the channel's stub."""
+        pooled = await self._acquire()
+        try:
+            yield pooled.stub
+        finally:
+            pooled.active_streams -= 1
+            async with self._available:
+                self._available.notify()
+
+    async def _acquire(self) -> _PooledChannel:
+        if self._available is None:
+            self._available = asyncio.Condition()
+
+        async with self._available:
+            while True:
+                if self._closed:
+                    raise RuntimeError("gRPC channel pool is closed")
+
+                self._drop_shut_down_channels()
+                open_slots = [pooled for pooled in self._channels if pooled.active_streams < self.max_streams_per_channel]
+                if open_slots:
+                    # Least loaded first, so streams spread over the connections we already pay for
+                    pooled = min(open_slots, key=lambda pooled: pooled.active_streams)
+                elif len(self._channels) < self.max_channels:
+                    pooled = self._open_channel()
+                else:
+                    await self._available.wait()
+                    continue
+
+                pooled.active_streams += 1
+                return pooled
+
+    def _open_channel(self) -> _PooledChannel:
+        channel = auth.create_channel(
+            ssl_cert=self.ssl_cert, uri=self.uri, use_ssl=self.use_ssl, metadata=self.metadata, options=self.options
+        )
+        pooled = _PooledChannel(channel, self.stub_factory(channel))
+        self._channels.append(pooled)
+        logger.info(f"Opened gRPC channel {len(self._channels)}/{self.max_channels} to {self.uri}")
+        return pooled
+
+    def _drop_shut_down_channels(self) -> None:
+        # TRANSIENT_FAILURE reconnects by itself; only a channel closed under us is replaced
+        self._channels = [
+            pooled for pooled in self._channels
+            if pooled.active_streams > 0 or pooled.channel.get_state() != grpc.ChannelConnectivity.SHUTDOWN
+        ]
+
+    async def close(self, grace: Optional[float] = None) -> None:
+        """Close every channel; calls still running get `grace` seconds to finish."""
+        self._closed = True
+        channels, self._channels = self._channels, []
+        await asyncio.gather(*(pooled.channel.close(grace) for pooled in channels))
+        if self._available is not None:
+            async with self._available:
+                self._available.notify_all()
+
+    def get_metrics(self) -> Dict[str, int]:
+        return {
+            "channels": len(self._channels),
+            "active_streams": sum(pooled.active_streams for pooled in self._channels),
+        }
@@ -0,0 +1,85 @@
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from utils.cancellation import CancellationToken, GenerationCancelled
+
+
+class LatencyProfile:
+    """Seeded latency distribution plus how much of each call burns CPU instead of sleeping.
+
+    Config keys:
+        distribution: fixed | uniform | normal | lognormal (default fixed)
+        mean, std: seconds, for fixed/normal/lognormal
+        low, high: seconds, for uniform
+        per_audio_second: seconds added per second of audio processed
+        cpu_fraction: share of the latency spent busy on the calling thread (0..1)
+        seed: RNG seed; equal seeds give equal latency sequences
+    """
+
+    DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+    def __init__(self, config: Dict[str, Any] = None):
+        config = config or {}
+        self.distribution = config.get('distribution', 'fixed')
+        self.mean = config.get('mean', 0.0)
+        self.std = config.get('std', 0.0)
+        self.low = config.get('low', self.mean)
+        self.high = config.get('high', self.mean)
+        self.per_audio_second = config.get('per_audio_second', 0.0)
+        self.cpu_fraction = min(max(config.get('cpu_fraction', 0.0), 0.0), 1.0)
+        self._rng = np.random.default_rng(config.get('seed', 0))
+
+        if self.distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {self.distribution}")
+
+    def sample(self, audio_seconds: float = 0.0) -> float:
+        if self.distribution == 'uniform':
+            latency = self._rng.uniform(self.low, self.high)
+        elif self.distribution == 'normal':
+            latency = self._rng.normal(self.mean, self.std)
+        elif self.distribution == 'lognormal' and self.mean > 0:
+            # Parameterised by the mean and std of the latency itself, not of its log
+            log_variance = np.log1p((self.std / self.mean) ** 2)
+            latency = self._rng.lognormal(np.log(self.mean) - log_variance / 2, np.sqrt(log_variance))
+        else:
+            latency = self.mean
+        return max(0.0, latency + self.per_audio_second * audio_seconds)
+
+    def spend(self, audio_seconds: float = 0.0, cancel_token: Optional[CancellationToken] = None) -> float:
+        """Block for one sampled latency; returns the seconds spent.
+
+        Raises GenerationCancelled promptly if `cancel_token` is cancelled meanwhile.
+        """
+        latency = self.sample(audio_seconds)
+        burn_cpu(latency * self.cpu_fraction, cancel_token)
+        sleep_seconds = latency * (1.0 - self.cpu_fraction)
+        if cancel_token is None:
+            time.sleep(sleep_seconds)
+        elif cancel_token.wait(sleep_seconds):
+            raise GenerationCancelled()
+        return latency
+
+    async def spend_async(self, audio_seconds: float = 0.0) -> float:
+        latency = self.sample(audio_seconds)
+        await self.wait_async(latency)
+        return latency
+
+    async def wait_async(self, seconds: float) -> None:
+        """Spend `seconds` already sampled, e.g. one streamed chunk's share of a call."""
+        # The CPU share runs on the event loop, as response parsing would
+        burn_cpu(seconds * self.cpu_fraction)
+        await asyncio.sleep(seconds * (1.0 - self.cpu_fraction))
+
+
+def burn_cpu(seconds: float, cancel_token: Optional[CancellationToken] = None) -> None:
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        # Check between short slices, like a model checking between decode steps
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        for i in range(1000):
+            total += i * i
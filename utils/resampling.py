@@ -0,0 +1,84 @@
+from math import gcd
+
+import numpy as np
+import scipy.signal as signal
+
+
+class StreamingResampler:
+    """Rational-ratio polyphase FIR resampler that can be fed one chunk at a time.
+
+    Uses the same Kaiser-windowed low-pass as scipy.signal.resample_poly, so a
+    whole clip comes out the same as resample_poly(clip, up, down). Between
+    process() calls the last few input samples are carried over as filter state,
+    so chunk boundaries add no edges; flush() emits the tail the filter delay
+    held back. 24 kHz to 16 kHz is up=2, down=3 with 31 taps per phase.
+    """
+
+    def __init__(self, orig_sr: int, target_sr: int, half_width: int = 10, kaiser_beta: float = 5.0):
+        divisor = gcd(orig_sr, target_sr)
+        self.orig_sr = orig_sr
+        self.target_sr = target_sr
+        self.up = target_sr // divisor
+        self.down = orig_sr // divisor
+
+        half_len = half_width * max(self.up, self.down)
+        taps = signal.firwin(2 * half_len + 1, 1.0 / max(self.up, self.down), window=('kaiser', kaiser_beta)) * self.up
+        # Pad so every phase has the same number of taps, then split: phase p holds taps p, p+up, p+2*up...
+        taps = np.concatenate([taps, np.zeros(-len(taps) % self.up)])
+        self._phases = taps.reshape(-1, self.up).T[:, ::-1].astype(np.float32)
+        self._phase_len = self._phases.shape[1]
+        # Output m is centred on upsampled sample m * down, i.e. the filter's group delay is removed
+        self._delay = half_len
+        self.reset()
+
+    def reset(self) -> None:
+        # Zeros before the first sample, as resample_poly pads them
+        self._buffer = np.zeros(self._phase_len, dtype=np.float32)
+        self._buffer_start = -self._phase_len
+        self._received = 0
+        self._emitted = 0
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        """Resample the next chunk; returns every output sample whose inputs have all arrived."""
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        self._buffer = np.concatenate([self._buffer, chunk])
+        self._received += len(chunk)
+        # Outputs before `ready` have every tap on an input already received
+        ready = (self._received * self.up - self._delay - 1) // self.down + 1
+        return self._emit(max(ready, self._emitted))
+
+    def flush(self) -> np.ndarray:
+        """Emit the held-back tail, treating the input as ended, and reset for the next stream."""
+        total = -(-self._received * self.up // self.down)
+        lookahead = -(-(self._delay + self.down) // self.up) + 1
+        self._buffer = np.concatenate([self._buffer, np.zeros(lookahead, dtype=np.float32)])
+        tail = self._emit(max(total, self._emitted))
+        self.reset()
+        return tail
+
+    def _emit(self, end: int) -> np.ndarray:
+        outputs = np.empty(end - self._emitted, dtype=np.float32)
+        windows = np.lib.stride_tricks.sliding_window_view(self._buffer, self._phase_len)
+        for offset in range(min(self.up, len(outputs))):
+            # Outputs up apart share a phase, and their newest inputs are down apart
+            first = self._emitted + offset
+            position = first * self.down + self._delay
+            newest = position // self.up - self._buffer_start
+            count = len(range(offset, len(outputs), self.up))
+            outputs[offset::self.up] = windows[newest - self._phase_len + 1::self.down][:count] @ self._phases[position % self.up]
+        self._emitted = end
+
+        # Keep only the inputs the next output still needs
+        needed = (end * self.down + self._delay) // self.up - self._phase_len + 1 - self._buffer_start
+        needed = min(max(needed, 0), len(self._buffer) - self._phase_len)
+        self._buffer = self._buffer[needed:]
+        self._buffer_start += needed
+        return outputs
+
+
+def resample(audio: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+    """Resample a whole clip with StreamingResampler."""
+    if orig_sr == target_sr:
+        return np.asarray(audio, dtype=np.float32)
+    resampler = StreamingResampler(orig_sr, target_sr)
+    return np.concatenate([resampler.process(audio), resampler.flush()])
@@ -0,0 +1,48 @@
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Tuple
+
+import numpy as np
+
+
+@dataclass
+class SharedArray:
+    """Picklable handle to a NumPy array stored in a named shared memory block."""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+def share_array(array: np.ndarray) -> SharedArray:
+    """Copy an array into a new shared memory block; the reader must free it."""
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    shared_array = SharedArray(name=shm.name, shape=array.shape, dtype=array.dtype.str)
+    shm.close()
+    return shared_array
+
+
+def read_shared_array(shared_array: SharedArray) -> np.ndarray:
+    """Copy an array out of shared memory, leaving the block for its owner to free."""
+    shm = shared_memory.SharedMemory(name=shared_array.name)
+    try:
+        return np.ndarray(shared_array.shape, dtype=np.dtype(shared_array.dtype), buffer=shm.buf).copy()
+    finally:
+        shm.close()
+
+
+def take_shared_array(shared_array: SharedArray) -> np.ndarray:
+    """Copy an array out of shared memory and free the block."""
+    array = read_shared_array(shared_array)
+    free_shared_array(shared_array)
+    return array
+
+
+def free_shared_array(shared_array: SharedArray) -> None:
+    try:
+        shm = shared_memory.SharedMemory(name=shared_array.name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
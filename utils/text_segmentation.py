@@ -0,0 +1,54 @@
+import re
+from typing import List
+
+# Sentence ends, keeping the punctuation (and any closing quote) with the sentence
+_SENTENCE_END = re.compile(r'(?<=[.!?…])\s+|(?<=[.!?…]["\')\]])\s+')
+# Clause breaks inside a sentence that is too long to synthesize in one go
+_CLAUSE_BREAK = re.compile(r'(?<=[,;:—–])\s+')
+
+
+def split_into_clauses(text: str, max_chars: int = 150, min_chars: int = 12) -> List[str]:
+    """Split text into sentences, and overlong sentences into clauses, in reading order.
+
+    Sentences longer than `max_chars` are split at commas, semicolons, colons and
+    dashes, then at word boundaries if a clause is still too long. Segments
+    shorter than `min_chars` are merged into the following one, since TTS models
+    render a lone "Yes." or "Well," poorly.
+    """
+    segments = []
+    for sentence in _SENTENCE_END.split(text.strip()):
+        if len(sentence) <= max_chars:
+            segments.append(sentence)
+            continue
+        for clause in _CLAUSE_BREAK.split(sentence):
+            segments.extend(_wrap_words(clause, max_chars))
+
+    merged: List[str] = []
+    pending = ""
+    for segment in (segment.strip() for segment in segments):
+        if not segment:
+            continue
+        pending = f"{pending} {segment}" if pending else segment
+        if len(pending) >= min_chars:
+            merged.append(pending)
+            pending = ""
+    if pending:
+        if merged:
+            merged[-1] = f"{merged[-1]} {pending}"
+        else:
+            merged.append(pending)
+    return merged
+
+
+def _wrap_words(clause: str, max_chars: int) -> List[str]:
+    lines: List[str] = []
+    line = ""
+    for word in clause.split():
+        if line and len(line) + 1 + len(word) > max_chars:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines